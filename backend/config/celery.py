@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.schedules import crontab
 from kombu import Queue
 
 # Set the default Django settings module for the 'celery' program.
@@ -20,6 +21,7 @@ app.conf.task_queues = (
     Queue('code_execution', routing_key='code_execution'),
     Queue('test_execution', routing_key='test_execution'),
     Queue('result_processing', routing_key='result_processing'),
+    Queue('simulation', routing_key='simulation'),
 )
 
 # Configure task routes
@@ -28,6 +30,15 @@ app.conf.task_routes = {
         'queue': 'code_execution',
         'routing_key': 'code_execution',
     },
+    # Run where the sandboxes run, on the workers attached to Docker
+    'core.tasks.prewarm_match_sandboxes_task': {
+        'queue': 'code_execution',
+        'routing_key': 'code_execution',
+    },
+    'core.tasks.release_match_sandboxes_task': {
+        'queue': 'code_execution',
+        'routing_key': 'code_execution',
+    },
     'core.tasks.run_test_task': {
         'queue': 'test_execution',
         'routing_key': 'test_execution',
@@ -36,6 +47,67 @@ app.conf.task_routes = {
         'queue': 'result_processing',
         'routing_key': 'result_processing',
     },
+    'core.tasks.dispatch_batch_task': {
+        'queue': 'result_processing',
+        'routing_key': 'result_processing',
+    },
+    'core.tasks.flush_match_progress_task': {
+        'queue': 'result_processing',
+        'routing_key': 'result_processing',
+    },
+    'core.tasks.finalize_match_task': {
+        'queue': 'result_processing',
+        'routing_key': 'result_processing',
+    },
+    'core.tasks.reconcile_leaderboard_task': {
+        'queue': 'result_processing',
+        'routing_key': 'result_processing',
+    },
+    'core.tasks.reconcile_profiles_task': {
+        'queue': 'result_processing',
+        'routing_key': 'result_processing',
+    },
+    'core.tasks.flush_last_active_task': {
+        'queue': 'result_processing',
+        'routing_key': 'result_processing',
+    },
+    'core.tasks.prune_presence_task': {
+        'queue': 'result_processing',
+        'routing_key': 'result_processing',
+    },
+    # CPU-bound; kept off the queues that serve interactive submissions
+    'core.tasks.simulate_raid_task': {
+        'queue': 'simulation',
+        'routing_key': 'simulation',
+    },
+}
+
+# Enable message priorities on the Redis broker so bulk rejudges
+# (priority 9) yield to interactive submissions
+app.conf.broker_transport_options = {
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+}
+
+# Periodic tasks (run by celery beat)
+app.conf.beat_schedule = {
+    'reconcile-leaderboard': {
+        'task': 'core.tasks.reconcile_leaderboard_task',
+        'schedule': crontab(minute=17),  # hourly
+    },
+    'reconcile-profiles': {
+        'task': 'core.tasks.reconcile_profiles_task',
+        'schedule': crontab(hour=3, minute=40),  # nightly
+    },
+    'flush-last-active': {
+        'task': 'core.tasks.flush_last_active_task',
+        'schedule': 60.0,  # every minute
+    },
+    'prune-presence': {
+        'task': 'core.tasks.prune_presence_task',
+        'schedule': 60.0,
+    },
 }
 
 # Configure task defaults
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,6 +48,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.db_router.replica_routing_middleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -74,13 +76,36 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connections are kept open per worker thread (CONN_MAX_AGE) and checked
+# before reuse. Set DATABASE_REPLICA_NAME to read from a replica; two local
+# SQLite files or PostgreSQL databases (PG* environment variables) will do.
+DATABASE_ENGINE = os.environ.get('DATABASE_ENGINE', 'django.db.backends.sqlite3')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'ENGINE': DATABASE_ENGINE,
+        'NAME': os.environ.get('DATABASE_NAME', BASE_DIR / 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+if os.environ.get('DATABASE_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        'ENGINE': DATABASE_ENGINE,
+        'NAME': os.environ['DATABASE_REPLICA_NAME'],
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.db_router.PrimaryReplicaRouter']
+
+DATABASE_ROUTING = {
+    'replicas': [name for name in DATABASES if name != 'default'],
+    'sticky_seconds': 10,  # read-your-writes window; covers write-behind and replication lag
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -134,6 +159,26 @@ CHANNEL_LAYERS = {
     },
 }
 
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+
+# Submission state is shared between the API and the workers through
+# this cache; the Redis backend serves get_many() with a single MGET.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+}
+
+# Status endpoints accept ?wait=N and park the request on a Redis
+# notification; serve them through ASGI so waiters don't hold threads.
+STATUS_LONG_POLL = {
+    'max_wait': 30,  # seconds
+}
+
+# Maximum number of submissions resolved by one batch status request
+STATUS_BATCH_MAX_IDS = 500
+
 # Celery configuration
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
@@ -141,8 +186,116 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 
+# Write-behind persistence of submissions from the Redis stream
+SUBMISSION_PERSISTENCE = {
+    'batch_size': 500,  # events per bulk_create batch
+    'block_ms': 1000,  # how long an idle consumer waits for new events
+    'claim_idle_ms': 60000,  # reclaim events a crashed consumer left unacknowledged
+    'dead_letter_maxlen': 10000,  # events kept in the dead-letter stream
+}
+
+# Monthly archiving of old submissions (see core.archive)
+SUBMISSION_ARCHIVE = {
+    'root': os.environ.get('SUBMISSION_ARCHIVE_ROOT', str(BASE_DIR / 'archive')),
+    'older_than_months': 6,  # months kept in the database, current month included
+    'member_rows': 1000,  # rows per independently decompressible gzip member
+    'delete_batch_size': 1000,
+}
+
+# Submission history pages (see core.history)
+SUBMISSION_HISTORY = {
+    'page_size': 20,
+    'max_page_size': 100,
+}
+
+# PvP matchmaking (see core.matchmaking)
+MATCHMAKING = {
+    'shards': ['default'],  # independent queues, each paired by its own loop
+    'base_window': 50,  # rating gap accepted straight away
+    'widen_per_second': 10,  # window growth per second waited
+    'max_window': 400,
+    'interval': 0.5,  # seconds between pairing ticks
+    'batch_size': 500,  # players scanned per script call
+    'match_ttl': 3600,  # seconds a match record and assignments are kept
+}
+
+# Elo ratings and leaderboard (see core.rating, core.leaderboard)
+RATING = {
+    'initial': 1200,
+    'k_factor': 32,
+    'leaderboard_max_limit': 100,
+}
+
+# Live PvP match updates (see core.match_state)
+PVP_MATCH = {
+    'progress_window': 0.25,  # seconds test progress updates are coalesced for
+}
+
+# Online presence (see core.presence)
+PRESENCE = {
+    'heartbeat_interval': 15,  # seconds between client heartbeats
+    'ttl': 45,  # seconds without a heartbeat before a player counts as offline
+    'flush_batch_size': 1000,  # profiles per upsert
+    'lobby_limit': 50,  # online players listed in the lobby
+}
+
+# Mission catalog cache (see core.missions)
+MISSIONS = {
+    'lru_size': 256,  # catalog versions and test bundles kept per process
+    'version_check_interval': 5,  # seconds between version reads without pub/sub
+    'pubsub': True,  # follow invalidations on a listener thread
+    'bundle_ttl': 7 * 24 * 3600,  # seconds old bundle versions are kept for queued submissions
+}
+
+# Profile counters and cached profile reads (see core.profiles)
+PROFILE = {
+    'experience_per_level': 1000,
+    'mission_experience': 100,  # first completion of a mission
+    'mission_credits': 50,
+    'match_experience': {'win': 50, 'loss': 10, 'draw': 25},
+    'match_credits': {'win': 25, 'loss': 0, 'draw': 10},
+    'cache_timeout': 300,  # seconds
+    'reconcile_chunk': 1000,  # users per reconciliation step
+}
+
+# Player bases (see core.economy)
+BASE_CONFIG = {
+    'grid_width': 10,
+    'grid_height': 10,
+    'starting_resources': {'credits': 2000, 'minerals': 1000, 'energy': 500, 'research_points': 0},
+    'grid_cache_timeout': 3600,  # seconds an occupancy bitmap is cached (see core.occupancy)
+}
+
+# Raid simulation (see core.combat)
+COMBAT = {
+    'max_ticks': 600,
+    'max_units': 200,  # largest army per raid
+    'damage_spread': 0.1,  # damage rolls within +-10%
+}
+
+# Delayed building timer events (see core.scheduler)
+SCHEDULER = {
+    'batch_size': 1000,  # events popped and handled at once
+    'lease': 60,  # seconds before an unacknowledged event is delivered again
+    'idle_sleep': 0.5,  # longest sleep while nothing is due
+}
+
+# Bulk submission / rejudge batches
+REJUDGE_CONFIG = {
+    'priority': 9,  # Celery priority, 0 is highest; interactive submissions use the default
+    'chunk_size': 200,  # submissions dispatched per tick
+    'interval': 1.0,  # seconds between dispatch ticks
+    'max_in_flight': 1000,  # dispatched but unfinished submissions per batch
+    'max_batch_size': 20000,
+    'progress_ttl': 86400,  # seconds the batch counters are kept
+}
+
 # Sandbox configuration
 SANDBOX_CONFIG = {
+    'backend': os.environ.get('SANDBOX_BACKEND', 'docker'),  # or 'fake' (see core.fake_docker)
+    'fake_profile': os.environ.get('SANDBOX_FAKE_PROFILE'),  # recorded latencies; None for defaults
+    'fake_time_scale': float(os.environ.get('SANDBOX_FAKE_TIME_SCALE', 1.0)),  # 0: no sleeping
+    'fake_seed': None,
     'default_timeout': 30,  # seconds
     'default_memory_limit': '512m',
     'default_cpu_limit': '1.0',
@@ -162,6 +315,50 @@ SANDBOX_CONFIG = {
     }
 }
 
+# Pre-warmed sandboxes of PvP matches (see core.pvp_sandbox)
+PVP_SANDBOX = {
+    'languages': ['python', 'javascript'],  # one warm container per player and language
+    'cpusets': ['0-1', '2-3'],  # CPU slots; both players of a match share one
+    'idle_timeout': 3600,  # seconds a warm container lives; matches MATCHMAKING['match_ttl']
+}
+
+# Per-test-case verdicts, keyed by (code hash, test case hash, image digest),
+# let rejudges execute only new or changed test cases
+VERDICT_CACHE = {
+    'timeout': 30 * 24 * 3600,  # seconds
+    'image_digest_ttl': 60,  # seconds a resolved image digest is reused
+}
+
+# Limits for the diffs attached to failed test results
+RESULT_DIFF_CONFIG = {
+    'max_hunks': 3,  # mismatching regions reported per test case
+    'context_lines': 2,
+    'max_hunk_lines': 20,
+    'max_line_length': 200,  # characters kept around the first difference
+    'max_edit_distance': 64,  # cap on the diff search, beyond it the diff is truncated
+    'max_value_length': 1000,  # clip expected/actual values in the payload
+}
+
+# Prometheus metrics (see core.metrics); set PROMETHEUS_MULTIPROC_DIR in
+# multi-process deployments (web server workers, Celery prefork pool)
+METRICS = {
+    'worker_port': 9808,  # each Celery worker serves its metrics here
+    'queues': ['default', 'code_execution', 'test_execution', 'result_processing', 'simulation'],
+    'priority_steps': 10,  # matches broker_transport_options['priority_steps']
+}
+
+# Tracing of submissions across the API, Celery and the sandbox (see core.tracing)
+TRACING = {
+    'enabled': True,
+    'sample_rate': 0.01,  # share of new traces kept
+    'slow_threshold': 5.0,  # seconds; slower requests and tasks are kept regardless
+    'exporter': os.environ.get('TRACING_EXPORTER', 'none'),  # 'file', 'otlp' or 'none'
+    'file_path': os.environ.get('TRACING_FILE', '/tmp/kodewar-traces.jsonl'),
+    'otlp_endpoint': os.environ.get('OTLP_ENDPOINT', 'http://localhost:4318/v1/traces'),
+    'service_name': 'kodewar',
+    'export_queue_size': 1000,  # kept segments waiting for export; more are dropped
+}
+
 # Logging configuration
 LOGGING = {
     'version': 1,
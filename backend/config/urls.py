@@ -16,11 +16,51 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path
-from core.views import hello_world, CodeSubmissionView, TaskStatusView
+from core.views import (
+    hello_world, CodeSubmissionView, BulkSubmissionView, BatchProgressView,
+    BatchSubmissionStatusView, SubmissionHistoryView, SubmissionCodeView, MatchmakingQueueView,
+    LobbyView, MatchReplayView, LeaderboardView, LeaderboardAroundView, ProfileView,
+    MissionListView, MissionDetailView,
+    BaseView, CollectResourcesView, UpgradeBuildingView, BuildingsView, BuildingDetailView,
+    BuildingNeighboursView,
+    metrics, task_status
+)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics, name='metrics'),
     path('api/hello/', hello_world, name='hello_world'),
     path('api/submit/', CodeSubmissionView.as_view(), name='code_submission'),
-    path('api/status/<str:task_id>/', TaskStatusView.as_view(), name='task_status'),
+    path('api/submit/bulk/', BulkSubmissionView.as_view(), name='bulk_submission'),
+    path('api/batch/<str:batch_id>/', BatchProgressView.as_view(), name='batch_progress'),
+    path('api/status/batch/', BatchSubmissionStatusView.as_view(), name='submission_status_batch'),
+    path('api/status/<str:task_id>/', task_status, name='task_status'),
+    path('api/submissions/', SubmissionHistoryView.as_view(), name='submission_history'),
+    path('api/submissions/<uuid:submission_id>/code/', SubmissionCodeView.as_view(), name='submission_code'),
+    path('api/pvp/queue/', MatchmakingQueueView.as_view(), name='matchmaking_queue'),
+    path('api/pvp/lobby/', LobbyView.as_view(), name='pvp_lobby'),
+    path(
+        'api/pvp/matches/<uuid:match_id>/replay/', MatchReplayView.as_view(),
+        name='match_replay'
+    ),
+    path('api/leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+    path('api/leaderboard/me/', LeaderboardAroundView.as_view(), name='leaderboard_around'),
+    path('api/profile/', ProfileView.as_view(), name='profile'),
+    path('api/missions/', MissionListView.as_view(), name='missions'),
+    path('api/missions/<str:mission_id>/', MissionDetailView.as_view(), name='mission_detail'),
+    path('api/base/', BaseView.as_view(), name='base'),
+    path('api/base/collect/', CollectResourcesView.as_view(), name='base_collect'),
+    path('api/base/buildings/', BuildingsView.as_view(), name='buildings'),
+    path(
+        'api/base/buildings/<uuid:building_id>/', BuildingDetailView.as_view(),
+        name='building_detail'
+    ),
+    path(
+        'api/base/buildings/<uuid:building_id>/neighbours/', BuildingNeighboursView.as_view(),
+        name='building_neighbours'
+    ),
+    path(
+        'api/base/buildings/<uuid:building_id>/upgrade/', UpgradeBuildingView.as_view(),
+        name='building_upgrade'
+    ),
 ]
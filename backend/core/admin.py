@@ -1,3 +1,90 @@
 from django.contrib import admin
+from django.db import transaction
 
-# Register your models here.
+from .missions import publish_catalog
+from .models import (
+    Building, CompletedMission, Match, Mission, PlayerBase, PlayerRating, ResourceBalance,
+    Submission, SubmissionArchive, TestResult, UserProfile
+)
+
+
+class TestResultInline(admin.TabularInline):
+    model = TestResult
+    extra = 0
+
+
+@admin.register(Submission)
+class SubmissionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'mission_id', 'language', 'status', 'created_at')
+    list_filter = ('status', 'language')
+    search_fields = ('id', 'mission_id')
+    raw_id_fields = ('user',)
+    inlines = [TestResultInline]
+
+
+@admin.register(SubmissionArchive)
+class SubmissionArchiveAdmin(admin.ModelAdmin):
+    list_display = ('month', 'row_count', 'path', 'archived_at')
+
+
+@admin.register(UserProfile)
+class UserProfileAdmin(admin.ModelAdmin):
+    list_display = ('user', 'experience', 'credits', 'completed_missions', 'last_active')
+    raw_id_fields = ('user',)
+
+
+@admin.register(Mission)
+class MissionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'title', 'difficulty', 'position', 'published', 'version', 'updated_at')
+    list_filter = ('difficulty', 'published')
+    search_fields = ('id', 'title')
+    readonly_fields = ('version',)
+
+    def save_model(self, request, obj, form, change):
+        # A new version, so cached copies of the old one are never served as current
+        if change:
+            obj.version += 1
+        super().save_model(request, obj, form, change)
+        transaction.on_commit(publish_catalog)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        transaction.on_commit(publish_catalog)
+
+
+@admin.register(CompletedMission)
+class CompletedMissionAdmin(admin.ModelAdmin):
+    list_display = ('user', 'mission_id', 'completed_at')
+    search_fields = ('mission_id',)
+    raw_id_fields = ('user',)
+
+
+@admin.register(PlayerRating)
+class PlayerRatingAdmin(admin.ModelAdmin):
+    list_display = ('user', 'rating', 'wins', 'losses', 'draws', 'updated_at')
+    search_fields = ('user__username',)
+    raw_id_fields = ('user',)
+
+
+@admin.register(Match)
+class MatchAdmin(admin.ModelAdmin):
+    list_display = ('id', 'player_a', 'player_b', 'winner', 'rating_change_a', 'ended_at')
+    raw_id_fields = ('player_a', 'player_b', 'winner')
+
+
+class BuildingInline(admin.TabularInline):
+    model = Building
+    extra = 0
+
+
+class ResourceBalanceInline(admin.TabularInline):
+    model = ResourceBalance
+    extra = 0
+
+
+@admin.register(PlayerBase)
+class PlayerBaseAdmin(admin.ModelAdmin):
+    list_display = ('name', 'user', 'created_at')
+    search_fields = ('name', 'user__username')
+    raw_id_fields = ('user',)
+    inlines = [BuildingInline, ResourceBalanceInline]
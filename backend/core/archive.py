@@ -0,0 +1,274 @@
+"""
+Monthly archiving of old submissions.
+
+Submissions are partitioned by the calendar month (UTC) they were created
+in. Months older than ``SUBMISSION_ARCHIVE['older_than_months']`` are
+exported to ``<root>/submissions-YYYY-MM.jsonl.gz`` and deleted from the
+database, which keeps the hot tables and their indexes small.
+
+The archive is a sequence of independent gzip members of ``member_rows``
+JSON lines each (still a valid gzip file as a whole), and the sidecar
+``.idx`` file holds fixed-width ``(uuid, member offset)`` records sorted by
+UUID. Fetching one archived submission is a binary search over the
+memory-mapped index plus the decompression of a single member.
+"""
+import gzip
+import itertools
+import json
+import logging
+import mmap
+import os
+import struct
+import uuid
+import zlib
+from datetime import date, datetime, timezone as dt_timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Submission, SubmissionArchive
+
+logger = logging.getLogger(__name__)
+
+_INDEX_RECORD = struct.Struct('>16sQ')
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_range(month: date) -> Tuple[datetime, datetime]:
+    """Return the [start, end) UTC datetimes of a month."""
+    start = datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+    end_month = add_months(month, 1)
+    return start, datetime(end_month.year, end_month.month, 1, tzinfo=dt_timezone.utc)
+
+
+def archive_cutoff(older_than_months: Optional[int] = None, now: Optional[datetime] = None) -> date:
+    """Return the first month kept in the database; every earlier month is archived."""
+    if older_than_months is None:
+        older_than_months = settings.SUBMISSION_ARCHIVE['older_than_months']
+    now = (now or timezone.now()).astimezone(dt_timezone.utc)
+    return add_months(date(now.year, now.month, 1), 1 - older_than_months)
+
+
+def serialize_submission(submission: Submission) -> Dict[str, Any]:
+    return {
+        'id': str(submission.id),
+        'user_id': submission.user_id,
+        'mission_id': submission.mission_id,
+        'language': submission.language,
+        'code': submission.code,
+        'status': submission.status,
+        'output': submission.output,
+        'error': submission.error,
+        'created_at': submission.created_at,
+        'completed_at': submission.completed_at,
+        'test_results': [
+            {
+                'passed': result.passed,
+                'input': result.input,
+                'expected': result.expected,
+                'actual': result.actual,
+                **({'diff': result.diff} if result.diff is not None else {}),
+            }
+            for result in submission.test_results.all()
+        ],
+    }
+
+
+def _chunks(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _write_durably(path: str, chunks: Iterable[bytes]) -> int:
+    """Write a file under a temporary name and move it into place once synced."""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as out:
+        for chunk in chunks:
+            out.write(chunk)
+        size = out.tell()
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp_path, path)
+    return size
+
+
+def archive_month(month: date, root: Optional[str] = None) -> SubmissionArchive:
+    """
+    Export the submissions of a month to a compressed archive and delete them.
+
+    Args:
+        month: First day of the month to archive
+        root: Directory to write the archive to
+
+    Returns:
+        The SubmissionArchive recording the export
+    """
+    config = settings.SUBMISSION_ARCHIVE
+    root = root or config['root']
+    os.makedirs(root, exist_ok=True)
+    name = f'submissions-{month:%Y-%m}'
+    path = os.path.join(root, f'{name}.jsonl.gz')
+    index_path = os.path.join(root, f'{name}.idx')
+
+    start, end = month_range(month)
+    submissions = (
+        Submission.objects
+        .filter(created_at__gte=start, created_at__lt=end)
+        .order_by('created_at', 'id')
+        .prefetch_related('test_results')
+        .iterator(chunk_size=config['member_rows'])
+    )
+
+    entries: List[Tuple[bytes, int]] = []
+
+    def members() -> Iterator[bytes]:
+        offset = 0
+        for chunk in _chunks(submissions, config['member_rows']):
+            lines = [
+                json.dumps(serialize_submission(submission), cls=DjangoJSONEncoder).encode() + b'\n'
+                for submission in chunk
+            ]
+            member = gzip.compress(b''.join(lines), compresslevel=6)
+            entries.extend((submission.id.bytes, offset) for submission in chunk)
+            offset += len(member)
+            yield member
+
+    _write_durably(path, members())
+    entries.sort()
+    _write_durably(index_path, (_INDEX_RECORD.pack(*entry) for entry in entries))
+
+    archive = SubmissionArchive.objects.create(
+        month=month, path=path, index_path=index_path, row_count=len(entries)
+    )
+    logger.info(f"Archived {len(entries)} submissions of {month:%Y-%m} to {path}")
+    purge_archived(archive)
+    return archive
+
+
+def _iter_index(index_path: str) -> Iterator[Tuple[bytes, int]]:
+    with open(index_path, 'rb') as f:
+        while True:
+            record = f.read(_INDEX_RECORD.size)
+            if len(record) < _INDEX_RECORD.size:
+                return
+            yield _INDEX_RECORD.unpack(record)
+
+
+def purge_archived(archive: SubmissionArchive) -> int:
+    """
+    Delete the archived submissions of a month from the database in batches.
+
+    Only rows listed in the archive index are deleted, so the purge can be
+    resumed after an interruption and never loses a row written to the
+    month after it was exported.
+
+    Returns:
+        Number of submissions deleted
+    """
+    deleted = 0
+    ids = (uuid.UUID(bytes=key) for key, _ in _iter_index(archive.index_path))
+    for batch in _chunks(ids, settings.SUBMISSION_ARCHIVE['delete_batch_size']):
+        _, counts = Submission.objects.filter(id__in=batch).delete()
+        deleted += counts.get(Submission._meta.label, 0)
+    return deleted
+
+
+def archive_old_submissions(older_than_months: Optional[int] = None,
+                            root: Optional[str] = None) -> List[SubmissionArchive]:
+    """
+    Archive every month older than the retention window.
+
+    Months that already have an archive (an interrupted run) are only purged.
+    """
+    cutoff = month_range(archive_cutoff(older_than_months))[0]
+    months = [
+        value.date()
+        for value in Submission.objects.filter(created_at__lt=cutoff)
+        .datetimes('created_at', 'month', tzinfo=dt_timezone.utc)
+    ]
+    archives = []
+    for month in months:
+        archive = SubmissionArchive.objects.filter(month=month).first()
+        if archive is None:
+            archive = archive_month(month, root=root)
+        else:
+            purge_archived(archive)
+            start, end = month_range(month)
+            remaining = Submission.objects.filter(created_at__gte=start, created_at__lt=end).count()
+            if remaining:
+                logger.warning(
+                    f"{remaining} submissions of {month:%Y-%m} were created after it was archived"
+                )
+        archives.append(archive)
+    return archives
+
+
+def _index_lookup(index_path: str, key: bytes) -> Optional[int]:
+    """Binary search the sorted index for a UUID and return its member offset."""
+    try:
+        f = open(index_path, 'rb')
+    except FileNotFoundError:
+        logger.error(f"Archive index {index_path} is missing")
+        return None
+    with f:
+        count = os.fstat(f.fileno()).st_size // _INDEX_RECORD.size
+        if not count:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as index:
+            low, high = 0, count
+            while low < high:
+                middle = (low + high) // 2
+                record_key, offset = _INDEX_RECORD.unpack_from(index, middle * _INDEX_RECORD.size)
+                if record_key < key:
+                    low = middle + 1
+                elif record_key > key:
+                    high = middle
+                else:
+                    return offset
+    return None
+
+
+def _read_member(path: str, offset: int) -> Iterator[Dict[str, Any]]:
+    """Decompress the single gzip member starting at ``offset``."""
+    decompressor = zlib.decompressobj(wbits=31)
+    data = []
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while not decompressor.eof:
+            block = f.read(64 * 1024)
+            if not block:
+                break
+            data.append(decompressor.decompress(block))
+    for line in b''.join(data).splitlines():
+        yield json.loads(line)
+
+
+def load_archived_submission(submission_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Fetch one submission from the archives, or None if it was never archived.
+
+    Only the index of each archive and the gzip member holding the record
+    are read.
+    """
+    try:
+        key = uuid.UUID(str(submission_id))
+    except ValueError:
+        return None
+    for archive in SubmissionArchive.objects.all():
+        offset = _index_lookup(archive.index_path, key.bytes)
+        if offset is None:
+            continue
+        for record in _read_member(archive.path, offset):
+            if record['id'] == str(key):
+                return record
+    return None
@@ -0,0 +1,89 @@
+"""
+Building templates, mirroring ``BUILDING_TEMPLATES`` in the base page of
+the frontend. Production amounts are per minute, footprints are (width,
+height) in grid cells from the building's position, and attack stats are
+per combat tick (see ``core.combat``).
+"""
+from typing import Any, Dict, Optional, Tuple
+
+RESOURCE_TYPES = ('credits', 'minerals', 'energy', 'research_points')
+
+BUILDING_TEMPLATES: Dict[str, Dict[str, Any]] = {
+    'command_center': {
+        'name': 'Command Center',
+        'base_cost': {'credits': 1000, 'minerals': 500, 'energy': 200},
+        'base_production': None,
+        'base_health': 1000,
+        'upgrade_multiplier': 1.5,
+        'construction_time': 300,
+        'upgrade_cooldown': 600,
+        'max_level': 5,
+        'footprint': (1, 1),
+        'attack': None,
+    },
+    'resource_collector': {
+        'name': 'Resource Collector',
+        'base_cost': {'credits': 500, 'minerals': 300, 'energy': 100},
+        'base_production': {'type': 'credits', 'amount': 10},
+        'base_health': 500,
+        'upgrade_multiplier': 1.3,
+        'construction_time': 180,
+        'upgrade_cooldown': 300,
+        'max_level': 10,
+        'footprint': (1, 1),
+        'attack': None,
+    },
+    'defense_turret': {
+        'name': 'Defense Turret',
+        'base_cost': {'credits': 800, 'minerals': 400, 'energy': 150},
+        'base_production': None,
+        'base_health': 800,
+        'upgrade_multiplier': 1.4,
+        'construction_time': 240,
+        'upgrade_cooldown': 480,
+        'max_level': 8,
+        'footprint': (1, 1),
+        'attack': {'damage': 30, 'range': 4.0, 'cooldown': 2},
+    },
+}
+
+
+def production(building_type: str, level: int) -> Optional[Tuple[str, float]]:
+    """
+    Return what a building produces at a level.
+
+    Returns:
+        Tuple of (resource, amount per minute), or None for non-producers
+    """
+    template = BUILDING_TEMPLATES[building_type]
+    if not template['base_production']:
+        return None
+    base = template['base_production']
+    return base['type'], base['amount'] * template['upgrade_multiplier'] ** (level - 1)
+
+
+def producers_of(resource: str) -> Dict[str, Dict[str, Any]]:
+    """Return the templates of the building types producing a resource."""
+    return {
+        building_type: template
+        for building_type, template in BUILDING_TEMPLATES.items()
+        if template['base_production'] and template['base_production']['type'] == resource
+    }
+
+
+def upgrade_cost(building_type: str, level: int) -> Dict[str, float]:
+    """Return the cost of upgrading a building from ``level`` to the next level."""
+    template = BUILDING_TEMPLATES[building_type]
+    factor = template['upgrade_multiplier'] ** level
+    return {resource: amount * factor for resource, amount in template['base_cost'].items()}
+
+
+def upgrade_duration(building_type: str, level: int) -> float:
+    """Return the seconds an upgrade from ``level`` to the next level takes."""
+    template = BUILDING_TEMPLATES[building_type]
+    return template['construction_time'] * template['upgrade_multiplier'] ** level
+
+
+def max_health(building_type: str, level: int) -> int:
+    template = BUILDING_TEMPLATES[building_type]
+    return round(template['base_health'] * template['upgrade_multiplier'] ** (level - 1))
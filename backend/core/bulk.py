@@ -0,0 +1,136 @@
+"""
+Bulk submission batches (used for rejudging).
+
+A batch is queued in Redis in a few pipelined LPUSH round-trips rather
+than one API call per submission. ``dispatch_batch_task`` then drains it
+in throttled chunks, sending each chunk to Celery as a group at low
+priority. Progress is an aggregate counter hash, so one read answers
+"how far along is this rejudge" whatever the batch size.
+"""
+import json
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .persistence import append_event, created_event
+from .redis_client import get_redis
+
+# Number of items per LPUSH in the enqueue pipeline
+ENQUEUE_CHUNK = 1000
+
+
+def batch_progress_key(batch_id: str) -> str:
+    return f'rejudge:{batch_id}'
+
+
+def batch_pending_key(batch_id: str) -> str:
+    return f'rejudge:{batch_id}:pending'
+
+
+def create_batch(submissions: List[Dict[str, Any]], priority: Optional[int] = None,
+                 chunk_size: Optional[int] = None, interval: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Queue a batch of submissions for throttled execution.
+
+    Args:
+        submissions: Dicts with ``code``, ``language``, optional ``test_cases``
+            and an optional ``submission_id`` to rejudge in place
+        priority: Celery priority (0 highest, 9 lowest)
+        chunk_size: Submissions dispatched per tick
+        interval: Seconds between dispatch ticks
+
+    Returns:
+        Dict with the ``batch_id`` and the ``submission_ids`` in input order
+    """
+    config = settings.REJUDGE_CONFIG
+    batch_id = str(uuid.uuid4())
+    ttl = config['progress_ttl']
+
+    items = []
+    new_items = []
+    for submission in submissions:
+        item = {
+            'submission_id': str(submission.get('submission_id') or uuid.uuid4()),
+            'code': submission['code'],
+            'language': submission['language'],
+            'test_cases': submission.get('test_cases') or [],
+        }
+        items.append(item)
+        if not submission.get('submission_id'):
+            new_items.append(item)
+
+    cache.set_many(
+        {f"submission_{item['submission_id']}": {'status': 'pending'} for item in items},
+        timeout=ttl
+    )
+
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.hset(batch_progress_key(batch_id), mapping={
+        'total': len(items),
+        'dispatched': 0,
+        'completed': 0,
+        'failed': 0,
+        'priority': config['priority'] if priority is None else priority,
+        'chunk_size': chunk_size or config['chunk_size'],
+        'interval': config['interval'] if interval is None else interval,
+        'created_at': time.time(),
+    })
+    for start in range(0, len(items), ENQUEUE_CHUNK):
+        chunk = items[start:start + ENQUEUE_CHUNK]
+        pipe.lpush(batch_pending_key(batch_id), *(json.dumps(item) for item in chunk))
+    for item in new_items:
+        append_event(created_event(item['submission_id'], item['language'], item['code']), pipe)
+    pipe.expire(batch_progress_key(batch_id), ttl)
+    pipe.expire(batch_pending_key(batch_id), ttl)
+    pipe.execute()
+
+    return {'batch_id': batch_id, 'submission_ids': [item['submission_id'] for item in items]}
+
+
+def pop_pending(batch_id: str, count: int) -> List[Dict[str, Any]]:
+    """Take up to ``count`` queued submissions off a batch, oldest first."""
+    raw = get_redis().rpop(batch_pending_key(batch_id), count) or []
+    return [json.loads(item) for item in raw]
+
+
+def record_dispatched(batch_id: str, count: int):
+    get_redis().hincrby(batch_progress_key(batch_id), 'dispatched', count)
+
+
+def get_batch_settings(batch_id: str) -> Optional[Dict[str, Any]]:
+    """Return the dispatch settings and in-flight count of a batch, or None if it has expired."""
+    raw = get_redis().hmget(
+        batch_progress_key(batch_id), 'priority', 'chunk_size', 'interval', 'dispatched', 'completed'
+    )
+    if raw[0] is None:
+        return None
+    return {
+        'priority': int(raw[0]),
+        'chunk_size': int(raw[1]),
+        'interval': float(raw[2]),
+        'in_flight': int(raw[3]) - int(raw[4]),
+    }
+
+
+def get_batch_progress(batch_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the aggregate progress counters of a batch.
+
+    Returns:
+        Dict with ``total``, ``dispatched``, ``completed``, ``failed``,
+        ``pending`` and ``done``, or None if the batch is unknown
+    """
+    raw = get_redis().hgetall(batch_progress_key(batch_id))
+    if not raw:
+        return None
+    progress = {key.decode(): value.decode() for key, value in raw.items()}
+    counters = {
+        name: int(progress.get(name, 0))
+        for name in ('total', 'dispatched', 'completed', 'failed')
+    }
+    counters['pending'] = counters['total'] - counters['dispatched']
+    counters['done'] = counters['completed'] >= counters['total']
+    return {'batch_id': batch_id, **counters}
@@ -0,0 +1,216 @@
+"""
+Building placement, construction and upgrades.
+
+Changes to a base's buildings lock its ``PlayerBase`` row and check and
+update its occupancy bitmap (see ``core.occupancy``) in the same
+transaction.
+
+Timers are delayed events (see ``core.scheduler``): placing a building
+schedules a ``construction_complete`` event and starting an upgrade an
+``upgrade_complete`` one. Their handlers take a whole batch of buildings
+and are idempotent, since an event can be delivered more than once.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import List, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from .buildings import BUILDING_TEMPLATES, max_health, upgrade_cost, upgrade_duration
+from .db_router import use_primary
+from .economy import checkpoint
+from .models import Building, PlayerBase
+from .occupancy import OccupancyGrid, cache_grid, footprint, get_grid, load_grid
+from .scheduler import cancel, schedule
+
+CONSTRUCTION_COMPLETE = 'construction_complete'
+UPGRADE_COMPLETE = 'upgrade_complete'
+
+MAX_FOOTPRINT = max(max(t['footprint']) for t in BUILDING_TEMPLATES.values())
+
+
+class BuildingError(Exception):
+    pass
+
+
+def _save_grid(base: PlayerBase, grid: OccupancyGrid):
+    base.occupancy = grid.to_bytes()
+    base.save(update_fields=['occupancy', 'updated_at'])
+    transaction.on_commit(lambda: cache_grid(base.id, grid))
+
+
+def place_building(base: PlayerBase, building_type: str, x: int, y: int,
+                   now: Optional[datetime] = None) -> Building:
+    """
+    Pay for a building and start constructing it at ``(x, y)``.
+
+    Raises:
+        BuildingError: If the footprint is off the grid or overlaps a building
+        InsufficientResources: If the base cannot afford the building
+    """
+    now = now or timezone.now()
+    template = BUILDING_TEMPLATES[building_type]
+    with use_primary(), transaction.atomic():
+        base = PlayerBase.objects.select_for_update().get(id=base.id)
+        grid = load_grid(base)
+        if not grid.is_free(x, y, *footprint(building_type)):
+            raise BuildingError("Position is taken or off the grid")
+        checkpoint(base, template['base_cost'], now=now)
+        building = Building.objects.create(
+            base=base, type=building_type, x=x, y=y,
+            health=max_health(building_type, 1), max_health=max_health(building_type, 1),
+            state='constructing',
+            active_from=now + timedelta(seconds=template['construction_time'])
+        )
+        grid.occupy(x, y, *footprint(building_type))
+        _save_grid(base, grid)
+        transaction.on_commit(
+            lambda: schedule(CONSTRUCTION_COMPLETE, str(building.id), building.active_from)
+        )
+    return building
+
+
+def move_building(building: Building, x: int, y: int) -> Building:
+    """
+    Move a building to ``(x, y)``.
+
+    Raises:
+        BuildingError: If the new footprint is off the grid or overlaps another building
+    """
+    with use_primary(), transaction.atomic():
+        base = PlayerBase.objects.select_for_update().get(id=building.base_id)
+        building = Building.objects.get(id=building.id)
+        grid = load_grid(base)
+        w, h = footprint(building.type)
+        grid.release(building.x, building.y, w, h)
+        if not grid.is_free(x, y, w, h):
+            raise BuildingError("Position is taken or off the grid")
+        grid.occupy(x, y, w, h)
+        building.x, building.y = x, y
+        building.save(update_fields=['x', 'y'])
+        _save_grid(base, grid)
+    return building
+
+
+def remove_building(building: Building):
+    """Demolish a building, folding in what it produced first."""
+    with use_primary(), transaction.atomic():
+        base = PlayerBase.objects.select_for_update().get(id=building.base_id)
+        building = Building.objects.get(id=building.id)
+        building_id = str(building.id)
+        checkpoint(base)
+        grid = load_grid(base)
+        grid.release(building.x, building.y, *footprint(building.type))
+        building.delete()
+        _save_grid(base, grid)
+
+        def cancel_timers():
+            cancel(CONSTRUCTION_COMPLETE, building_id)
+            cancel(UPGRADE_COMPLETE, building_id)
+        transaction.on_commit(cancel_timers)
+
+
+def building_neighbours(building: Building) -> List[Building]:
+    """Return the buildings bordering a building, looked up only where the grid says."""
+    grid = get_grid(building.base)
+    cells = set(grid.neighbours(building.x, building.y, *footprint(building.type)))
+    if not cells:
+        return []
+    xs = [x for x, _ in cells]
+    ys = [y for _, y in cells]
+    candidates = Building.objects.filter(
+        base_id=building.base_id, x__range=(min(xs) - MAX_FOOTPRINT + 1, max(xs)),
+        y__range=(min(ys) - MAX_FOOTPRINT + 1, max(ys))
+    ).exclude(id=building.id)
+    return [
+        candidate for candidate in candidates
+        if any(cell in cells for cell in _covered(candidate))
+    ]
+
+
+def _covered(building: Building):
+    w, h = footprint(building.type)
+    return ((building.x + dx, building.y + dy) for dx in range(w) for dy in range(h))
+
+
+def start_upgrade(building: Building, now: Optional[datetime] = None) -> Building:
+    """
+    Pay for and start upgrading a building to the next level.
+
+    The building keeps producing at its current level until the upgrade
+    completes, and can be upgraded again once the cooldown after that ends.
+
+    Raises:
+        BuildingError: If the building cannot be upgraded right now
+        InsufficientResources: If the base cannot afford the upgrade
+    """
+    now = now or timezone.now()
+    template = BUILDING_TEMPLATES[building.type]
+    with use_primary(), transaction.atomic():
+        building = Building.objects.select_for_update().get(id=building.id)
+        # A finished construction whose event has not fired yet is not busy
+        if building.state == 'upgrading' or building.active_from > now:
+            raise BuildingError("Building is busy")
+        if building.level >= template['max_level']:
+            raise BuildingError("Building is at its maximum level")
+        if building.cooldown_until and building.cooldown_until > now:
+            raise BuildingError("Building is cooling down")
+
+        checkpoint(building.base, upgrade_cost(building.type, building.level), now=now)
+        building.state = 'upgrading'
+        building.upgrade_completes_at = now + timedelta(
+            seconds=upgrade_duration(building.type, building.level)
+        )
+        building.cooldown_until = building.upgrade_completes_at + timedelta(
+            seconds=template['upgrade_cooldown']
+        )
+        building.save(update_fields=['state', 'upgrade_completes_at', 'cooldown_until'])
+        due_at = building.upgrade_completes_at
+        transaction.on_commit(lambda: schedule(UPGRADE_COMPLETE, str(building.id), due_at))
+    return building
+
+
+def complete_constructions(building_ids: List[str], now: float):
+    """Mark buildings whose construction has finished active."""
+    at = datetime.fromtimestamp(now, tz=dt_timezone.utc)
+    with use_primary():
+        Building.objects.filter(
+            id__in=building_ids, state='constructing', active_from__lte=at
+        ).update(state='active')
+
+
+def complete_upgrades(building_ids: List[str], now: float):
+    """
+    Apply the next level of buildings whose upgrade has finished.
+
+    Each base is checkpointed first, in the same transaction, so production
+    so far is folded in at the rates the closed form already used.
+    """
+    at = datetime.fromtimestamp(now, tz=dt_timezone.utc)
+    with use_primary():
+        by_base = defaultdict(list)
+        for building_id, base_id in Building.objects.filter(
+            id__in=building_ids, state='upgrading', upgrade_completes_at__lte=at
+        ).values_list('id', 'base_id'):
+            by_base[base_id].append(building_id)
+        for base_id, ids in by_base.items():
+            with transaction.atomic():
+                checkpoint(PlayerBase(id=base_id))
+                for building in Building.objects.select_for_update().filter(
+                    id__in=ids, state='upgrading'
+                ):
+                    building.level += 1
+                    building.max_health = max_health(building.type, building.level)
+                    building.health = building.max_health
+                    building.state = 'active'
+                    building.upgrade_completes_at = None
+                    building.save(update_fields=[
+                        'level', 'max_health', 'health', 'state', 'upgrade_completes_at'
+                    ])
+
+
+EVENT_HANDLERS = {
+    CONSTRUCTION_COMPLETE: complete_constructions,
+    UPGRADE_COMPLETE: complete_upgrades,
+}
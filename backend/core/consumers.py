@@ -0,0 +1,130 @@
+"""WebSocket consumers."""
+import struct
+
+from asgiref.sync import sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .match_state import get_players, get_snapshot, get_spectator_view, match_group, set_ready
+from .presence import LOBBY_GROUP, heartbeat
+from .replay import spectator_group
+
+# Close codes sent to clients that may not join a match
+CLOSE_UNAUTHENTICATED = 4401
+CLOSE_NOT_A_PLAYER = 4403
+CLOSE_NO_MATCH = 4404
+
+# Binary spectator frames: byte offset in the replay log, then log bytes
+FRAME_HEADER = struct.Struct('>I')
+
+
+class MatchConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Live state of one PvP match for its players.
+
+    The client receives a ``snapshot`` on connect and then the deltas
+    broadcast to the match group (see ``core.match_state``). It may send
+    ``{"type": "ready"}``.
+    """
+
+    async def connect(self):
+        self.match_id = str(self.scope['url_route']['kwargs']['match_id'])
+        self.group_name = match_group(self.match_id)
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=CLOSE_UNAUTHENTICATED)
+            return
+        self.player_id = str(user.id)
+        players = await sync_to_async(get_players)(self.match_id)
+        if not players or self.player_id not in players:
+            await self.close(code=CLOSE_NOT_A_PLAYER)
+            return
+
+        # Join the group before reading the snapshot so no delta falls in between
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        snapshot = await sync_to_async(get_snapshot)(self.match_id)
+        if snapshot is None:
+            await self.close(code=CLOSE_NOT_A_PLAYER)
+            return
+        await self.send_json({'type': 'snapshot', 'seq': snapshot['seq'], 'match': snapshot})
+
+    async def disconnect(self, code):
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        if content.get('type') == 'ready':
+            await sync_to_async(set_ready)(self.match_id, self.player_id)
+
+    async def match_delta(self, event):
+        await self.send_json(event['delta'])
+
+
+class SpectatorConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Event stream of one PvP match for spectators.
+
+    On connect the client receives a ``snapshot`` of the match, whose
+    ``offset`` is the length of the replay log it covers, followed by a
+    binary frame with the log so far. Each event after that arrives as a
+    binary frame holding its offset and bytes (see ``core.replay``); bytes
+    before the client's log length are duplicates and are skipped.
+    """
+
+    async def connect(self):
+        self.match_id = str(self.scope['url_route']['kwargs']['match_id'])
+        self.group_name = spectator_group(self.match_id)
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=CLOSE_UNAUTHENTICATED)
+            return
+
+        # Join the group before reading so no event falls in between
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        snapshot, log = await sync_to_async(get_spectator_view)(self.match_id)
+        if snapshot is None:
+            await self.close(code=CLOSE_NO_MATCH)
+            return
+        await self.send_json({'type': 'snapshot', 'offset': len(log), 'match': snapshot})
+        await self.send(bytes_data=FRAME_HEADER.pack(0) + log)
+
+    async def disconnect(self, code):
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def replay_chunk(self, event):
+        await self.send(bytes_data=FRAME_HEADER.pack(event['offset']) + event['data'])
+
+
+class LobbyConsumer(AsyncJsonWebsocketConsumer):
+    """
+    PvP lobby presence.
+
+    The client sends ``{"type": "heartbeat"}`` every
+    ``PRESENCE['heartbeat_interval']`` seconds to stay online and receives
+    a ``player_status`` message whenever a player's status changes. A
+    closed socket needs no cleanup: the player drops out once their last
+    heartbeat is older than the TTL.
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=CLOSE_UNAUTHENTICATED)
+            return
+        self.user_id = user.id
+        await self.channel_layer.group_add(LOBBY_GROUP, self.channel_name)
+        await self.accept()
+        await sync_to_async(heartbeat)(self.user_id)
+
+    async def disconnect(self, code):
+        await self.channel_layer.group_discard(LOBBY_GROUP, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        if content.get('type') == 'heartbeat':
+            await sync_to_async(heartbeat)(self.user_id)
+
+    async def presence_status(self, event):
+        await self.send_json({
+            'type': 'player_status',
+            'payload': {'playerId': str(event['user_id']), 'status': event['status']},
+        })
@@ -0,0 +1,98 @@
+"""
+Primary/replica database routing.
+
+Writes always go to ``default`` (the primary). Reads go to one of
+``DATABASE_ROUTING['replicas']`` unless the current request is pinned to
+the primary, which happens for:
+
+- the whole of any non-safe request (POST, PUT, ...), and
+- reads by a user who submitted within the last ``sticky_seconds``, so a
+  user always sees their own writes despite replication (and write-behind)
+  lag. The window is recorded in the cache with ``record_write``.
+
+Pinning lives in a context variable that ``replica_routing_middleware``
+resets per request; code outside requests (Celery tasks, management
+commands) reads from the replicas unless it enters ``use_primary()``.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.decorators import sync_and_async_middleware
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_pinned: ContextVar[bool] = ContextVar('db_pinned_to_primary', default=False)
+
+
+def recent_write_key(user_id: int) -> str:
+    return f'db_recent_write_{user_id}'
+
+
+def pin_to_primary():
+    """Send the remaining reads of the current request to the primary."""
+    _pinned.set(True)
+
+
+@contextmanager
+def use_primary() -> Iterator[None]:
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def record_write(user_id: Optional[int]):
+    """Pin the user's reads to the primary for the stickiness window."""
+    if user_id is not None:
+        cache.set(recent_write_key(user_id), True, timeout=settings.DATABASE_ROUTING['sticky_seconds'])
+
+
+def pin_if_recent_write(user_id: Optional[int]):
+    if user_id is not None and cache.get(recent_write_key(user_id)):
+        pin_to_primary()
+
+
+class PrimaryReplicaRouter:
+    """Route reads to a replica and writes to the primary."""
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_ROUTING['replicas']
+        if not replicas or _pinned.get():
+            return 'default'
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+@sync_and_async_middleware
+def replica_routing_middleware(get_response):
+    """Give every request its own pinning state, pinned for non-safe methods."""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = _pinned.set(request.method not in SAFE_METHODS)
+            try:
+                return await get_response(request)
+            finally:
+                _pinned.reset(token)
+    else:
+        def middleware(request):
+            token = _pinned.set(request.method not in SAFE_METHODS)
+            try:
+                return get_response(request)
+            finally:
+                _pinned.reset(token)
+    return middleware
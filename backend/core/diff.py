@@ -0,0 +1,248 @@
+"""
+Bounded diffs between expected and actual test output.
+
+Failed test cases carry a small, windowed diff instead of leaving the
+client to compare potentially huge strings. The edit script comes from
+Myers' O((N+M)D) algorithm with the edit distance D capped, so both the
+work done here and the size of the result are bounded whatever the size
+of the output.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+DEFAULT_DIFF_CONFIG = {
+    'max_hunks': 3,
+    'context_lines': 2,
+    'max_hunk_lines': 20,
+    'max_line_length': 200,
+    'max_edit_distance': 64,
+    'max_value_length': 1000,
+}
+
+ELLIPSIS = '…'
+
+
+def get_diff_config() -> Dict[str, int]:
+    """Return the diff limits, with settings overriding the defaults."""
+    return {**DEFAULT_DIFF_CONFIG, **getattr(settings, 'RESULT_DIFF_CONFIG', {})}
+
+
+def clip_text(text: str, limit: int, center: int = 0) -> str:
+    """
+    Clip text to at most ``limit`` characters, keeping a window around ``center``.
+
+    Args:
+        text: Text to clip
+        limit: Maximum number of characters to keep
+        center: Index the kept window should contain
+
+    Returns:
+        The clipped text, with an ellipsis marking each removed side
+    """
+    if len(text) <= limit:
+        return text
+    start = max(0, min(center - limit // 2, len(text) - limit))
+    end = start + limit
+    return (ELLIPSIS if start > 0 else '') + text[start:end] + (ELLIPSIS if end < len(text) else '')
+
+
+def clip_value(value: Any, limit: Optional[int] = None) -> Any:
+    """Clip string values for the result payload, leaving other JSON values as they are."""
+    if not isinstance(value, str):
+        return value
+    return clip_text(value, limit or get_diff_config()['max_value_length'])
+
+
+def _first_difference(a: str, b: str) -> int:
+    """Return the index of the first character where the two strings differ."""
+    for index, (x, y) in enumerate(zip(a, b)):
+        if x != y:
+            return index
+    return min(len(a), len(b))
+
+
+def _edit_script(a: List[str], b: List[str], max_d: int) -> Optional[List[Tuple]]:
+    """
+    Compute a shortest edit script between two line lists.
+
+    Only the furthest-reaching frontier of each diagonal is kept per edit
+    step, so memory is O(D^2) in the capped edit distance rather than
+    O(N*M) in the input size.
+
+    Returns:
+        A list of ``('=', a_start, b_start, length)``, ``('-', a_index)`` and
+        ``('+', b_index)`` operations, or None if more than ``max_d`` edits
+        are needed
+    """
+    n, m = len(a), len(b)
+    v = {1: 0}
+    trace = []
+    for d in range(max_d + 1):
+        trace.append(dict(v))
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1]
+            else:
+                x = v[k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[k] = x
+            if x >= n and y >= m:
+                return _backtrack(trace, n, m)
+    return None
+
+
+def _backtrack(trace: List[Dict[int, int]], n: int, m: int) -> List[Tuple]:
+    """Walk the recorded frontiers backwards to recover the edit script."""
+    ops: List[Tuple] = []
+    x, y = n, m
+    for d in range(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[k - 1] < v[k + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[prev_k]
+        prev_y = prev_x - prev_k
+        run = min(x - prev_x, y - prev_y)
+        if run > 0:
+            ops.append(('=', x - run, y - run, run))
+            x -= run
+            y -= run
+        if d > 0:
+            if x == prev_x:
+                ops.append(('+', y - 1))
+            else:
+                ops.append(('-', x - 1))
+        x, y = prev_x, prev_y
+    ops.reverse()
+    return ops
+
+
+def _changes(ops: List[Tuple], offset: int) -> List[Tuple[str, int, int]]:
+    """
+    Flatten an edit script into ``(op, a_pos, b_pos)`` changes.
+
+    For a removal ``a_pos`` is the removed line and ``b_pos`` the current
+    position in the actual output; for an insertion it is the other way round.
+    """
+    changes = []
+    a_pos = b_pos = offset
+    for op in ops:
+        if op[0] == '=':
+            a_pos = offset + op[1] + op[3]
+            b_pos = offset + op[2] + op[3]
+        elif op[0] == '-':
+            a_pos = offset + op[1]
+            changes.append(('-', a_pos, b_pos))
+            a_pos += 1
+        else:
+            b_pos = offset + op[1]
+            changes.append(('+', a_pos, b_pos))
+            b_pos += 1
+    return changes
+
+
+def _build_hunks(a: List[str], b: List[str], changes: List[Tuple[str, int, int]],
+                 config: Dict[str, int]) -> Tuple[List[Dict[str, Any]], bool]:
+    """Group changes into hunks with surrounding context, within the configured limits."""
+    context = config['context_lines']
+    groups: List[List[Tuple[str, int, int]]] = []
+    for change in changes:
+        if groups:
+            last = groups[-1][-1]
+            last_end = last[1] + 1 if last[0] == '-' else last[1]
+            if change[1] - last_end <= 2 * context:
+                groups[-1].append(change)
+                continue
+        groups.append([change])
+
+    truncated = len(groups) > config['max_hunks']
+    hunks = []
+    for group in groups[:config['max_hunks']]:
+        first, last = group[0], group[-1]
+        lead = min(context, first[1], first[2])
+        lines = [[' ', a[i]] for i in range(first[1] - lead, first[1])]
+        a_pos = first[1]
+        for op, a_index, b_index in group:
+            lines.extend([' ', a[i]] for i in range(a_pos, a_index))
+            if op == '-':
+                lines.append(['-', a[a_index]])
+                a_pos = a_index + 1
+            else:
+                lines.append(['+', b[b_index]])
+                a_pos = a_index
+        last_end = last[1] + 1 if last[0] == '-' else last[1]
+        lines.extend([' ', a[i]] for i in range(last_end, min(last_end + context, len(a))))
+        if len(lines) > config['max_hunk_lines']:
+            lines = lines[:config['max_hunk_lines']]
+            truncated = True
+        hunks.append({
+            'expected_start': first[1] - lead + 1,
+            'actual_start': first[2] - lead + 1,
+            'lines': lines,
+        })
+    return hunks, truncated
+
+
+def _clip_hunk_lines(hunk: Dict[str, Any], limit: int) -> None:
+    """Clip long lines, centring removed/added pairs on their first difference."""
+    removed = [line for line in hunk['lines'] if line[0] == '-']
+    added = [line for line in hunk['lines'] if line[0] == '+']
+    center = 0
+    if removed and added:
+        center = _first_difference(removed[0][1], added[0][1])
+    for line in hunk['lines']:
+        line[1] = clip_text(line[1], limit, center if line[0] != ' ' else 0)
+
+
+def bounded_diff(expected: str, actual: str, config: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """
+    Build a capped, windowed line diff between expected and actual output.
+
+    Args:
+        expected: The expected output
+        actual: The output the submission produced
+        config: Optional overrides for the limits in ``RESULT_DIFF_CONFIG``
+
+    Returns:
+        Dict with a list of ``hunks`` (1-based ``expected_start`` and
+        ``actual_start`` plus ``[op, text]`` lines, where op is ``' '``, ``'-'``
+        or ``'+'``) and a ``truncated`` flag set when limits cut the diff short
+    """
+    config = {**get_diff_config(), **(config or {})}
+    a = expected.split('\n')
+    b = actual.split('\n')
+
+    # Trim the common prefix and suffix so the capped search only spends
+    # its budget on the region that actually differs.
+    prefix = 0
+    while prefix < len(a) and prefix < len(b) and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while (suffix < len(a) - prefix and suffix < len(b) - prefix
+           and a[-1 - suffix] == b[-1 - suffix]):
+        suffix += 1
+
+    a_mid = a[prefix:len(a) - suffix]
+    b_mid = b[prefix:len(b) - suffix]
+    if not a_mid and not b_mid:
+        return {'hunks': [], 'truncated': False}
+
+    ops = _edit_script(a_mid, b_mid, config['max_edit_distance'])
+    exhausted = ops is None
+    if exhausted:
+        # Too different to align cheaply: report the first mismatching
+        # window as a single replacement and flag the diff as truncated.
+        window = config['max_hunk_lines']
+        ops = ([('-', i) for i in range(min(len(a_mid), window))]
+               + [('+', j) for j in range(min(len(b_mid), window))])
+
+    hunks, truncated = _build_hunks(a, b, _changes(ops, prefix), config)
+    for hunk in hunks:
+        _clip_hunk_lines(hunk, config['max_line_length'])
+    return {'hunks': hunks, 'truncated': truncated or exhausted}
@@ -0,0 +1,255 @@
+"""
+In-process stand-in for the Docker daemon, for benchmarking without one.
+
+With ``SANDBOX_CONFIG['backend'] = 'fake'`` the ``SandboxManager`` talks to
+a ``FakeDockerClient`` instead of ``docker.from_env()``. The fake covers
+the part of the docker-py client the manager uses (containers, images,
+``exec_run``, daemon info), so everything around it runs unchanged:
+Celery tasks, caches, metrics, tracing and the API.
+
+Nothing is executed. Every operation sleeps for a latency drawn from a
+profile of recorded samples, and fails the way Docker fails:
+
+- ``create_error``: ``containers.create`` raises ``APIError``;
+- ``timeout``: ``wait`` sleeps the whole timeout and raises
+  ``ReadTimeout``, as the Docker client does; ``exec_run`` returns the
+  124 of ``timeout(1)``;
+- ``oom``: the container exits with 137 and ``State.OOMKilled`` set.
+
+A profile is JSON with a list of latency samples (seconds) per phase
+(``create``, ``start``, ``wait``, ``logs``, ``remove``, ``exec``),
+output sizes in bytes (``output_bytes``) and a probability per failure
+mode (``failures``). ``DEFAULT_PROFILE`` is a small illustrative one;
+``manage.py record_sandbox_profile`` records the phases on a real daemon.
+``SANDBOX_CONFIG['fake_time_scale']`` scales every sleep, down to 0 to
+measure the orchestration overhead alone.
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from docker.errors import APIError, ImageNotFound, NotFound
+
+PHASES = ('create', 'start', 'wait', 'logs', 'remove', 'exec')
+FAILURES = ('create_error', 'timeout', 'oom')
+
+DEFAULT_PROFILE: Dict[str, Any] = {
+    'create': [0.041, 0.048, 0.055, 0.062, 0.07, 0.083, 0.11, 0.19],
+    'start': [0.18, 0.21, 0.23, 0.26, 0.29, 0.33, 0.41, 0.72],
+    'wait': [0.06, 0.08, 0.09, 0.11, 0.14, 0.2, 0.35, 1.2],
+    'logs': [0.002, 0.002, 0.003, 0.003, 0.004, 0.005, 0.008, 0.02],
+    'remove': [0.021, 0.025, 0.029, 0.033, 0.038, 0.046, 0.06, 0.12],
+    'exec': [0.035, 0.045, 0.05, 0.06, 0.075, 0.1, 0.2, 0.9],
+    'output_bytes': [16, 32, 64, 128, 256, 1024, 4096, 65536],
+    'failures': {'create_error': 0.001, 'timeout': 0.01, 'oom': 0.002},
+}
+
+
+def load_profile(path: Optional[str]) -> Dict[str, Any]:
+    """Load a recorded profile, falling back to the default for missing entries."""
+    profile = dict(DEFAULT_PROFILE)
+    if path:
+        with open(path) as f:
+            recorded = json.load(f)
+        profile.update(recorded)
+        profile['failures'] = {**DEFAULT_PROFILE['failures'], **recorded.get('failures', {})}
+    for phase in PHASES + ('output_bytes',):
+        if not profile[phase]:
+            raise ValueError(f"Sandbox profile has no '{phase}' samples")
+    unknown = set(profile['failures']) - set(FAILURES)
+    if unknown:
+        raise ValueError(f"Unknown sandbox failure modes: {', '.join(sorted(unknown))}")
+    return profile
+
+
+class Simulator:
+    """Draws latencies, output sizes and failures from a profile."""
+
+    def __init__(self, profile: Dict[str, Any], time_scale: float = 1.0,
+                 seed: Optional[int] = None):
+        self.profile = profile
+        self.time_scale = time_scale
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self, phase: str) -> float:
+        with self._lock:
+            return self.random.choice(self.profile[phase])
+
+    def fails(self, mode: str) -> bool:
+        with self._lock:
+            return self.random.random() < self.profile['failures'][mode]
+
+    def sleep(self, seconds: float):
+        if self.time_scale > 0:
+            time.sleep(seconds * self.time_scale)
+
+    def pause(self, phase: str):
+        self.sleep(self.sample(phase))
+
+    def output(self) -> bytes:
+        size = int(self.sample('output_bytes'))
+        # Lines of 63 characters and a newline, like a chatty program
+        return (b'x' * 63 + b'\n') * (size // 64) + b'x' * (size % 64)
+
+
+class FakeContainer:
+    def __init__(self, client: 'FakeDockerClient', config: Dict[str, Any]):
+        self.client = client
+        self.id = uuid.uuid4().hex + uuid.uuid4().hex
+        self.config = config
+        self.status = 'created'
+        self.attrs: Dict[str, Any] = {'State': {'Status': 'created', 'OOMKilled': False}}
+        self._state = dict(self.attrs['State'])
+        self._logs = b''
+        self._exit: Optional[Dict[str, Any]] = None
+
+    def _check(self):
+        if self.id not in self.client._containers:
+            raise NotFound(f"No such container: {self.id}")
+
+    def start(self):
+        self._check()
+        self.client.simulator.pause('start')
+        self.status = self._state['Status'] = 'running'
+
+    def wait(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        self._check()
+        simulator = self.client.simulator
+        if self._exit is None:
+            duration = simulator.sample('wait')
+            if simulator.fails('timeout'):
+                duration = float('inf')
+            if timeout is not None and duration > timeout:
+                simulator.sleep(timeout)
+                raise requests.exceptions.ReadTimeout(
+                    f"UnixHTTPConnectionPool(host='localhost', port=None): Read timed out. "
+                    f"(read timeout={timeout})"
+                )
+            simulator.sleep(duration)
+            if simulator.fails('oom'):
+                self._state['OOMKilled'] = True
+                self._exit = {'StatusCode': 137, 'Error': None}
+            else:
+                self._logs = simulator.output()
+                self._exit = {'StatusCode': 0, 'Error': None}
+            self.status = self._state['Status'] = 'exited'
+        return self._exit
+
+    def logs(self, **kwargs) -> bytes:
+        self._check()
+        self.client.simulator.pause('logs')
+        return self._logs
+
+    def reload(self):
+        self._check()
+        self.attrs = {'State': dict(self._state)}
+
+    def exec_run(self, cmd, **kwargs) -> Tuple[int, bytes]:
+        self._check()
+        if self.status != 'running':
+            raise APIError(f"Container {self.id} is not running")
+        simulator = self.client.simulator
+        # SandboxManager wraps commands in timeout(1); the rest only reap
+        # leftover processes and take no time
+        if not (isinstance(cmd, list) and cmd[:1] == ['timeout']):
+            return 0, b''
+        timeout = float(cmd[1])
+        duration = simulator.sample('exec')
+        if simulator.fails('timeout') or duration > timeout:
+            simulator.sleep(timeout)
+            return 124, b''
+        simulator.sleep(duration)
+        if simulator.fails('oom'):
+            return 137, b''
+        return 0, simulator.output()
+
+    def remove(self, force: bool = False, **kwargs):
+        self._check()
+        if self.status == 'running' and not force:
+            raise APIError(f"You cannot remove a running container {self.id}")
+        self.client.simulator.pause('remove')
+        self.client._containers.pop(self.id, None)
+
+
+class FakeContainers:
+    def __init__(self, client: 'FakeDockerClient'):
+        self.client = client
+
+    def create(self, image: str, command: Any = None, **kwargs) -> FakeContainer:
+        self.client.images.get(image)
+        simulator = self.client.simulator
+        simulator.pause('create')
+        if simulator.fails('create_error'):
+            raise APIError("Conflict: the container name is already in use (simulated)")
+        container = FakeContainer(self.client, {'image': image, 'command': command, **kwargs})
+        self.client._containers[container.id] = container
+        return container
+
+    def get(self, container_id: str) -> FakeContainer:
+        try:
+            return self.client._containers[container_id]
+        except KeyError:
+            raise NotFound(f"No such container: {container_id}")
+
+
+class FakeImage:
+    def __init__(self, name: str):
+        self.id = 'sha256:' + hashlib.sha256(name.encode()).hexdigest()
+        self.tags = [name if ':' in name else f'{name}:latest']
+
+
+class FakeImages:
+    def __init__(self, prefixes: Tuple[str, ...]):
+        self.prefixes = prefixes
+
+    def get(self, name: str) -> FakeImage:
+        if not name.startswith(self.prefixes):
+            raise ImageNotFound(f"No such image: {name}")
+        return FakeImage(name)
+
+
+class FakeAPI:
+    base_url = 'fake://sandbox'
+
+
+class FakeDockerClient:
+    """The subset of ``docker.DockerClient`` used by ``SandboxManager``."""
+
+    def __init__(self, simulator: Simulator, images: Tuple[str, ...] = ('kodewar-sandbox-',)):
+        self.simulator = simulator
+        self.api = FakeAPI()
+        self.containers = FakeContainers(self)
+        self.images = FakeImages(images)
+        self._containers: Dict[str, FakeContainer] = {}
+
+    def info(self) -> Dict[str, Any]:
+        # Containers live in this process only: workers in other processes
+        # must see another daemon and run match submissions cold
+        return {'ID': f'FAKE:{os.getpid()}', 'Name': 'fake-docker'}
+
+
+_clients: Dict[Tuple[Any, ...], FakeDockerClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(config: Dict[str, Any]) -> FakeDockerClient:
+    """
+    The fake daemon of this process for a sandbox configuration.
+
+    One per process, like a real daemon: containers created by one
+    ``SandboxManager`` are seen by the next (warm PvP containers).
+    """
+    key = (config.get('fake_profile'), config.get('fake_time_scale', 1.0), config.get('fake_seed'))
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = FakeDockerClient(
+                Simulator(load_profile(key[0]), time_scale=key[1], seed=key[2])
+            )
+        return _clients[key]
@@ -0,0 +1,79 @@
+"""
+Keyset pagination of a user's submission history.
+
+Pages are ordered by ``(created_at, id)`` descending and the cursor
+carries the last row of the previous page, so every page is a range scan
+of the ``submission_user_history`` index and costs the same however deep
+into the history it is. The index includes the listed columns, letting
+PostgreSQL answer a page from the index alone; ``code`` is never read
+here and is fetched separately per submission.
+"""
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+
+from .models import Submission
+
+HISTORY_FIELDS = ('id', 'mission_id', 'language', 'status', 'created_at', 'completed_at')
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at: datetime, submission_id: uuid.UUID) -> str:
+    raw = json.dumps([created_at.isoformat(), str(submission_id)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, submission_id = json.loads(raw)
+        parsed = parse_datetime(created_at)
+        if parsed is None:
+            raise ValueError(created_at)
+        return parsed, uuid.UUID(submission_id)
+    except (AttributeError, binascii.Error, TypeError, ValueError) as e:
+        raise InvalidCursor(f'Invalid cursor: {cursor!r}') from e
+
+
+def get_history_page(user_id: int, cursor: Optional[str] = None,
+                     limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Return one page of a user's submissions, newest first.
+
+    Args:
+        user_id: Owner of the submissions
+        cursor: ``next_cursor`` of the previous page, or None for the first page
+        limit: Page size, kept between 1 and ``SUBMISSION_HISTORY['max_page_size']``
+
+    Returns:
+        Dict with ``results`` (rows without code) and ``next_cursor``
+
+    Raises:
+        InvalidCursor: If the cursor cannot be decoded
+    """
+    config = settings.SUBMISSION_HISTORY
+    limit = max(min(limit or config['page_size'], config['max_page_size']), 1)
+    queryset = Submission.objects.filter(user_id=user_id)
+    if cursor:
+        created_at, submission_id = decode_cursor(cursor)
+        # (created_at, id) < cursor, written so the created_at bound drives the index scan
+        queryset = queryset.filter(created_at__lte=created_at).exclude(
+            created_at=created_at, id__gte=submission_id
+        )
+    rows: List[Dict[str, Any]] = list(
+        queryset.order_by('-created_at', '-id').values(*HISTORY_FIELDS)[:limit + 1]
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+    return {'results': rows, 'next_cursor': next_cursor}
@@ -0,0 +1,145 @@
+"""
+Global PvP leaderboard.
+
+Ratings are mirrored into the ``leaderboard:rating`` sorted set, so a
+player's rank and the players around them are O(log n) Redis lookups
+instead of an ORDER BY over every rating. ``PlayerRating`` stays the
+source of truth: the set is updated after each rating transaction commits
+and periodically rebuilt from the table by ``rebuild_leaderboard``.
+
+While a rebuild runs, rating updates are also journaled, and the journal
+is applied over the rebuilt set in the same script that swaps it in, so
+an update made during the rebuild is never lost to the older value read
+from the table.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from .db_router import use_primary
+from .models import PlayerRating
+from .redis_client import get_redis
+
+LEADERBOARD_KEY = 'leaderboard:rating'
+REBUILD_KEY = f'{LEADERBOARD_KEY}:rebuild'
+JOURNAL_KEY = f'{LEADERBOARD_KEY}:journal'
+REBUILDING_KEY = f'{LEADERBOARD_KEY}:rebuilding'
+
+# Ratings per ZADD when rebuilding
+REBUILD_CHUNK = 5000
+# Seconds after which a rebuild that died stops journaling updates
+REBUILD_TIMEOUT = 3600
+
+UPDATE_SCRIPT = """
+redis.call('ZADD', KEYS[1], unpack(ARGV))
+if redis.call('EXISTS', KEYS[3]) == 1 then
+    redis.call('ZADD', KEYS[2], unpack(ARGV))
+end
+"""
+
+SWAP_SCRIPT = """
+local journal = redis.call('ZRANGE', KEYS[3], 0, -1, 'WITHSCORES')
+for i = 1, #journal, 2 do
+    redis.call('ZADD', KEYS[1], journal[i + 1], journal[i])
+end
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('RENAME', KEYS[1], KEYS[2])
+else
+    redis.call('DEL', KEYS[2])
+end
+redis.call('DEL', KEYS[3], KEYS[4])
+return #journal / 2
+"""
+
+
+def update_ratings(ratings: Dict[int, float]):
+    if ratings:
+        args = [value for user_id, rating in ratings.items() for value in (rating, str(user_id))]
+        get_redis().register_script(UPDATE_SCRIPT)(
+            keys=[LEADERBOARD_KEY, JOURNAL_KEY, REBUILDING_KEY], args=args
+        )
+
+
+def get_rating(user_id: int) -> float:
+    """Return a player's rating, or the initial rating for unrated players."""
+    rating = get_redis().zscore(LEADERBOARD_KEY, str(user_id))
+    return settings.RATING['initial'] if rating is None else rating
+
+
+def get_ratings(user_ids: List[int]) -> Dict[int, float]:
+    """Return the ratings of several players in one lookup."""
+    if not user_ids:
+        return {}
+    initial = settings.RATING['initial']
+    scores = get_redis().zmscore(LEADERBOARD_KEY, [str(user_id) for user_id in user_ids])
+    return {
+        user_id: initial if score is None else score
+        for user_id, score in zip(user_ids, scores)
+    }
+
+
+def _entries(rows, first_rank: int) -> List[Dict]:
+    return [
+        {'rank': first_rank + i, 'user_id': int(member), 'rating': score}
+        for i, (member, score) in enumerate(rows)
+    ]
+
+
+def top(limit: int) -> List[Dict]:
+    """Return the ``limit`` highest rated players, best first."""
+    return _entries(get_redis().zrevrange(LEADERBOARD_KEY, 0, limit - 1, withscores=True), 1)
+
+
+def around(user_id: int, radius: int) -> Optional[Tuple[int, List[Dict]]]:
+    """
+    Return a player's rank and the players up to ``radius`` places above and below.
+
+    Returns:
+        Tuple of (rank, entries), or None if the player is unrated
+    """
+    client = get_redis()
+    index = client.zrevrank(LEADERBOARD_KEY, str(user_id))
+    if index is None:
+        return None
+    start = max(index - radius, 0)
+    rows = client.zrevrange(LEADERBOARD_KEY, start, index + radius, withscores=True)
+    return index + 1, _entries(rows, start + 1)
+
+
+def rebuild_leaderboard() -> int:
+    """
+    Rebuild the leaderboard from the database.
+
+    The new set is built under a temporary key and swapped in with RENAME,
+    so readers never see a partial leaderboard and players whose ratings
+    were removed drop out. Ratings are read from the primary, and updates
+    journaled since the rebuild started are applied before the swap.
+
+    Returns:
+        Number of rated players read from the table
+    """
+    client = get_redis()
+    pipe = client.pipeline()
+    pipe.delete(REBUILD_KEY, JOURNAL_KEY)
+    # Set before the read, so any update the read can miss is journaled
+    pipe.set(REBUILDING_KEY, 1, ex=REBUILD_TIMEOUT)
+    pipe.execute()
+    count = 0
+    chunk = {}
+    with use_primary():
+        rows = PlayerRating.objects.values_list('user_id', 'rating').iterator(
+            chunk_size=REBUILD_CHUNK
+        )
+        for user_id, rating in rows:
+            chunk[str(user_id)] = rating
+            if len(chunk) == REBUILD_CHUNK:
+                client.zadd(REBUILD_KEY, chunk)
+                count += len(chunk)
+                chunk = {}
+    if chunk:
+        client.zadd(REBUILD_KEY, chunk)
+        count += len(chunk)
+    client.register_script(SWAP_SCRIPT)(
+        keys=[REBUILD_KEY, LEADERBOARD_KEY, JOURNAL_KEY, REBUILDING_KEY]
+    )
+    return count
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from core.archive import archive_cutoff, archive_old_submissions
+from core.db_router import use_primary
+
+
+class Command(BaseCommand):
+    help = "Move submissions of months older than the retention window to compressed archives"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-months', type=int,
+            help="Months kept in the database, current month included"
+        )
+        parser.add_argument('--root', help="Directory to write the archives to")
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options['older_than_months'])
+        self.stdout.write(f"Archiving submissions created before {cutoff:%Y-%m}")
+        # Replica lag must not hide rows from the export or the purge
+        with use_primary():
+            archives = archive_old_submissions(options['older_than_months'], root=options['root'])
+        for archive in archives:
+            self.stdout.write(f"{archive.month:%Y-%m}: {archive.row_count} submissions in {archive.path}")
+        self.stdout.write(f"Archived {len(archives)} months")
@@ -0,0 +1,76 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.buildings import BUILDING_TEMPLATES, max_health
+from core.combat import UNIT_TEMPLATES, Defence, load_defence, simulate
+
+
+def random_defence(buildings, rng, size=10):
+    cells = rng.sample([(x, y) for x in range(size) for y in range(size)], buildings)
+    rows = []
+    for i, (x, y) in enumerate(cells):
+        building_type = rng.choice(sorted(BUILDING_TEMPLATES))
+        level = rng.randint(1, BUILDING_TEMPLATES[building_type]['max_level'])
+        rows.append({
+            'id': i, 'type': building_type, 'level': level, 'x': x, 'y': y,
+            'health': max_health(building_type, level),
+        })
+    return Defence.from_buildings(rows, size, size)
+
+
+def random_army(units, rng):
+    army = dict.fromkeys(UNIT_TEMPLATES, 0)
+    for _ in range(units):
+        army[rng.choice(sorted(UNIT_TEMPLATES))] += 1
+    return army
+
+
+class Command(BaseCommand):
+    help = "Benchmark raid simulation, or replay one raid from its seed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--raids', type=int, default=1000)
+        parser.add_argument('--units', type=int, default=40, help="Units per army")
+        parser.add_argument('--buildings', type=int, default=20, help="Buildings per base")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--replay', type=int, metavar='BASE_ID',
+            help="Replay one raid on this base with --seed and print its outcome"
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        if options['replay'] is not None:
+            army = random_army(options['units'], rng)
+            self.stdout.write(f"Army: {army}")
+            self.stdout.write(str(simulate(load_defence(options['replay']), army, options['seed'])))
+            return
+        if not 0 < options['buildings'] <= 100:
+            raise CommandError("--buildings must be between 1 and 100")
+
+        raids = [
+            (random_defence(options['buildings'], rng), random_army(options['units'], rng), seed)
+            for seed in range(options['seed'], options['seed'] + options['raids'])
+        ]
+        started = time.perf_counter()
+        results = [simulate(defence, army, seed) for defence, army, seed in raids]
+        elapsed = time.perf_counter() - started
+
+        defence, army, seed = raids[0]
+        if simulate(defence, army, seed) != results[0]:
+            raise CommandError("Replaying a seed gave a different outcome")
+
+        ticks = sum(result['ticks'] for result in results)
+        wins = sum(result['winner'] == 'attacker' for result in results)
+        self.stdout.write(
+            f"Raids: {len(results)} ({options['units']} units vs {options['buildings']} buildings), "
+            f"attacker wins: {wins}"
+        )
+        self.stdout.write(
+            f"Time: {elapsed:.2f}s, {elapsed / len(results) * 1000:.2f}ms per raid, "
+            f"{len(results) / elapsed * 60:.0f} raids per minute, "
+            f"{ticks / elapsed:.0f} ticks per second"
+        )
+        self.stdout.write("Replay check: ok")
@@ -0,0 +1,36 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.matchmaking import MatchmakingLoop, RedisMatchQueue, create_match
+from core.presence import set_status
+from core.tasks import prewarm_match_sandboxes_task
+
+
+class Command(BaseCommand):
+    help = "Pair queued PvP players, one pairing loop per shard"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--shard', action='append', dest='shards',
+            help="Shard to pair (repeatable); defaults to every configured shard"
+        )
+
+    def handle(self, *args, **options):
+        shards = options['shards'] or settings.MATCHMAKING['shards']
+        self.stdout.write(f"Matchmaking shards: {', '.join(shards)}")
+        asyncio.run(self.run(shards))
+
+    async def run(self, shards):
+        async def on_match(pair):
+            match_id = await sync_to_async(create_match)(pair)
+            await sync_to_async(prewarm_match_sandboxes_task.delay)(match_id, list(pair))
+            for player_id in pair:
+                await sync_to_async(set_status)(int(player_id), 'in_match')
+
+        await asyncio.gather(*(
+            MatchmakingLoop(RedisMatchQueue(shard), on_match).run()
+            for shard in shards
+        ))
@@ -0,0 +1,56 @@
+import socket
+import time
+
+import redis
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.persistence import TRANSIENT_ERRORS, SubmissionStreamConsumer
+
+# Longest wait between retries while Redis or the database is down, in seconds
+MAX_BACKOFF = 30
+
+
+class Command(BaseCommand):
+    help = "Persist submission events from the Redis stream to the database in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--name', default=socket.gethostname(),
+            help="Consumer name; must be unique among running persisters"
+        )
+        parser.add_argument('--batch-size', type=int, help="Events per bulk write")
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Drain the events currently in the stream and exit"
+        )
+
+    def handle(self, *args, **options):
+        consumer = SubmissionStreamConsumer(
+            options['name'],
+            batch_size=options['batch_size'],
+            block_ms=0 if options['once'] else None
+        )
+        consumer.ensure_group()
+        self.stdout.write(f"Persisting submission events as consumer {consumer.name}")
+
+        total = 0
+        backoff = 1
+        while True:
+            try:
+                persisted = consumer.run_once()
+            except redis.ConnectionError as e:
+                self.stderr.write(f"Redis unavailable, retrying in {backoff}s: {str(e)}")
+            except TRANSIENT_ERRORS as e:
+                self.stderr.write(f"Database unavailable, retrying in {backoff}s: {str(e)}")
+                # Drop the broken connection so the retry opens a new one
+                close_old_connections()
+            else:
+                backoff = 1
+                total += persisted
+                if options['once'] and not persisted:
+                    self.stdout.write(f"Persisted {total} events")
+                    return
+                continue
+            time.sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.missions import publish_catalog
+
+
+class Command(BaseCommand):
+    help = "Publish the missions as a new catalog version and invalidate cached copies"
+
+    def handle(self, *args, **options):
+        version = publish_catalog()
+        self.stdout.write(f"Published mission catalog version {version}")
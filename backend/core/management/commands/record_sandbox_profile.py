@@ -0,0 +1,74 @@
+import json
+import time
+
+import docker
+from django.core.management.base import BaseCommand, CommandError
+
+from core.fake_docker import DEFAULT_PROFILE, PHASES
+from core.sandbox import SandboxError, SandboxManager
+
+
+def timed(samples, phase, func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    samples[phase].append(round(time.perf_counter() - started, 6))
+    return result
+
+
+class Command(BaseCommand):
+    help = "Record sandbox operation latencies on this Docker host as a fake backend profile"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=50, help="Containers to run")
+        parser.add_argument('--language', default='python', choices=['python', 'javascript'])
+        parser.add_argument(
+            '--code', default='print(42)',
+            help="Code to run in each container; its output size is recorded too"
+        )
+        parser.add_argument('--output', required=True, help="Profile file to write")
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError("--runs must be at least 1")
+        sandbox = SandboxManager()
+        if not isinstance(sandbox.client, docker.DockerClient):
+            raise CommandError("Recording needs the Docker backend (SANDBOX_CONFIG['backend'])")
+        image = f"kodewar-sandbox-{options['language']}"
+        command = (
+            f"python -c '{options['code']}'" if options['language'] == 'python'
+            else f"node -e '{options['code']}'"
+        )
+        samples = {phase: [] for phase in PHASES + ('output_bytes',)}
+
+        try:
+            for _ in range(options['runs']):
+                created = timed(samples, 'create', sandbox.create_container, image=image,
+                                command=command)
+                container = sandbox.client.containers.get(created['container_id'])
+                timed(samples, 'start', container.start)
+                timed(samples, 'wait', container.wait,
+                      timeout=sandbox.config['default_timeout'])
+                samples['output_bytes'].append(len(timed(samples, 'logs', container.logs)))
+                timed(samples, 'remove', container.remove)
+
+            warm = sandbox.start_warm_container(image, cpuset='0', idle_timeout=600)
+            try:
+                container = sandbox.client.containers.get(warm)
+                for _ in range(options['runs']):
+                    timed(samples, 'exec', container.exec_run, ['sh', '-c', command])
+            finally:
+                sandbox.cleanup(warm)
+        except (SandboxError, docker.errors.DockerException) as e:
+            raise CommandError(f"Recording failed: {str(e)}")
+
+        # Failure rates cannot be provoked reliably; keep the defaults for editing
+        profile = {**samples, 'failures': DEFAULT_PROFILE['failures']}
+        with open(options['output'], 'w') as f:
+            json.dump(profile, f, indent=2)
+        for phase in PHASES:
+            values = sorted(samples[phase])
+            self.stdout.write(
+                f"{phase}: median {values[len(values) // 2] * 1000:.1f}ms, "
+                f"max {values[-1] * 1000:.1f}ms"
+            )
+        self.stdout.write(f"Wrote {options['output']}")
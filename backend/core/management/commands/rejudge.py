@@ -0,0 +1,64 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.bulk import create_batch, get_batch_progress
+from core.serializers import BulkSubmissionItemSerializer
+from core.tasks import dispatch_batch_task
+
+
+class Command(BaseCommand):
+    help = "Queue a throttled, low-priority rejudge of many submissions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'file',
+            help="JSON Lines file with one submission (code, language, test_cases, "
+                 "optional submission_id) per line"
+        )
+        parser.add_argument('--priority', type=int, help="Celery priority, 0 is highest")
+        parser.add_argument('--chunk-size', type=int, help="Submissions dispatched per tick")
+        parser.add_argument('--interval', type=float, help="Seconds between dispatch ticks")
+        parser.add_argument(
+            '--follow', action='store_true',
+            help="Print aggregate progress until the batch completes"
+        )
+
+    def handle(self, *args, **options):
+        submissions = []
+        with open(options['file']) as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                serializer = BulkSubmissionItemSerializer(data=json.loads(line))
+                if not serializer.is_valid():
+                    raise CommandError(f"Line {line_number}: {serializer.errors}")
+                submissions.append(serializer.validated_data)
+        if not submissions:
+            raise CommandError("No submissions to rejudge")
+
+        batch = create_batch(
+            submissions,
+            priority=options['priority'],
+            chunk_size=options['chunk_size'],
+            interval=options['interval']
+        )
+        dispatch_batch_task.delay(batch['batch_id'])
+        self.stdout.write(f"Queued batch {batch['batch_id']} with {len(submissions)} submissions")
+
+        if options['follow']:
+            self._follow(batch['batch_id'])
+
+    def _follow(self, batch_id):
+        while True:
+            progress = get_batch_progress(batch_id)
+            if progress is None:
+                raise CommandError(f"Batch {batch_id} expired")
+            self.stdout.write(
+                f"{progress['completed']}/{progress['total']} completed, "
+                f"{progress['failed']} failed, {progress['pending']} waiting for dispatch"
+            )
+            if progress['done']:
+                return
+            time.sleep(5)
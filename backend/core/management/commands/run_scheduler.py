@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core.construction import EVENT_HANDLERS
+from core.scheduler import Scheduler
+
+
+class Command(BaseCommand):
+    help = "Fire due building timer events in batches"
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Scheduler handling: {', '.join(EVENT_HANDLERS)}")
+        Scheduler(EVENT_HANDLERS).run()
@@ -0,0 +1,97 @@
+import asyncio
+import random
+import time
+import uuid
+
+import redis.asyncio as aioredis
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.matchmaking import MemoryMatchQueue, RedisMatchQueue, joined_key, ratings_key
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(q / 100 * len(values)), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = "Simulate matchmaking load and report pairing latency and rating spread"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--initial', type=int, default=20000, help="Players queued at the start")
+        parser.add_argument('--arrivals', type=float, default=200, help="Players joining per second")
+        parser.add_argument('--duration', type=float, default=120, help="Simulated seconds")
+        parser.add_argument('--rating-mean', type=float, default=1500)
+        parser.add_argument('--rating-stddev', type=float, default=300)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--redis', action='store_true',
+            help="Pair in Redis on a scratch shard instead of in memory"
+        )
+
+    def handle(self, *args, **options):
+        asyncio.run(self.simulate(options))
+
+    async def simulate(self, options):
+        rng = random.Random(options['seed'])
+        tick = settings.MATCHMAKING['interval']
+        client = None
+        if options['redis']:
+            client = aioredis.from_url(settings.REDIS_URL)
+            queue = RedisMatchQueue(f'simulation-{uuid.uuid4()}', client=client)
+        else:
+            queue = MemoryMatchQueue()
+
+        ratings = {}
+        joined = {}
+        waits, gaps, tick_ms = [], [], []
+
+        async def arrive(count, now):
+            for _ in range(count):
+                player_id = str(uuid.uuid4())
+                ratings[player_id] = max(rng.gauss(options['rating_mean'], options['rating_stddev']), 0)
+                joined[player_id] = now
+                await queue.join(player_id, ratings[player_id], now)
+
+        now = 0.0
+        await arrive(options['initial'], now)
+        carry = 0.0
+        try:
+            while now < options['duration']:
+                now += tick
+                carry += options['arrivals'] * tick
+                await arrive(int(carry), now)
+                carry -= int(carry)
+
+                started = time.perf_counter()
+                pairs = await queue.pair(now)
+                tick_ms.append((time.perf_counter() - started) * 1000)
+                for a, b in pairs:
+                    waits.extend((now - joined.pop(a), now - joined.pop(b)))
+                    gaps.append(abs(ratings[a] - ratings[b]))
+            still_queued = await queue.size()
+        finally:
+            if client is not None:
+                await client.delete(ratings_key(queue.shard), joined_key(queue.shard))
+                await client.aclose()
+
+        self.stdout.write(f"Backend: {'redis' if client is not None else 'memory'}")
+        self.stdout.write(
+            f"Players: {len(ratings)}, matched: {len(waits)}, still queued: {still_queued}"
+        )
+        self.stdout.write(
+            f"Wait (s): p50 {percentile(waits, 50):.1f}, p95 {percentile(waits, 95):.1f}, "
+            f"p99 {percentile(waits, 99):.1f}"
+        )
+        mean_gap = sum(gaps) / len(gaps) if gaps else 0.0
+        self.stdout.write(
+            f"Rating gap: mean {mean_gap:.1f}, p50 {percentile(gaps, 50):.1f}, "
+            f"p95 {percentile(gaps, 95):.1f}, max {max(gaps, default=0):.1f}"
+        )
+        self.stdout.write(
+            f"Tick latency (ms): p50 {percentile(tick_ms, 50):.2f}, "
+            f"p99 {percentile(tick_ms, 99):.2f}, max {max(tick_ms, default=0):.2f}"
+        )
@@ -0,0 +1,228 @@
+"""
+Live PvP match state.
+
+The state of a match lives in its Redis hash (created by
+``core.matchmaking.create_match``) and every change is broadcast to the
+match's channel-layer group as a small delta carrying a sequence number,
+never as a full snapshot. A client gets one snapshot when it connects and
+applies deltas from there, skipping any with a ``seq`` the snapshot already
+covers; a gap in ``seq`` means it should reconnect.
+
+Test progress is coalesced: the first update of a burst sets a short-lived
+flag and asks the caller to schedule one flush ``progress_window`` seconds
+later, later updates only overwrite the stored counts, and the flush sends
+the latest counts of every player in a single delta. The flag lives in
+Redis, so bursts are coalesced across worker processes.
+
+Delta types:
+
+- ``ready``: ``{"type": "ready", "seq": 3, "player": "7"}``
+- ``status``: ``{"type": "status", "seq": 4, "status": "in_progress", "at": 1700000000.0}``
+- ``progress``: ``{"type": "progress", "seq": 5, "progress": {"7": [3, 5]}}``
+- ``finish``: ``{"type": "finish", "seq": 6, "player": "7", "at": 1700000100.0, "winner": "7"}``
+
+Every event is also appended to the match's replay log (see ``core.replay``).
+
+Submissions and their progress only count while the match is
+``in_progress``: before every player is ready and after the winner
+finished, they are refused or ignored.
+"""
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from . import replay
+from .matchmaking import match_key
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+def match_group(match_id: str) -> str:
+    return f'pvp_match_{match_id}'
+
+
+def progress_flush_key(match_id: str) -> str:
+    return f'pvp_match:{match_id}:progress_flush'
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def get_players(match_id: str) -> Optional[List[str]]:
+    """Return the player IDs of a match, or None if the match does not exist."""
+    players = get_redis().hget(match_key(match_id), 'players')
+    return json.loads(players) if players else None
+
+
+def _get_fields(match_id: str, *names: str) -> List[Optional[str]]:
+    return [_decode(v) for v in get_redis().hmget(match_key(match_id), list(names))]
+
+
+def get_match_mission(match_id: str) -> Optional[Dict[str, Any]]:
+    """Return the mission (``id`` and ``version``) a match is played on, if any."""
+    mission_id, mission_version = _get_fields(match_id, 'mission_id', 'mission_version')
+    if not mission_id:
+        return None
+    return {'id': mission_id, 'version': int(mission_version)}
+
+
+def _is_playing(players: Optional[str], status: Optional[str], player_id: str) -> bool:
+    """Whether a player is in a match (from its raw hash fields) that is in progress."""
+    return bool(players) and player_id in json.loads(players) and status == 'in_progress'
+
+
+def get_snapshot(match_id: str) -> Optional[Dict[str, Any]]:
+    """Return the full state of a match, sent once to a client when it connects."""
+    return _snapshot(match_id, get_redis().hgetall(match_key(match_id)))
+
+
+def get_spectator_view(match_id: str) -> Tuple[Optional[Dict[str, Any]], bytes]:
+    """Return the snapshot of a match and its replay log so far, read atomically."""
+    pipe = get_redis().pipeline()
+    pipe.hgetall(match_key(match_id))
+    pipe.get(replay.log_key(match_id))
+    fields, log = pipe.execute()
+    return _snapshot(match_id, fields), log or b''
+
+
+def _snapshot(match_id: str, raw_fields) -> Optional[Dict[str, Any]]:
+    fields = {_decode(k): _decode(v) for k, v in raw_fields.items()}
+    if not fields:
+        return None
+    players = json.loads(fields['players'])
+    progress = {}
+    for player_id in players:
+        counts = fields.get(f'progress:{player_id}')
+        if counts:
+            passed, total = counts.split('/')
+            progress[player_id] = [int(passed), int(total)]
+    return {
+        'id': match_id,
+        'seq': int(fields.get('seq', 0)),
+        'status': fields['status'],
+        'players': players,
+        'ready': [p for p in players if fields.get(f'ready:{p}')],
+        'progress': progress,
+        'finished': {
+            p: float(fields[f'finished:{p}']) for p in players if f'finished:{p}' in fields
+        },
+        'mission_id': fields.get('mission_id'),
+        'winner': fields.get('winner'),
+        'started_at': float(fields['started_at']) if 'started_at' in fields else None,
+        'ended_at': float(fields['ended_at']) if 'ended_at' in fields else None,
+    }
+
+
+def broadcast(match_id: str, delta: Dict[str, Any]):
+    """Stamp a delta with the match's next sequence number and send it to the group."""
+    delta['seq'] = get_redis().hincrby(match_key(match_id), 'seq', 1)
+    async_to_sync(get_channel_layer().group_send)(
+        match_group(match_id), {'type': 'match.delta', 'delta': delta}
+    )
+
+
+def set_ready(match_id: str, player_id: str) -> bool:
+    """
+    Mark a player ready; the match starts once every player is.
+
+    Returns:
+        False if the player is not in the match
+    """
+    players = get_players(match_id)
+    if not players or player_id not in players:
+        return False
+    client = get_redis()
+    key = match_key(match_id)
+    pipe = client.pipeline()
+    pipe.hsetnx(key, f'ready:{player_id}', 1)
+    pipe.hmget(key, [f'ready:{p}' for p in players])
+    newly_ready, ready = pipe.execute()
+    if newly_ready:
+        broadcast(match_id, {'type': 'ready', 'player': player_id})
+        replay.append(match_id, replay.READY, int(player_id))
+    if all(ready):
+        now = time.time()
+        # HSETNX makes the start happen once whichever player was last to ready up
+        if client.hsetnx(key, 'started_at', now):
+            client.hset(key, 'status', 'in_progress')
+            broadcast(match_id, {'type': 'status', 'status': 'in_progress', 'at': now})
+            replay.append(match_id, replay.START, now=now)
+    return True
+
+
+def record_submission(match_id: str, player_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Log that a player submitted code in a match.
+
+    Returns:
+        The mission of the match (``id`` and ``version``) to grade the
+        submission against, or None if the player is not in the match or
+        the match is not in progress
+    """
+    players, status, mission_id, mission_version = _get_fields(
+        match_id, 'players', 'status', 'mission_id', 'mission_version'
+    )
+    if not _is_playing(players, status, player_id) or not mission_id:
+        return None
+    replay.append(match_id, replay.SUBMISSION, int(player_id))
+    return {'id': mission_id, 'version': int(mission_version)}
+
+
+def record_progress(match_id: str, player_id: str, passed: int, total: int) -> bool:
+    """
+    Store a player's test progress and finish them once every test passes.
+
+    Returns:
+        True if the caller must schedule ``flush_progress`` after
+        ``PVP_MATCH['progress_window']`` seconds
+    """
+    players, status = _get_fields(match_id, 'players', 'status')
+    if not _is_playing(players, status, player_id):
+        logger.warning(f"Ignoring progress of player {player_id} in match {match_id}")
+        return False
+    window_ms = int(settings.PVP_MATCH['progress_window'] * 1000)
+    pipe = get_redis().pipeline()
+    pipe.hset(match_key(match_id), f'progress:{player_id}', f'{passed}/{total}')
+    # The flag outlives the window so a lost flush only delays, never stops, updates
+    pipe.set(progress_flush_key(match_id), 1, nx=True, px=window_ms * 10)
+    _, first_of_burst = pipe.execute()
+    # The log keeps every verdict; only the live deltas are coalesced
+    replay.append(match_id, replay.VERDICT, int(player_id), passed, total)
+    if total and passed == total:
+        record_finish(match_id, player_id)
+    return bool(first_of_burst)
+
+
+def flush_progress(match_id: str):
+    """Broadcast the latest progress of every player as one delta."""
+    client = get_redis()
+    # Clear the flag before reading, so a later update schedules a new flush
+    client.delete(progress_flush_key(match_id))
+    snapshot = get_snapshot(match_id)
+    if snapshot and snapshot['progress']:
+        broadcast(match_id, {'type': 'progress', 'progress': snapshot['progress']})
+
+
+def record_finish(match_id: str, player_id: str):
+    """Record that a player passed every test; the first to do so wins."""
+    client = get_redis()
+    key = match_key(match_id)
+    if _decode(client.hget(key, 'status')) != 'in_progress':
+        return
+    now = time.time()
+    if not client.hsetnx(key, f'finished:{player_id}', now):
+        return
+    delta = {'type': 'finish', 'player': player_id, 'at': now, 'winner': None}
+    if client.hsetnx(key, 'winner', player_id):
+        client.hset(key, mapping={'status': 'completed', 'ended_at': now})
+        delta['winner'] = player_id
+    broadcast(match_id, delta)
+    won = int(delta['winner'] is not None)
+    replay.append(match_id, replay.FINISH, int(player_id), won, now=now)
@@ -0,0 +1,326 @@
+"""
+PvP matchmaking.
+
+Players waiting for a match are kept per shard in two Redis sorted sets,
+``matchmaking:{shard}:ratings`` (score = rating) and
+``matchmaking:{shard}:joined`` (score = join time). Each shard is paired
+by a single asyncio loop (``MatchmakingLoop``) that runs ``PAIR_SCRIPT``
+every tick: walking the queue longest-waiting first, a player's closest
+rated opponents are their neighbours in the rating set (ZRANK + ZRANGE,
+O(log n)), and the pair is made if the rating gap is within the player's
+search window, which widens with the time they have waited.
+
+The script is atomic, so joins and leaves from the API never race a
+pairing and a second loop on the same shard would be harmless. A pair
+whose match cannot be started is put back in the queue with the ratings
+and join times it was paired with, and no one is paired while the catalog
+has no mission to play.
+``MemoryMatchQueue`` implements the same algorithm in-process for the
+matchmaking simulation.
+"""
+import asyncio
+import bisect
+import json
+import logging
+import random
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import redis.asyncio as aioredis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .missions import get_catalog
+from .redis_client import get_redis
+from .replay import start_log
+
+logger = logging.getLogger(__name__)
+
+Pair = Tuple[str, str]
+
+PAIR_SCRIPT = """
+local ratings, joined = KEYS[1], KEYS[2]
+local now = tonumber(ARGV[1])
+local base, widen, max_window = tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local start, limit = tonumber(ARGV[5]), tonumber(ARGV[6])
+local waiting = redis.call('ZRANGE', joined, start, start + limit - 1, 'WITHSCORES')
+local matched = {}
+local unmatched, shift = 0, 0
+for i = 1, #waiting, 2 do
+  local player = waiting[i]
+  local rank = redis.call('ZRANK', ratings, player)
+  local rating, best, best_rating, best_gap
+  if rank then
+    local window = math.min(base + widen * (now - tonumber(waiting[i + 1])), max_window)
+    rating = redis.call('ZSCORE', ratings, player)
+    local neighbours = redis.call('ZRANGE', ratings, math.max(rank - 1, 0), rank + 1, 'WITHSCORES')
+    for j = 1, #neighbours, 2 do
+      if neighbours[j] ~= player then
+        local gap = math.abs(tonumber(neighbours[j + 1]) - tonumber(rating))
+        if gap <= window and (best == nil or gap < best_gap) then
+          best, best_rating, best_gap = neighbours[j], neighbours[j + 1], gap
+        end
+      end
+    end
+  end
+  if best then
+    -- Pairing with a player scanned by an earlier call moves the cursor back
+    if redis.call('ZRANK', joined, best) < start then
+      shift = shift + 1
+    end
+    local best_joined = redis.call('ZSCORE', joined, best)
+    redis.call('ZREM', ratings, player, best)
+    redis.call('ZREM', joined, player, best)
+    -- Scores are returned as strings, Redis would truncate Lua numbers
+    for _, value in ipairs({player, rating, waiting[i + 1], best, best_rating, best_joined}) do
+      table.insert(matched, value)
+    end
+  elseif rank then
+    unmatched = unmatched + 1
+  end
+end
+return {start + unmatched - shift, #waiting / 2, matched}
+"""
+
+
+def ratings_key(shard: str) -> str:
+    return f'matchmaking:{shard}:ratings'
+
+
+def joined_key(shard: str) -> str:
+    return f'matchmaking:{shard}:joined'
+
+
+def assignment_key(player_id: str) -> str:
+    return f'matchmaking:assignment:{player_id}'
+
+
+def match_key(match_id: str) -> str:
+    return f'pvp_match:{match_id}'
+
+
+def search_window(waited: float, config: Optional[Dict] = None) -> float:
+    """Return the largest rating gap accepted after waiting ``waited`` seconds."""
+    config = config or settings.MATCHMAKING
+    return min(config['base_window'] + config['widen_per_second'] * waited, config['max_window'])
+
+
+def join_queue(player_id: str, rating: float, shard: Optional[str] = None, now: Optional[float] = None):
+    """
+    Put a player in the matchmaking queue.
+
+    Joining again while queued keeps the original join time, so the
+    search window keeps widening.
+    """
+    shard = shard or settings.MATCHMAKING['shards'][0]
+    pipe = get_redis().pipeline()
+    pipe.delete(assignment_key(player_id))
+    pipe.zadd(ratings_key(shard), {player_id: rating})
+    pipe.zadd(joined_key(shard), {player_id: now or time.time()}, nx=True)
+    pipe.execute()
+
+
+def leave_queue(player_id: str, shard: Optional[str] = None) -> bool:
+    """Remove a player from the queue; returns False if they were not queued."""
+    shard = shard or settings.MATCHMAKING['shards'][0]
+    pipe = get_redis().pipeline()
+    pipe.zrem(ratings_key(shard), player_id)
+    pipe.zrem(joined_key(shard), player_id)
+    removed, _ = pipe.execute()
+    return bool(removed)
+
+
+def queue_status(player_id: str, shard: Optional[str] = None) -> Dict:
+    """Return whether a player is idle, queued (and for how long) or matched."""
+    shard = shard or settings.MATCHMAKING['shards'][0]
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.get(assignment_key(player_id))
+    pipe.zscore(joined_key(shard), player_id)
+    match_id, joined_at = pipe.execute()
+    if match_id:
+        return {'status': 'matched', 'match_id': match_id.decode()}
+    if joined_at is not None:
+        return {'status': 'in_queue', 'waited': max(time.time() - joined_at, 0.0)}
+    return {'status': 'idle'}
+
+
+class RedisMatchQueue:
+    """The queue of one shard, paired by ``PAIR_SCRIPT``."""
+
+    def __init__(self, shard: str, client: Optional[aioredis.Redis] = None):
+        self.shard = shard
+        self.client = client or aioredis.from_url(settings.REDIS_URL)
+        self._script = self.client.register_script(PAIR_SCRIPT)
+        # player ID -> (rating, joined at) of the players of the last pairing
+        self._paired: Dict[str, Tuple[float, float]] = {}
+
+    async def join(self, player_id: str, rating: float, now: float):
+        pipe = self.client.pipeline()
+        pipe.zadd(ratings_key(self.shard), {player_id: rating})
+        pipe.zadd(joined_key(self.shard), {player_id: now}, nx=True)
+        await pipe.execute()
+
+    async def size(self) -> int:
+        return await self.client.zcard(joined_key(self.shard))
+
+    async def pair(self, now: float, batch_size: Optional[int] = None) -> List[Pair]:
+        """
+        Pair as many waiting players as their search windows allow.
+
+        The queue is walked in script calls of ``batch_size`` players, so
+        Redis is never blocked for long however many players are waiting.
+        """
+        config = settings.MATCHMAKING
+        batch_size = batch_size or config['batch_size']
+        keys = [ratings_key(self.shard), joined_key(self.shard)]
+        pairs: List[Pair] = []
+        self._paired = {}
+        start = 0
+        while True:
+            start, scanned, matched = await self._script(keys=keys, args=[
+                now, config['base_window'], config['widen_per_second'], config['max_window'],
+                start, batch_size
+            ])
+            # (player, rating, joined at) of both players of each pair
+            for i in range(0, len(matched), 6):
+                player_id, opponent = matched[i].decode(), matched[i + 3].decode()
+                self._paired[player_id] = (float(matched[i + 1]), float(matched[i + 2]))
+                self._paired[opponent] = (float(matched[i + 4]), float(matched[i + 5]))
+                pairs.append((player_id, opponent))
+            if scanned < batch_size:
+                return pairs
+
+    async def requeue(self, pair: Pair):
+        """Put a pair of the last pairing back in the queue, keeping their wait."""
+        for player_id in pair:
+            rating, joined_at = self._paired.pop(player_id)
+            await self.join(player_id, rating, joined_at)
+
+
+class MemoryMatchQueue:
+    """In-process equivalent of ``RedisMatchQueue``, used by the simulation."""
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = config or settings.MATCHMAKING
+        self._by_rating: List[Tuple[float, str]] = []
+        self._players: Dict[str, Tuple[float, float]] = {}  # id -> (rating, joined at), join order
+        self._paired: Dict[str, Tuple[float, float]] = {}  # the same, of the last pairing
+
+    async def join(self, player_id: str, rating: float, now: float):
+        if player_id in self._players:
+            self._by_rating.remove((self._players[player_id][0], player_id))
+            now = self._players[player_id][1]
+        bisect.insort(self._by_rating, (rating, player_id))
+        self._players[player_id] = (rating, now)
+
+    async def size(self) -> int:
+        return len(self._players)
+
+    def _remove(self, player_id: str):
+        rating, _ = self._paired[player_id] = self._players.pop(player_id)
+        del self._by_rating[bisect.bisect_left(self._by_rating, (rating, player_id))]
+
+    async def requeue(self, pair: Pair):
+        for player_id in pair:
+            rating, joined_at = self._paired.pop(player_id)
+            await self.join(player_id, rating, joined_at)
+
+    async def pair(self, now: float, batch_size: Optional[int] = None) -> List[Pair]:
+        pairs: List[Pair] = []
+        self._paired = {}
+        for player_id, (rating, joined_at) in list(self._players.items()):
+            if player_id not in self._players:
+                continue
+            window = search_window(now - joined_at, self.config)
+            rank = bisect.bisect_left(self._by_rating, (rating, player_id))
+            best, best_gap = None, None
+            for neighbour_rating, neighbour in self._by_rating[max(rank - 1, 0):rank + 2]:
+                gap = abs(neighbour_rating - rating)
+                if neighbour != player_id and gap <= window and (best is None or gap < best_gap):
+                    best, best_gap = neighbour, gap
+            if best is not None:
+                self._remove(player_id)
+                self._remove(best)
+                pairs.append((player_id, best))
+        return pairs
+
+
+def create_match(player_ids: Pair) -> str:
+    """
+    Record a new match on a mission of the catalog and point both players at it.
+
+    Match submissions are graded against the mission the server picks here,
+    never against test cases sent by a client.
+
+    Returns:
+        The match ID
+    """
+    config = settings.MATCHMAKING
+    missions = get_catalog()['missions']
+    if not missions:
+        raise ValueError("No published mission to play a match on")
+    mission = random.choice(missions)
+    match_id = str(uuid.uuid4())
+    created_at = time.time()
+    pipe = get_redis().pipeline()
+    pipe.hset(match_key(match_id), mapping={
+        'status': 'waiting',
+        'players': json.dumps(list(player_ids)),
+        'mission_id': mission['id'],
+        'mission_version': mission['version'],
+        'created_at': created_at,
+    })
+    pipe.expire(match_key(match_id), config['match_ttl'])
+    start_log(pipe, match_id, created_at, config['match_ttl'])
+    for player_id in player_ids:
+        pipe.set(assignment_key(player_id), match_id, ex=config['match_ttl'])
+    pipe.execute()
+    return match_id
+
+
+class MatchmakingLoop:
+    """Pair the players of one shard every ``interval`` seconds."""
+
+    def __init__(self, queue, on_match: Callable[[Pair], Awaitable[None]],
+                 interval: Optional[float] = None):
+        self.queue = queue
+        self.on_match = on_match
+        self.interval = interval or settings.MATCHMAKING['interval']
+
+    async def tick(self, now: Optional[float] = None) -> List[Pair]:
+        """Pair the queue and start a match per pair; returns the pairs that got one."""
+        # Players stay queued, keeping their wait, until a mission is published
+        if not (await sync_to_async(get_catalog)())['missions']:
+            return []
+        matched = []
+        for pair in await self.queue.pair(now or time.time()):
+            try:
+                await self.on_match(pair)
+            except Exception as e:
+                logger.error(f"Failed to start a match for {', '.join(pair)}, requeueing: {str(e)}")
+                await self.queue.requeue(pair)
+            else:
+                matched.append(pair)
+        return matched
+
+    async def run(self, stop: Optional[asyncio.Event] = None):
+        stop = stop or asyncio.Event()
+        loop = asyncio.get_running_loop()
+        while not stop.is_set():
+            started = loop.time()
+            try:
+                pairs = await self.tick()
+            except Exception as e:
+                # One bad tick must not stop the shard's loop (or, through
+                # asyncio.gather, the other shards')
+                logger.error(f"Matchmaking tick failed: {str(e)}")
+            else:
+                if pairs:
+                    logger.debug(
+                        f"Paired {len(pairs)} matches in {(loop.time() - started) * 1000:.1f}ms"
+                    )
+            try:
+                await asyncio.wait_for(stop.wait(), max(self.interval - (loop.time() - started), 0))
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,189 @@
+"""
+Prometheus metrics of the code execution pipeline.
+
+The metrics live in the default ``prometheus_client`` registry and are
+updated where the work happens:
+
+- ``kodewar_task_queue_wait_seconds``: time between publishing a task and
+  a worker starting it, by queue. The publish time travels in the
+  ``sent_at`` message header (see ``stamp_sent_at``);
+- ``kodewar_sandbox_phase_seconds``: container create, start, wait, log
+  collection and remove latency (see ``core.sandbox``);
+- ``kodewar_submission_latency_seconds``: submit-to-verdict latency of
+  interactive submissions, by final status (see ``core.status``);
+- counters of execution timeouts, OOM kills and sandbox errors by class;
+- the number of containers executing submissions;
+- the depth of every Celery queue, read from the broker at scrape time.
+
+Web servers and Celery's prefork pool run several processes, so metrics
+are kept in ``prometheus_client``'s multiprocess mode whenever
+``PROMETHEUS_MULTIPROC_DIR`` is set: every process writes its samples to
+files in that directory and a scrape aggregates them. The web processes
+serve ``/metrics``; a worker serves its processes' samples on
+``METRICS['worker_port']``, from an exporter started in the main process.
+"""
+import glob
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import redis
+from celery.signals import (
+    before_task_publish, task_prerun, worker_init, worker_process_shutdown
+)
+from django.conf import settings
+from prometheus_client import (
+    REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+    start_http_server
+)
+from prometheus_client.core import GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+MULTIPROC_DIR_ENV = 'PROMETHEUS_MULTIPROC_DIR'
+
+if os.environ.get(MULTIPROC_DIR_ENV):
+    # Samples are written to files there as soon as a metric exists
+    os.makedirs(os.environ[MULTIPROC_DIR_ENV], exist_ok=True)
+
+# Container operations take milliseconds; executions take seconds
+PHASE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+QUEUE_WAIT = Histogram(
+    'kodewar_task_queue_wait_seconds', 'Time tasks spend queued before a worker starts them',
+    ['queue'], buckets=LATENCY_BUCKETS
+)
+SANDBOX_PHASE = Histogram(
+    'kodewar_sandbox_phase_seconds', 'Latency of sandbox container operations',
+    ['phase'], buckets=PHASE_BUCKETS
+)
+SUBMISSION_LATENCY = Histogram(
+    'kodewar_submission_latency_seconds', 'Time from submission to verdict',
+    ['status'], buckets=LATENCY_BUCKETS
+)
+SANDBOX_TIMEOUTS = Counter(
+    'kodewar_sandbox_timeouts', 'Executions stopped for exceeding their time limit'
+)
+SANDBOX_OOM_KILLS = Counter(
+    'kodewar_sandbox_oom_kills', 'Sandbox containers killed for exceeding their memory limit'
+)
+SANDBOX_ERRORS = Counter(
+    'kodewar_sandbox_errors', 'Failed executions by error class', ['error']
+)
+CONTAINERS_IN_FLIGHT = Gauge(
+    'kodewar_sandbox_containers_in_flight', 'Containers currently executing submissions',
+    multiprocess_mode='livesum'
+)
+
+_broker: Optional[redis.Redis] = None
+
+
+@contextmanager
+def observe_phase(phase: str):
+    """Time a sandbox container operation."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        SANDBOX_PHASE.labels(phase).observe(time.perf_counter() - start)
+
+
+def observe_verdict(status: str, submitted_at: float):
+    SUBMISSION_LATENCY.labels(status).observe(max(time.time() - submitted_at, 0))
+
+
+def stamp_sent_at(headers=None, **kwargs):
+    """``before_task_publish`` receiver: record when a task was published."""
+    if headers is not None:
+        headers.setdefault('sent_at', time.time())
+
+
+def observe_queue_wait(task=None, **kwargs):
+    """``task_prerun`` receiver: observe how long the task was queued."""
+    request = task.request
+    sent_at = getattr(request, 'sent_at', None)
+    if sent_at is None:
+        return
+    queue = (request.delivery_info or {}).get('routing_key') or 'unknown'
+    QUEUE_WAIT.labels(queue).observe(max(time.time() - float(sent_at), 0))
+
+
+class QueueDepthCollector:
+    """Report the number of messages waiting in each Celery queue."""
+
+    def collect(self):
+        global _broker
+        if _broker is None:
+            _broker = redis.Redis.from_url(settings.CELERY_BROKER_URL)
+        config = settings.METRICS
+        family = GaugeMetricFamily(
+            'kodewar_queue_depth', 'Messages waiting in a Celery queue', labels=['queue']
+        )
+        try:
+            pipe = _broker.pipeline(transaction=False)
+            for queue in config['queues']:
+                # The Redis transport keeps one list per priority step
+                for step in range(config['priority_steps']):
+                    pipe.llen(f'{queue}:{step}' if step else queue)
+            lengths = pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Failed to read queue depths: {str(e)}")
+            return
+        steps = config['priority_steps']
+        for index, queue in enumerate(config['queues']):
+            family.add_metric([queue], sum(lengths[index * steps:(index + 1) * steps]))
+        yield family
+
+
+_queue_registry = CollectorRegistry(auto_describe=False)
+_queue_registry.register(QueueDepthCollector())
+
+
+def _process_registry() -> CollectorRegistry:
+    """The samples of every process on this host, or of this process alone."""
+    if os.environ.get(MULTIPROC_DIR_ENV):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render() -> bytes:
+    """Render the metrics of this host and the queue depths for a scrape."""
+    return generate_latest(_process_registry()) + generate_latest(_queue_registry)
+
+
+def start_worker_exporter(**kwargs):
+    """
+    ``worker_init`` receiver: serve the worker's metrics over HTTP.
+
+    Runs in the worker's main process, before the pool is forked, so the
+    samples left behind by processes of a previous run are discarded first.
+    """
+    path = os.environ.get(MULTIPROC_DIR_ENV)
+    if path:
+        own = f'_{os.getpid()}.db'
+        for stale in glob.glob(os.path.join(path, '*.db')):
+            if not stale.endswith(own):
+                os.remove(stale)
+    else:
+        logger.warning(
+            f"{MULTIPROC_DIR_ENV} is not set; only the main worker process is exported"
+        )
+    start_http_server(settings.METRICS['worker_port'], registry=_process_registry())
+
+
+def mark_process_dead(pid=None, **kwargs):
+    """``worker_process_shutdown`` receiver: drop a pool process's live gauges."""
+    if os.environ.get(MULTIPROC_DIR_ENV):
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
+# Task modules import this module before a worker initialises
+before_task_publish.connect(stamp_sent_at)
+task_prerun.connect(observe_queue_wait)
+worker_init.connect(start_worker_exporter)
+worker_process_shutdown.connect(mark_process_dead)
@@ -0,0 +1,59 @@
+import uuid
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Submission',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('mission_id', models.CharField(blank=True, default='', max_length=100)),
+                ('language', models.CharField(default='', max_length=20)),
+                ('code', models.TextField(default='')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('success', 'Success'), ('error', 'Error')], default='pending', max_length=10)),
+                ('output', models.TextField(blank=True, default='')),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['user', '-created_at'], name='submission_user_created'),
+                    models.Index(fields=['mission_id', '-created_at'], name='submission_mission_created'),
+                    models.Index(fields=['created_at'], name='submission_created'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='TestResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('passed', models.BooleanField()),
+                ('input', models.JSONField(null=True)),
+                ('expected', models.JSONField(null=True)),
+                ('actual', models.JSONField(null=True)),
+                ('diff', models.JSONField(blank=True, null=True)),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='test_results', to='core.submission')),
+            ],
+            options={
+                'ordering': ['submission', 'position'],
+                'constraints': [
+                    models.UniqueConstraint(fields=('submission', 'position'), name='test_result_position'),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_submissionarchive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='submission',
+            name='submission_user_created',
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['user', '-created_at', '-id'], include=['mission_id', 'language', 'status', 'completed_at'], name='submission_user_history'),
+        ),
+    ]
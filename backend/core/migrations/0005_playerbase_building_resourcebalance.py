@@ -0,0 +1,58 @@
+import uuid
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_playerrating_match'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerBase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('grid_width', models.PositiveSmallIntegerField()),
+                ('grid_height', models.PositiveSmallIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='player_base', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Building',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('type', models.CharField(max_length=30)),
+                ('level', models.PositiveSmallIntegerField(default=1)),
+                ('x', models.PositiveSmallIntegerField()),
+                ('y', models.PositiveSmallIntegerField()),
+                ('health', models.PositiveIntegerField()),
+                ('max_health', models.PositiveIntegerField()),
+                ('active_from', models.DateTimeField(help_text='When construction completes and production starts')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('base', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buildings', to='core.playerbase')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResourceBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(max_length=30)),
+                ('amount', models.FloatField()),
+                ('checkpoint_at', models.DateTimeField()),
+                ('base', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resources', to='core.playerbase')),
+            ],
+            options={
+                'constraints': [
+                    models.UniqueConstraint(fields=('base', 'resource'), name='resource_balance_base_resource'),
+                ],
+            },
+        ),
+    ]
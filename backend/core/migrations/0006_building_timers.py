@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_playerbase_building_resourcebalance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='building',
+            name='state',
+            field=models.CharField(choices=[('constructing', 'Constructing'), ('active', 'Active'), ('upgrading', 'Upgrading')], default='constructing', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='building',
+            name='upgrade_completes_at',
+            field=models.DateTimeField(blank=True, help_text='When the pending upgrade to the next level completes', null=True),
+        ),
+        migrations.AddField(
+            model_name='building',
+            name='cooldown_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
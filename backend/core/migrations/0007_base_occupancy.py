@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_building_timers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playerbase',
+            name='occupancy',
+            field=models.BinaryField(default=b'', help_text='Occupancy bitmap of the grid (see core.occupancy)'),
+        ),
+        migrations.AddConstraint(
+            model_name='building',
+            constraint=models.UniqueConstraint(fields=('base', 'x', 'y'), name='building_base_position'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_userprofile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='replay',
+            field=models.BinaryField(default=b'', help_text='Event log of the match (see core.replay)'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_profile_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Mission',
+            fields=[
+                ('id', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True, default='')),
+                ('difficulty', models.CharField(choices=[('beginner', 'Beginner'), ('intermediate', 'Intermediate'), ('advanced', 'Advanced')], default='beginner', max_length=20)),
+                ('rewards', models.JSONField(blank=True, default=list)),
+                ('position', models.PositiveIntegerField(default=0, help_text='Order in the catalog')),
+                ('published', models.BooleanField(default=True)),
+                ('test_cases', models.JSONField(blank=True, default=list)),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_mission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='mission_version',
+            field=models.PositiveIntegerField(blank=True, help_text="Version of the mission's catalog test cases the submission was graded against", null=True),
+        ),
+    ]
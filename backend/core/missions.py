@@ -0,0 +1,235 @@
+"""
+Versioned mission catalog cache.
+
+Mission definitions are read on every page load and every submission, so
+reads never reach the database in steady state. There are three tiers:
+
+1. A per-process LRU of decoded entries.
+2. Redis, holding immutable, version-stamped values:
+
+   - ``missions:version``: the catalog version, incremented on publish;
+   - ``missions:catalog:{version}``: the published missions, without
+     their test cases, as JSON;
+   - ``missions:bundle:{mission_id}:{mission_version}``: the test cases of
+     one version of a mission, serialised once when it is published.
+
+3. The ``Mission`` table, from which a missing catalog is rebuilt.
+
+Because every key carries a version, cached values never go stale; a
+process only needs to know the current catalog version. Publishing
+announces the new version on the ``missions:invalidate`` channel, which a
+listener thread per process follows. A process without a live listener
+reads the version at most every ``version_check_interval`` seconds.
+
+A submission for a mission carries only the mission ID and version; the
+worker takes the decoded test cases from its LRU, so test definitions
+are decoded once per process and version, not per submission.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+
+from .models import Mission
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'missions:version'
+INVALIDATE_CHANNEL = 'missions:invalidate'
+
+# Mission fields served in the catalog
+CATALOG_FIELDS = ('id', 'title', 'description', 'difficulty', 'rewards', 'version')
+
+
+def catalog_key(version: int) -> str:
+    return f'missions:catalog:{version}'
+
+
+def bundle_key(mission_id: str, version: int) -> str:
+    return f'missions:bundle:{mission_id}:{version}'
+
+
+class LRUCache:
+    """A small thread-safe least-recently-used cache."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_lru: Optional[LRUCache] = None
+_version: Dict[str, Any] = {'current': None, 'checked_at': 0.0}
+_listener: Dict[str, Any] = {'pid': None, 'thread': None}
+
+
+def _cache() -> LRUCache:
+    global _lru
+    if _lru is None:
+        _lru = LRUCache(settings.MISSIONS['lru_size'])
+    return _lru
+
+
+def reset():
+    """Forget everything cached in this process."""
+    _cache().clear()
+    _version.update(current=None, checked_at=0.0)
+
+
+def encode_bundle(mission_id: str, version: int, test_cases: List[Dict[str, Any]]) -> bytes:
+    """Serialise the test cases of a mission version."""
+    return json.dumps(
+        {'mission_id': mission_id, 'version': version, 'test_cases': test_cases},
+        separators=(',', ':'), sort_keys=True
+    ).encode()
+
+
+def _on_invalidate(message):
+    # Versions only grow; a late message must not move the process back
+    version = max(int(message['data']), _version['current'] or 0)
+    _version.update(current=version, checked_at=time.monotonic())
+
+
+def _ensure_listener():
+    """Start this process's invalidation listener, again after a fork."""
+    if not settings.MISSIONS['pubsub']:
+        return
+    thread = _listener['thread']
+    if _listener['pid'] == os.getpid() and thread is not None and thread.is_alive():
+        return
+    try:
+        pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{INVALIDATE_CHANNEL: _on_invalidate})
+        _listener.update(pid=os.getpid(), thread=pubsub.run_in_thread(sleep_time=1, daemon=True))
+        # Read the version once subscribed, so no publish falls in between
+        _version['checked_at'] = 0.0
+    except Exception as e:
+        logger.warning(f"Mission invalidation listener unavailable, polling instead: {str(e)}")
+
+
+def current_version() -> int:
+    """Return the catalog version, as pushed by pub/sub or read at most every interval."""
+    _ensure_listener()
+    thread = _listener['thread']
+    listening = _listener['pid'] == os.getpid() and thread is not None and thread.is_alive()
+    now = time.monotonic()
+    stale = now - _version['checked_at'] > settings.MISSIONS['version_check_interval']
+    if _version['current'] is None or (stale and not listening) or _version['checked_at'] == 0.0:
+        version = get_redis().get(VERSION_KEY)
+        if version is None:
+            version = publish_catalog()
+        _version.update(current=int(version), checked_at=now)
+    return _version['current']
+
+
+def publish_catalog() -> int:
+    """
+    Publish the current missions as a new catalog version.
+
+    Bundles are only written for mission versions not published before.
+
+    Returns:
+        The new catalog version
+    """
+    client = get_redis()
+    missions = list(Mission.objects.filter(published=True).order_by('position', 'id'))
+    pipe = client.pipeline()
+    for mission in missions:
+        pipe.set(
+            bundle_key(mission.id, mission.version),
+            encode_bundle(mission.id, mission.version, mission.test_cases),
+            nx=True, ex=settings.MISSIONS['bundle_ttl']
+        )
+    pipe.execute()
+    version = client.incr(VERSION_KEY)
+    pipe = client.pipeline()
+    pipe.set(catalog_key(version), _encode_catalog(missions))
+    # Catalogs are small; earlier versions only have to outlive the readers still on them
+    pipe.expire(catalog_key(version - 1), settings.MISSIONS['bundle_ttl'])
+    pipe.publish(INVALIDATE_CHANNEL, version)
+    pipe.execute()
+    return version
+
+
+def _encode_catalog(missions: List[Mission]) -> bytes:
+    return json.dumps(
+        [{field: getattr(mission, field) for field in CATALOG_FIELDS} for mission in missions],
+        separators=(',', ':')
+    ).encode()
+
+
+def get_catalog() -> Dict[str, Any]:
+    """
+    Return the current catalog.
+
+    Returns:
+        Dict with the catalog ``version`` and its ``missions`` in order
+    """
+    version = current_version()
+    lru = _cache()
+    catalog = lru.get(('catalog', version))
+    if catalog is None:
+        data = get_redis().get(catalog_key(version))
+        if data is None:
+            # Evicted or flushed; the rebuilt catalog carries the same content
+            data = _encode_catalog(
+                list(Mission.objects.filter(published=True).order_by('position', 'id'))
+            )
+            get_redis().set(catalog_key(version), data, nx=True)
+        missions = json.loads(data)
+        catalog = {
+            'version': version,
+            'missions': missions,
+            'by_id': {mission['id']: mission for mission in missions},
+        }
+        lru.set(('catalog', version), catalog)
+    return catalog
+
+
+def get_mission(mission_id: str) -> Optional[Dict[str, Any]]:
+    """Return a published mission of the current catalog, without its test cases."""
+    return get_catalog()['by_id'].get(mission_id)
+
+
+def get_test_cases(mission_id: str, version: int) -> Optional[List[Dict[str, Any]]]:
+    """Return the test cases of a mission version, decoded once per process."""
+    lru = _cache()
+    test_cases = lru.get(('bundle', mission_id, version))
+    if test_cases is None:
+        data = get_redis().get(bundle_key(mission_id, version))
+        if data is None:
+            mission = Mission.objects.filter(id=mission_id, version=version).first()
+            if mission is None:
+                return None
+            data = encode_bundle(mission_id, version, mission.test_cases)
+            get_redis().set(
+                bundle_key(mission_id, version), data, nx=True,
+                ex=settings.MISSIONS['bundle_ttl']
+            )
+        test_cases = json.loads(data)['test_cases']
+        lru.set(('bundle', mission_id, version), test_cases)
+    return test_cases
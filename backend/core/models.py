@@ -1,3 +1,309 @@
+import uuid
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+
+class Submission(models.Model):
+    """
+    A code submission and its final verdict.
+
+    Rows are written behind the cache by the submission stream consumer
+    (see ``core.persistence``), never synchronously by the workers.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('success', 'Success'),
+        ('error', 'Error'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='submissions',
+        null=True,
+        blank=True
+    )
+    mission_id = models.CharField(max_length=100, blank=True, default='')
+    mission_version = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text="Version of the mission's catalog test cases the submission was graded against"
+    )
+    language = models.CharField(max_length=20, default='')
+    code = models.TextField(default='')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    output = models.TextField(blank=True, default='')
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Covers the history listing so a page is an index-only scan (see core.history)
+            models.Index(
+                fields=['user', '-created_at', '-id'],
+                name='submission_user_history',
+                include=['mission_id', 'language', 'status', 'completed_at'],
+            ),
+            models.Index(fields=['mission_id', '-created_at'], name='submission_mission_created'),
+            models.Index(fields=['created_at'], name='submission_created'),
+        ]
+
+    def __str__(self):
+        return f'Submission {self.id} ({self.status})'
+
+
+class TestResult(models.Model):
+    """Outcome of one test case of a submission."""
+    submission = models.ForeignKey(
+        Submission,
+        on_delete=models.CASCADE,
+        related_name='test_results'
+    )
+    position = models.PositiveIntegerField()
+    passed = models.BooleanField()
+    input = models.JSONField(null=True)
+    expected = models.JSONField(null=True)
+    actual = models.JSONField(null=True)
+    diff = models.JSONField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['submission', 'position']
+        constraints = [
+            models.UniqueConstraint(fields=['submission', 'position'], name='test_result_position'),
+        ]
+
+    def __str__(self):
+        return f'Test {self.position} of submission {self.submission_id}'
+
+
+class SubmissionArchive(models.Model):
+    """
+    A month of submissions moved out of the hot tables into a compressed archive.
+
+    The archive is a JSON Lines file made of independently gzipped members
+    plus a sidecar index of fixed-width ``(uuid, member offset)`` records
+    sorted by UUID, so a single record can be read without decompressing
+    the whole month.
+    """
+    month = models.DateField(unique=True)
+    path = models.CharField(max_length=500)
+    index_path = models.CharField(max_length=500)
+    row_count = models.PositiveIntegerField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-month']
+
+    def __str__(self):
+        return f'Submission archive {self.month:%Y-%m} ({self.row_count} rows)'
+
+
+class PlayerRating(models.Model):
+    """
+    PvP rating and record of a player.
+
+    The global ranking is served from a Redis sorted set kept in step with
+    this table (see ``core.leaderboard``), not by ordering it.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='pvp_rating'
+    )
+    rating = models.FloatField()
+    wins = models.PositiveIntegerField(default=0)
+    losses = models.PositiveIntegerField(default=0)
+    draws = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.user_id}: {self.rating:.0f}'
+
+
+class Mission(models.Model):
+    """
+    A mission and its test cases.
+
+    Reads go through the versioned catalog cache (see ``core.missions``);
+    ``version`` is bumped whenever the mission changes, so cached copies of
+    older versions are never served as current.
+    """
+    DIFFICULTY_CHOICES = [
+        ('beginner', 'Beginner'),
+        ('intermediate', 'Intermediate'),
+        ('advanced', 'Advanced'),
+    ]
+
+    id = models.CharField(max_length=100, primary_key=True)
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True, default='')
+    difficulty = models.CharField(max_length=20, choices=DIFFICULTY_CHOICES, default='beginner')
+    rewards = models.JSONField(default=list, blank=True)
+    position = models.PositiveIntegerField(default=0, help_text="Order in the catalog")
+    published = models.BooleanField(default=True)
+    test_cases = models.JSONField(default=list, blank=True)
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.id} v{self.version}'
+
+
+class UserProfile(models.Model):
+    """
+    Per-player profile data.
+
+    The counters are denormalised: they are incremented with ``F()``
+    updates as missions are completed and matches finish, and reconciled
+    nightly (see ``core.profiles``). ``last_active`` lags presence by up to
+    one flush interval; it is written in batches from Redis (see
+    ``core.presence``), not per request.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='profile'
+    )
+    last_active = models.DateTimeField(null=True, blank=True)
+    experience = models.PositiveBigIntegerField(default=0)
+    credits = models.PositiveBigIntegerField(default=0)
+    completed_missions = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'Profile of {self.user_id}'
+
+
+class CompletedMission(models.Model):
+    """The first submission of a user to pass every test of a mission."""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='mission_completions'
+    )
+    mission_id = models.CharField(max_length=100)
+    completed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'mission_id'], name='completed_mission_user'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.mission_id}'
+
+
+class Match(models.Model):
+    """A finished PvP match and the rating change it caused."""
+    id = models.UUIDField(primary_key=True, editable=False)
+    player_a = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+'
+    )
+    player_b = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+'
+    )
+    winner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    rating_a = models.FloatField(help_text="Rating of player A before the match")
+    rating_b = models.FloatField(help_text="Rating of player B before the match")
+    rating_change_a = models.FloatField()
+    rating_change_b = models.FloatField()
+    started_at = models.DateTimeField(null=True, blank=True)
+    ended_at = models.DateTimeField(default=timezone.now)
+    replay = models.BinaryField(
+        default=b'', help_text="Event log of the match (see core.replay)"
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['player_a', '-ended_at'], name='match_player_a_ended'),
+            models.Index(fields=['player_b', '-ended_at'], name='match_player_b_ended'),
+        ]
+
+    def __str__(self):
+        return f'Match {self.id}'
+
+
+class PlayerBase(models.Model):
+    """A player's base: a building grid and its resource balances."""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='player_base'
+    )
+    name = models.CharField(max_length=100)
+    grid_width = models.PositiveSmallIntegerField()
+    grid_height = models.PositiveSmallIntegerField()
+    occupancy = models.BinaryField(
+        default=b'', help_text="Occupancy bitmap of the grid (see core.occupancy)"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name} ({self.user_id})'
+
+
+class Building(models.Model):
+    """
+    A building placed on a base; see ``core.buildings`` for the templates.
+
+    ``state`` is flipped by timer events (see ``core.scheduler``), but
+    production never waits for them: ``core.economy`` reads ``active_from``
+    and ``upgrade_completes_at`` directly.
+    """
+    STATE_CHOICES = [
+        ('constructing', 'Constructing'),
+        ('active', 'Active'),
+        ('upgrading', 'Upgrading'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    base = models.ForeignKey(PlayerBase, on_delete=models.CASCADE, related_name='buildings')
+    type = models.CharField(max_length=30)
+    level = models.PositiveSmallIntegerField(default=1)
+    x = models.PositiveSmallIntegerField()
+    y = models.PositiveSmallIntegerField()
+    health = models.PositiveIntegerField()
+    max_health = models.PositiveIntegerField()
+    state = models.CharField(max_length=12, choices=STATE_CHOICES, default='constructing')
+    active_from = models.DateTimeField(help_text="When construction completes and production starts")
+    upgrade_completes_at = models.DateTimeField(
+        null=True, blank=True, help_text="When the pending upgrade to the next level completes"
+    )
+    cooldown_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['base', 'x', 'y'], name='building_base_position'),
+        ]
+
+    def __str__(self):
+        return f'{self.type} L{self.level} at ({self.x}, {self.y})'
+
+
+class ResourceBalance(models.Model):
+    """
+    A resource balance of a base, as of its last checkpoint.
+
+    The current amount is computed on read from the checkpoint and the
+    base's producers (see ``core.economy``); rows are only written when
+    resources are collected or spent.
+    """
+    base = models.ForeignKey(PlayerBase, on_delete=models.CASCADE, related_name='resources')
+    resource = models.CharField(max_length=30)
+    amount = models.FloatField()
+    checkpoint_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['base', 'resource'], name='resource_balance_base_resource'),
+        ]
 
-# Create your models here.
+    def __str__(self):
+        return f'{self.resource} of base {self.base_id}'
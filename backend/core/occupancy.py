@@ -0,0 +1,121 @@
+"""
+Occupancy bitmaps of base grids.
+
+Each base keeps one bit per grid cell, row-major, set where a building's
+footprint covers the cell. Placement, moves and neighbour lookups test
+and flip only the cells of a footprint, never the other buildings.
+Serialised, a grid is a 4-byte header (width, height) plus
+``ceil(width * height / 8)`` bytes: 17 bytes for the default 10x10 grid.
+
+The bitmap is stored on ``PlayerBase.occupancy`` and updated in the same
+transaction as the buildings, under the base's row lock, so it is never
+out of step with them; changes always start from that stored copy. Reads
+that only inspect the grid go through the cache (``get_grid``), which
+writers refresh once they commit.
+"""
+import struct
+from typing import Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .buildings import BUILDING_TEMPLATES
+
+HEADER = struct.Struct('>HH')
+
+Cell = Tuple[int, int]
+
+
+def grid_cache_key(base_id: int) -> str:
+    return f'base_grid_{base_id}'
+
+
+def footprint(building_type: str) -> Tuple[int, int]:
+    return BUILDING_TEMPLATES[building_type]['footprint']
+
+
+class OccupancyGrid:
+    def __init__(self, width: int, height: int, bits: Optional[bytearray] = None):
+        self.width = width
+        self.height = height
+        self.bits = bits if bits is not None else bytearray((width * height + 7) // 8)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'OccupancyGrid':
+        width, height = HEADER.unpack_from(data)
+        return cls(width, height, bytearray(data[HEADER.size:]))
+
+    def to_bytes(self) -> bytes:
+        return HEADER.pack(self.width, self.height) + bytes(self.bits)
+
+    @classmethod
+    def from_buildings(cls, width: int, height: int,
+                       buildings: Iterable[Tuple[str, int, int]]) -> 'OccupancyGrid':
+        """Build a grid from ``(type, x, y)`` of every building of a base."""
+        grid = cls(width, height)
+        for building_type, x, y in buildings:
+            grid.occupy(x, y, *footprint(building_type))
+        return grid
+
+    def _cells(self, x: int, y: int, w: int, h: int) -> Iterable[int]:
+        for row in range(y, y + h):
+            for col in range(x, x + w):
+                yield row * self.width + col
+
+    def in_bounds(self, x: int, y: int, w: int = 1, h: int = 1) -> bool:
+        return x >= 0 and y >= 0 and x + w <= self.width and y + h <= self.height
+
+    def is_occupied(self, x: int, y: int) -> bool:
+        cell = y * self.width + x
+        return bool(self.bits[cell >> 3] & (1 << (cell & 7)))
+
+    def is_free(self, x: int, y: int, w: int = 1, h: int = 1) -> bool:
+        """Return whether a footprint is inside the grid and covers no occupied cell."""
+        return self.in_bounds(x, y, w, h) and not any(
+            self.bits[cell >> 3] & (1 << (cell & 7)) for cell in self._cells(x, y, w, h)
+        )
+
+    def occupy(self, x: int, y: int, w: int = 1, h: int = 1):
+        for cell in self._cells(x, y, w, h):
+            self.bits[cell >> 3] |= 1 << (cell & 7)
+
+    def release(self, x: int, y: int, w: int = 1, h: int = 1):
+        for cell in self._cells(x, y, w, h):
+            self.bits[cell >> 3] &= ~(1 << (cell & 7)) & 0xFF
+
+    def neighbours(self, x: int, y: int, w: int = 1, h: int = 1) -> List[Cell]:
+        """Return the occupied cells bordering a footprint, diagonals included."""
+        ring = [(col, y - 1) for col in range(x - 1, x + w + 1)]
+        ring += [(col, y + h) for col in range(x - 1, x + w + 1)]
+        ring += [(x - 1, row) for row in range(y, y + h)]
+        ring += [(x + w, row) for row in range(y, y + h)]
+        return [
+            (col, row) for col, row in ring
+            if self.in_bounds(col, row) and self.is_occupied(col, row)
+        ]
+
+
+def load_grid(base) -> OccupancyGrid:
+    """Return the grid stored on a base, rebuilding it from the buildings if it is missing."""
+    if base.occupancy:
+        return OccupancyGrid.from_bytes(base.occupancy)
+    return OccupancyGrid.from_buildings(
+        base.grid_width, base.grid_height, base.buildings.values_list('type', 'x', 'y')
+    )
+
+
+def get_grid(base) -> OccupancyGrid:
+    """Return the grid of a base, from the cache if possible."""
+    data = cache.get(grid_cache_key(base.id))
+    if data is not None:
+        return OccupancyGrid.from_bytes(data)
+    grid = load_grid(base)
+    cache_grid(base.id, grid)
+    return grid
+
+
+def cache_grid(base_id: int, grid: OccupancyGrid):
+    cache.set(
+        grid_cache_key(base_id), grid.to_bytes(),
+        timeout=settings.BASE_CONFIG['grid_cache_timeout']
+    )
@@ -0,0 +1,295 @@
+"""
+Write-behind persistence of submissions.
+
+The API and the workers never write submissions to the database
+directly. They append small events to a Redis stream (in the same
+pipeline as their cache update), and ``SubmissionStreamConsumer`` drains
+the stream in batches with ``bulk_create`` upserts. That keeps the
+database write rate flat regardless of submission throughput.
+
+Events are delivered at least once; every write is an idempotent upsert,
+so replaying a batch after a crash is harmless. Mission completions are
+credited to profiles in the same transaction (see ``core.profiles``).
+
+A batch the database is unavailable for is kept and retried. A batch that
+fails otherwise is persisted one event at a time, and events that fail on
+their own (malformed, or pointing at a deleted user) are moved to the
+``submissions:dead-letter`` stream, so one bad event never blocks the rest.
+"""
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import InterfaceError, OperationalError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .archive import load_archived_submission, serialize_submission
+from .models import Submission, TestResult
+from .profiles import record_completions
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY = 'submissions:events'
+CONSUMER_GROUP = 'submission-persisters'
+DEAD_LETTER_KEY = 'submissions:dead-letter'
+
+# Database errors that say nothing about the events; their batch is retried
+TRANSIENT_ERRORS = (OperationalError, InterfaceError)
+
+
+def created_event(submission_id: str, language: str, code: str, user_id: Optional[int] = None,
+                  mission_id: str = '', mission_version: Optional[int] = None) -> Dict[str, Any]:
+    return {
+        'type': 'created',
+        'id': str(submission_id),
+        'user_id': user_id,
+        'mission_id': mission_id or '',
+        'mission_version': mission_version,
+        'language': language,
+        'code': code,
+        'created_at': timezone.now().isoformat(),
+    }
+
+
+def completed_event(submission_id: str, state: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'type': 'completed',
+        'id': str(submission_id),
+        'status': state.get('status'),
+        'output': state.get('output') or '',
+        'error': state.get('error') or '',
+        'test_results': state.get('test_results') or [],
+        'completed_at': timezone.now().isoformat(),
+    }
+
+
+def append_event(event: Dict[str, Any], pipe=None):
+    """
+    Append an event to the submission stream.
+
+    Args:
+        event: Event built by ``created_event`` or ``completed_event``
+        pipe: Optional Redis pipeline to add the XADD to instead of sending it now
+    """
+    (pipe or get_redis()).xadd(STREAM_KEY, {'event': json.dumps(event)})
+
+
+def persist_events(events: List[Dict[str, Any]]):
+    """
+    Upsert a batch of submission events into the database.
+
+    Events for the same submission are coalesced, so a batch costs a fixed
+    handful of statements however many events it holds. Creation and
+    completion upserts touch disjoint columns, which makes the result
+    independent of the order the two events are applied in.
+    """
+    created: Dict[str, Dict[str, Any]] = {}
+    completed: Dict[str, Dict[str, Any]] = {}
+    for event in events:
+        target = created if event['type'] == 'created' else completed
+        target[event['id']] = event
+
+    batch_size = settings.SUBMISSION_PERSISTENCE['batch_size']
+    with transaction.atomic():
+        if created:
+            Submission.objects.bulk_create(
+                [
+                    Submission(
+                        id=event['id'],
+                        user_id=event['user_id'],
+                        mission_id=event['mission_id'],
+                        mission_version=event.get('mission_version'),
+                        language=event['language'],
+                        code=event['code'],
+                        created_at=parse_datetime(event['created_at']),
+                    )
+                    for event in created.values()
+                ],
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=['id'],
+                update_fields=[
+                    'user', 'mission_id', 'mission_version', 'language', 'code', 'created_at'
+                ],
+            )
+        if completed:
+            Submission.objects.bulk_create(
+                [
+                    Submission(
+                        id=event['id'],
+                        status=event['status'],
+                        output=event['output'],
+                        error=event['error'],
+                        completed_at=parse_datetime(event['completed_at']),
+                    )
+                    for event in completed.values()
+                ],
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=['id'],
+                update_fields=['status', 'output', 'error', 'completed_at'],
+            )
+            # A rejudge replaces the previous results wholesale
+            TestResult.objects.filter(submission_id__in=list(completed)).delete()
+            TestResult.objects.bulk_create(
+                [
+                    TestResult(
+                        submission_id=event['id'],
+                        position=position,
+                        passed=result['passed'],
+                        input=result.get('input'),
+                        expected=result.get('expected'),
+                        actual=result.get('actual'),
+                        diff=result.get('diff'),
+                    )
+                    for event in completed.values()
+                    for position, result in enumerate(event['test_results'])
+                ],
+                batch_size=batch_size,
+            )
+        record_completions(set(created) | set(completed))
+
+
+class SubmissionStreamConsumer:
+    """Drain the submission stream into the database in batches."""
+
+    def __init__(self, name: str, batch_size: Optional[int] = None,
+                 block_ms: Optional[int] = None, claim_idle_ms: Optional[int] = None):
+        config = settings.SUBMISSION_PERSISTENCE
+        self.name = name
+        self.batch_size = batch_size or config['batch_size']
+        self.block_ms = block_ms if block_ms is not None else config['block_ms']
+        self.claim_idle_ms = claim_idle_ms or config['claim_idle_ms']
+        self.dead_letter_maxlen = config['dead_letter_maxlen']
+        self.redis = get_redis()
+        # A batch that could not be persisted or acknowledged, to retry first
+        self._retry: List[Tuple[bytes, Dict[str, Any]]] = []
+
+    def ensure_group(self):
+        try:
+            self.redis.xgroup_create(STREAM_KEY, CONSUMER_GROUP, id='0', mkstream=True)
+        except redis.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    def read_batch(self) -> List[Tuple[bytes, Dict[str, Any]]]:
+        """
+        Read the next batch of events.
+
+        Entries left unacknowledged by a crashed consumer for longer than
+        ``claim_idle_ms`` are claimed first, so no event is stranded.
+        """
+        _, entries, *_ = self.redis.xautoclaim(
+            STREAM_KEY, CONSUMER_GROUP, self.name,
+            min_idle_time=self.claim_idle_ms, start_id='0-0', count=self.batch_size
+        )
+        if not entries:
+            response = self.redis.xreadgroup(
+                CONSUMER_GROUP, self.name, {STREAM_KEY: '>'},
+                count=self.batch_size, block=self.block_ms or None
+            )
+            entries = response[0][1] if response else []
+        return [
+            (entry_id, _decode_event(fields[b'event']))
+            for entry_id, fields in entries
+            if fields
+        ]
+
+    def run_once(self) -> int:
+        """
+        Persist one batch and acknowledge it.
+
+        Raises:
+            redis.ConnectionError, OperationalError, InterfaceError: If Redis or
+                the database is unavailable; the batch is retried by the next call
+
+        Returns:
+            Number of events handled, persisted or dead-lettered
+        """
+        batch, self._retry = self._retry or self.read_batch(), []
+        if not batch:
+            return 0
+        try:
+            dead = self.persist(batch)
+            entry_ids = [entry_id for entry_id, _ in batch]
+            pipe = self.redis.pipeline(transaction=False)
+            for entry_id, event, error in dead:
+                pipe.xadd(
+                    DEAD_LETTER_KEY,
+                    {'entry_id': entry_id, 'event': json.dumps(event), 'error': error},
+                    maxlen=self.dead_letter_maxlen, approximate=True
+                )
+            pipe.xack(STREAM_KEY, CONSUMER_GROUP, *entry_ids)
+            pipe.xdel(STREAM_KEY, *entry_ids)
+            pipe.execute()
+        except Exception:
+            self._retry = batch
+            raise
+        logger.debug(f"Persisted {len(batch) - len(dead)} submission events")
+        return len(batch)
+
+    def persist(self, batch: List[Tuple[bytes, Dict[str, Any]]]) -> List[Tuple[bytes, Dict, str]]:
+        """
+        Persist a batch, falling back to one event at a time if it fails.
+
+        Returns:
+            ``(entry_id, event, error)`` of every event that failed on its own
+        """
+        try:
+            persist_events([event for _, event in batch])
+            return []
+        except TRANSIENT_ERRORS:
+            raise
+        except Exception as e:
+            logger.warning(f"Batch of {len(batch)} events failed, persisting one by one: {e!r}")
+        dead = []
+        for entry_id, event in batch:
+            try:
+                persist_events([event])
+            except TRANSIENT_ERRORS:
+                raise
+            except Exception as e:
+                logger.error(f"Moving submission event {entry_id!r} to the dead letters: {e!r}")
+                dead.append((entry_id, event, repr(e)))
+        return dead
+
+
+def _decode_event(data: bytes) -> Dict[str, Any]:
+    try:
+        return json.loads(data)
+    except ValueError:
+        # Kept as is for the dead letters; persisting it fails on the missing type
+        return {'raw': data.decode(errors='replace')}
+
+
+def load_submission_state(submission_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Rebuild the status payload of a submission from the database.
+
+    Used once the cached state has expired. Submissions of archived months
+    are read lazily from their archive.
+    """
+    try:
+        submission = Submission.objects.prefetch_related('test_results').get(id=submission_id)
+    except Submission.DoesNotExist:
+        record = load_archived_submission(submission_id)
+        return _state_payload(record) if record else None
+    except (ValidationError, ValueError):
+        return None
+    return _state_payload(serialize_submission(submission))
+
+
+def _state_payload(record: Dict[str, Any]) -> Dict[str, Any]:
+    state = {'status': record['status']}
+    if record['output']:
+        state['output'] = record['output']
+    if record['error']:
+        state['error'] = record['error']
+    if record['test_results']:
+        state['test_results'] = record['test_results']
+    return state
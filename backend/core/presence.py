@@ -0,0 +1,197 @@
+"""
+Online presence of PvP players.
+
+Clients connected to the lobby socket send a heartbeat every
+``PRESENCE['heartbeat_interval']`` seconds. Each heartbeat is a single
+script call that:
+
+- refreshes ``presence:user:{id}``, the player's status (``idle``,
+  ``in_queue`` or ``in_match``), which expires ``ttl`` seconds after the
+  last heartbeat;
+- scores the player with the heartbeat time in ``presence:{status}``, one
+  sorted set per status;
+- records the time in the ``presence:last_seen`` hash.
+
+A player is online while their score is within ``ttl`` of now, so counts
+are a ZCOUNT and listings a ZREVRANGEBYSCORE with a limit, both O(log n)
+however many players are online; expired entries are only pruned
+periodically. Status changes come from matchmaking events rather than
+heartbeats and are broadcast to the lobby group.
+
+Nothing is written to the database per heartbeat: ``flush_last_active``
+periodically drains ``presence:last_seen`` into ``UserProfile.last_active``
+in batched upserts, so each player costs one row write per flush at most.
+"""
+import logging
+import time
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, List, Optional
+
+import redis
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from .models import UserProfile
+from .profiles import profile_cache_key
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ('idle', 'in_queue', 'in_match')
+LOBBY_GROUP = 'pvp_lobby'
+LAST_SEEN_KEY = 'presence:last_seen'
+FLUSHING_KEY = 'presence:last_seen:flushing'
+
+HEARTBEAT_SCRIPT = """
+local user, now, ttl = ARGV[1], tonumber(ARGV[2]), tonumber(ARGV[3])
+local status = redis.call('GET', KEYS[1]) or 'idle'
+redis.call('SET', KEYS[1], status, 'EX', ttl)
+local sets = {idle = KEYS[2], in_queue = KEYS[3], in_match = KEYS[4]}
+redis.call('ZADD', sets[status], now, user)
+redis.call('HSET', KEYS[5], user, now)
+return status
+"""
+
+SET_STATUS_SCRIPT = """
+local user, status, now, ttl = ARGV[1], ARGV[2], tonumber(ARGV[3]), tonumber(ARGV[4])
+local previous = redis.call('GET', KEYS[1])
+redis.call('SET', KEYS[1], status, 'EX', ttl)
+local sets = {idle = KEYS[2], in_queue = KEYS[3], in_match = KEYS[4]}
+for name, key in pairs(sets) do
+  if name ~= status then
+    redis.call('ZREM', key, user)
+  end
+end
+redis.call('ZADD', sets[status], now, user)
+redis.call('HSET', KEYS[5], user, now)
+return previous
+"""
+
+
+def status_key(status: str) -> str:
+    return f'presence:{status}'
+
+
+def user_key(user_id: int) -> str:
+    return f'presence:user:{user_id}'
+
+
+def _keys(user_id: int) -> List[str]:
+    return [user_key(user_id)] + [status_key(s) for s in STATUSES] + [LAST_SEEN_KEY]
+
+
+def heartbeat(user_id: int, now: Optional[float] = None) -> str:
+    """
+    Mark a player online, keeping their current status.
+
+    Returns:
+        The player's status
+    """
+    script = get_redis().register_script(HEARTBEAT_SCRIPT)
+    status = script(
+        keys=_keys(user_id), args=[user_id, now or time.time(), settings.PRESENCE['ttl']]
+    )
+    return status.decode()
+
+
+def set_status(user_id: int, status: str, now: Optional[float] = None):
+    """Move a player to a status and tell the lobby if it changed."""
+    script = get_redis().register_script(SET_STATUS_SCRIPT)
+    previous = script(
+        keys=_keys(user_id),
+        args=[user_id, status, now or time.time(), settings.PRESENCE['ttl']]
+    )
+    if previous is None or previous.decode() != status:
+        try:
+            async_to_sync(get_channel_layer().group_send)(
+                LOBBY_GROUP, {'type': 'presence.status', 'user_id': user_id, 'status': status}
+            )
+        except Exception as e:
+            # Presence is advisory; a lost broadcast is corrected by the next lobby fetch
+            logger.warning(f"Failed to broadcast status of player {user_id}: {str(e)}")
+
+
+def counts(now: Optional[float] = None) -> Dict[str, int]:
+    """Return the number of online players in each status."""
+    cutoff = (now or time.time()) - settings.PRESENCE['ttl']
+    pipe = get_redis().pipeline(transaction=False)
+    for status in STATUSES:
+        pipe.zcount(status_key(status), cutoff, '+inf')
+    return dict(zip(STATUSES, pipe.execute()))
+
+
+def online_players(limit: int, now: Optional[float] = None) -> List[Dict]:
+    """Return up to ``limit`` online players, most recently active first."""
+    cutoff = (now or time.time()) - settings.PRESENCE['ttl']
+    pipe = get_redis().pipeline(transaction=False)
+    for status in STATUSES:
+        pipe.zrevrangebyscore(status_key(status), '+inf', cutoff, start=0, num=limit, withscores=True)
+    players = [
+        {'user_id': int(member), 'status': status, 'last_active': score}
+        for status, rows in zip(STATUSES, pipe.execute())
+        for member, score in rows
+    ]
+    players.sort(key=lambda player: player['last_active'], reverse=True)
+    return players[:limit]
+
+
+def prune(now: Optional[float] = None) -> int:
+    """Drop players whose last heartbeat is older than the TTL; returns how many."""
+    cutoff = (now or time.time()) - settings.PRESENCE['ttl']
+    pipe = get_redis().pipeline(transaction=False)
+    for status in STATUSES:
+        pipe.zremrangebyscore(status_key(status), '-inf', f'({cutoff}')
+    return sum(pipe.execute())
+
+
+def _write_last_active(last_seen: Dict[int, float]):
+    existing = get_user_model().objects.filter(id__in=list(last_seen)).values_list('id', flat=True)
+    UserProfile.objects.bulk_create(
+        [
+            UserProfile(
+                user_id=user_id,
+                last_active=datetime.fromtimestamp(last_seen[user_id], tz=dt_timezone.utc)
+            )
+            for user_id in existing
+        ],
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['last_active'],
+    )
+    cache.delete_many([profile_cache_key(user_id) for user_id in existing])
+
+
+def flush_last_active() -> int:
+    """
+    Write the heartbeat times recorded since the last flush to ``UserProfile``.
+
+    The hash is renamed before it is read, so heartbeats arriving during
+    the flush go to a fresh hash. A flush that died part way is finished
+    by the next one.
+
+    Returns:
+        Number of players flushed
+    """
+    client = get_redis()
+    if not client.exists(FLUSHING_KEY):
+        try:
+            client.rename(LAST_SEEN_KEY, FLUSHING_KEY)
+        except redis.ResponseError:
+            return 0  # nobody was seen since the last flush
+    batch_size = settings.PRESENCE['flush_batch_size']
+    flushed = 0
+    batch: Dict[int, float] = {}
+    for user_id, seen_at in client.hscan_iter(FLUSHING_KEY, count=batch_size):
+        batch[int(user_id)] = float(seen_at)
+        if len(batch) >= batch_size:
+            _write_last_active(batch)
+            flushed += len(batch)
+            batch = {}
+    if batch:
+        _write_last_active(batch)
+        flushed += len(batch)
+    client.delete(FLUSHING_KEY)
+    return flushed
@@ -0,0 +1,278 @@
+"""
+Player profiles: denormalised counters and the cached read path.
+
+Profile counters are never computed with aggregate queries on read:
+
+- ``record_completions`` runs in the submission persistence transaction
+  (see ``core.persistence``). It records the first passing submission of
+  each user and mission as a ``CompletedMission`` and adds the mission
+  rewards to ``UserProfile`` with ``F()`` updates. The profile rows are
+  locked first, so concurrent batches cannot count a mission twice.
+- ``award_match`` runs in the match result transaction (see
+  ``core.rating``), next to the wins and losses on ``PlayerRating``.
+
+Profiles are read cache-aside: ``get_profile`` serves a cached dict and
+builds it from three primary-key lookups on a miss. Writers delete the
+cached copy once their transaction commits.
+
+``reconcile_profiles`` recounts every counter from the source tables
+(completed missions, match records) in chunks of users and fixes any
+drift. Credits are a balance rather than an aggregate, so they are only
+maintained incrementally.
+"""
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Min, Q
+
+from .db_router import use_primary
+from .models import CompletedMission, Match, PlayerRating, Submission, UserProfile
+
+
+def profile_cache_key(user_id: int) -> str:
+    return f'profile_{user_id}'
+
+
+def level_for(experience: int) -> int:
+    return experience // settings.PROFILE['experience_per_level'] + 1
+
+
+def invalidate_profiles(user_ids: Iterable[int]):
+    """Drop the cached profiles of users once the current transaction commits."""
+    keys = [profile_cache_key(user_id) for user_id in set(user_ids)]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _lock_profiles(user_ids: Iterable[int]) -> Dict[int, UserProfile]:
+    """
+    Create missing profiles and lock them all, in user order.
+
+    Callers that also lock ``PlayerRating`` rows lock those first, as the
+    match result transaction does.
+    """
+    user_ids = sorted(set(user_ids))
+    UserProfile.objects.bulk_create(
+        [UserProfile(user_id=user_id) for user_id in user_ids], ignore_conflicts=True
+    )
+    return {
+        profile.user_id: profile
+        for profile in UserProfile.objects.select_for_update().filter(user_id__in=user_ids)
+        .order_by('user_id')
+    }
+
+
+def _passing_submissions(queryset):
+    """
+    Mission submissions by a user that ran tests and passed every one.
+
+    Only submissions graded against the mission's own catalog test cases
+    count; ones graded against test cases of the client's choosing never do.
+    """
+    return (
+        queryset.filter(
+            status='success', user__isnull=False, mission_version__isnull=False,
+            test_results__isnull=False
+        )
+        .exclude(mission_id='').exclude(test_results__passed=False)
+    )
+
+
+def record_completions(submission_ids: Iterable[str]) -> int:
+    """
+    Credit users for the missions the given submissions complete for the first time.
+
+    Must run inside a transaction, after the submissions and their test
+    results are written. Both the creation and the completion of a
+    submission may be the event that makes it countable, so callers pass
+    every submission they touched.
+
+    Returns:
+        Number of newly completed missions
+    """
+    completions = {}
+    for user_id, mission_id, completed_at in _passing_submissions(
+        Submission.objects.filter(id__in=list(submission_ids))
+    ).values_list('user_id', 'mission_id', 'completed_at').order_by('completed_at'):
+        completions.setdefault((user_id, mission_id), completed_at)
+    if not completions:
+        return 0
+
+    _lock_profiles(user_id for user_id, _ in completions)
+    users = {user_id for user_id, _ in completions}
+    existing = set(
+        CompletedMission.objects.filter(user_id__in=users)
+        .filter(mission_id__in={mission_id for _, mission_id in completions})
+        .values_list('user_id', 'mission_id')
+    )
+    new = {key: at for key, at in completions.items() if key not in existing}
+    if not new:
+        return 0
+    CompletedMission.objects.bulk_create(
+        [
+            CompletedMission(user_id=user_id, mission_id=mission_id, completed_at=at)
+            for (user_id, mission_id), at in new.items()
+        ],
+        ignore_conflicts=True,
+    )
+
+    config = settings.PROFILE
+    per_user = Counter(user_id for user_id, _ in new)
+    for user_id, count in per_user.items():
+        UserProfile.objects.filter(user_id=user_id).update(
+            completed_missions=F('completed_missions') + count,
+            experience=F('experience') + count * config['mission_experience'],
+            credits=F('credits') + count * config['mission_credits'],
+        )
+    invalidate_profiles(per_user)
+    return len(new)
+
+
+def award_match(outcomes: Dict[int, str]):
+    """
+    Add the experience and credits of a finished match.
+
+    Must run inside the match result transaction.
+
+    Args:
+        outcomes: ``win``, ``loss`` or ``draw`` by user ID
+    """
+    config = settings.PROFILE
+    _lock_profiles(outcomes)
+    for user_id, outcome in outcomes.items():
+        UserProfile.objects.filter(user_id=user_id).update(
+            experience=F('experience') + config['match_experience'][outcome],
+            credits=F('credits') + config['match_credits'][outcome],
+        )
+    invalidate_profiles(outcomes)
+
+
+def _build_profile(user_id: int) -> Optional[Dict[str, Any]]:
+    user = get_user_model().objects.filter(id=user_id).values(
+        'id', 'username', 'email', 'date_joined'
+    ).first()
+    if user is None:
+        return None
+    profile = UserProfile.objects.filter(user_id=user_id).values(
+        'experience', 'credits', 'completed_missions', 'last_active'
+    ).first() or {'experience': 0, 'credits': 0, 'completed_missions': 0, 'last_active': None}
+    rating = PlayerRating.objects.filter(user_id=user_id).values(
+        'rating', 'wins', 'losses', 'draws'
+    ).first() or {'rating': settings.RATING['initial'], 'wins': 0, 'losses': 0, 'draws': 0}
+    return {
+        'id': user['id'],
+        'username': user['username'],
+        'email': user['email'],
+        'level': level_for(profile['experience']),
+        'experience': profile['experience'],
+        'credits': profile['credits'],
+        'completed_missions': profile['completed_missions'],
+        'pvp_stats': rating,
+        'created_at': user['date_joined'],
+        'last_active': profile['last_active'],
+    }
+
+
+def get_profile(user_id: int) -> Optional[Dict[str, Any]]:
+    """Return a user's profile, from the cache if possible."""
+    key = profile_cache_key(user_id)
+    profile = cache.get(key)
+    if profile is None:
+        profile = _build_profile(user_id)
+        if profile is not None:
+            cache.set(key, profile, timeout=settings.PROFILE['cache_timeout'])
+    return profile
+
+
+def _match_counts(user_ids: List[int]) -> Dict[int, Counter]:
+    counts: Dict[int, Counter] = defaultdict(Counter)
+    for side in ('player_a', 'player_b'):
+        rows = (
+            Match.objects.filter(**{f'{side}_id__in': user_ids}).values(side).annotate(
+                win=Count('id', filter=Q(winner=F(side))),
+                draw=Count('id', filter=Q(winner__isnull=True)),
+                total=Count('id'),
+            )
+        )
+        for row in rows:
+            counts[row[side]].update(
+                win=row['win'], draw=row['draw'], loss=row['total'] - row['win'] - row['draw']
+            )
+    return counts
+
+
+def _reconcile_chunk(user_ids: List[int]) -> int:
+    config = settings.PROFILE
+    with transaction.atomic():
+        # Counted under the locks the incremental updates take, so none is lost
+        ratings = list(
+            PlayerRating.objects.select_for_update().filter(user_id__in=user_ids).order_by('user_id')
+        )
+        profiles = _lock_profiles(user_ids)
+        # Completions the incremental path missed, e.g. before it existed
+        CompletedMission.objects.bulk_create(
+            [
+                CompletedMission(user_id=row['user_id'], mission_id=row['mission_id'],
+                                 completed_at=row['first'])
+                for row in _passing_submissions(Submission.objects.filter(user_id__in=user_ids))
+                .values('user_id', 'mission_id').annotate(first=Min('completed_at'))
+            ],
+            ignore_conflicts=True,
+        )
+        missions = dict(
+            CompletedMission.objects.filter(user_id__in=user_ids).values('user_id')
+            .annotate(count=Count('id')).values_list('user_id', 'count')
+        )
+        matches = _match_counts(user_ids)
+
+        changed = set()
+        stale_profiles = []
+        for user_id, profile in profiles.items():
+            outcomes = matches.get(user_id, Counter())
+            completed = missions.get(user_id, 0)
+            experience = completed * config['mission_experience'] + sum(
+                config['match_experience'][outcome] * count for outcome, count in outcomes.items()
+            )
+            if (profile.completed_missions, profile.experience) != (completed, experience):
+                profile.completed_missions, profile.experience = completed, experience
+                stale_profiles.append(profile)
+                changed.add(user_id)
+        UserProfile.objects.bulk_update(stale_profiles, ['completed_missions', 'experience'])
+
+        stale_ratings = []
+        for rating in ratings:
+            outcomes = matches.get(rating.user_id, Counter())
+            record = (outcomes['win'], outcomes['loss'], outcomes['draw'])
+            if (rating.wins, rating.losses, rating.draws) != record:
+                rating.wins, rating.losses, rating.draws = record
+                stale_ratings.append(rating)
+                changed.add(rating.user_id)
+        PlayerRating.objects.bulk_update(stale_ratings, ['wins', 'losses', 'draws'])
+        invalidate_profiles(changed)
+    return len(changed)
+
+
+def reconcile_profiles() -> int:
+    """
+    Recount every profile counter from the source tables.
+
+    Returns:
+        Number of users whose counters had drifted
+    """
+    chunk_size = settings.PROFILE['reconcile_chunk']
+    fixed = 0
+    last_id = 0
+    with use_primary():
+        while True:
+            user_ids = list(
+                get_user_model().objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', flat=True)[:chunk_size]
+            )
+            if not user_ids:
+                return fixed
+            fixed += _reconcile_chunk(user_ids)
+            last_id = user_ids[-1]
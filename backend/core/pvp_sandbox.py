@@ -0,0 +1,145 @@
+"""
+Pre-warmed sandboxes for PvP matches.
+
+Both players of a match submit for the same problem within minutes of
+being paired, so match creation starts their sandboxes ahead of time:
+one idle container per player and language in
+``PVP_SANDBOX['languages']``. Submissions made in the match then execute
+inside the player's running container instead of paying for a container
+create and start each time.
+
+To keep the timing comparison fair, all containers of a match are created
+through the same Docker daemon (host) and pinned to the same cpuset, the
+least used slot of ``PVP_SANDBOX['cpusets']`` on that host. Both players
+therefore run on identical CPUs under identical limits.
+
+The reservation is a Redis hash ``pvp_sandbox:{match_id}`` mapping
+``{player_id}:{language}`` to a container ID, plus the daemon and cpuset.
+A worker attached to another daemon cannot reach the containers and runs
+the submission in a fresh container as usual. Reservations are released
+when the match is finalised; containers that are never released remove
+themselves after ``idle_timeout``.
+
+The load of a cpuset is a sorted set of the matches holding it, scored by
+when their containers expire. Expired entries are dropped before the load
+is counted, so a match that is never finalised stops counting once its
+containers are gone.
+"""
+import logging
+import time
+from typing import List, Optional
+
+from django.conf import settings
+
+from .redis_client import get_redis
+from .sandbox import SandboxError, SandboxManager
+
+logger = logging.getLogger(__name__)
+
+# Least loaded cpuset of a host and its index in KEYS, one load key per
+# configured cpuset; ARGV are now, the expiry and the match ID
+PICK_CPUSET_SCRIPT = """
+local least, least_load
+for index, key in ipairs(KEYS) do
+  redis.call('ZREMRANGEBYSCORE', key, '-inf', ARGV[1])
+  local load = redis.call('ZCARD', key)
+  if least == nil or load < least_load then
+    least, least_load = index, load
+  end
+end
+redis.call('ZADD', KEYS[least], ARGV[2], ARGV[3])
+return least
+"""
+
+
+def reservation_key(match_id: str) -> str:
+    return f'pvp_sandbox:{match_id}'
+
+
+def cpuset_load_key(daemon_id: str, cpuset: str) -> str:
+    return f'pvp_sandbox:cpuset_load:{daemon_id}:{cpuset}'
+
+
+def _field(player_id: str, language: str) -> str:
+    return f'{player_id}:{language}'
+
+
+def prewarm_match(match_id: str, player_ids: List[str],
+                  sandbox: Optional[SandboxManager] = None) -> bool:
+    """
+    Reserve and start the sandboxes of a new match.
+
+    If any container fails to start, the ones already started are removed
+    and the match runs its submissions cold.
+
+    Returns:
+        Whether the sandboxes were reserved
+    """
+    config = settings.PVP_SANDBOX
+    sandbox = sandbox or SandboxManager()
+    client = get_redis()
+    daemon_id = sandbox.daemon_id()
+    now = time.time()
+    index = client.register_script(PICK_CPUSET_SCRIPT)(
+        keys=[cpuset_load_key(daemon_id, cpuset) for cpuset in config['cpusets']],
+        args=[now, now + config['idle_timeout'], match_id]
+    )
+    cpuset = config['cpusets'][int(index) - 1]
+
+    containers = {}
+    try:
+        for player_id in player_ids:
+            for language in config['languages']:
+                containers[_field(player_id, language)] = sandbox.start_warm_container(
+                    image=f'kodewar-sandbox-{language}',
+                    cpuset=cpuset,
+                    idle_timeout=config['idle_timeout'],
+                    labels={'kodewar.match': match_id, 'kodewar.player': player_id}
+                )
+    except SandboxError as e:
+        logger.warning(f"Running match {match_id} cold, pre-warming failed: {str(e)}")
+        for container_id in containers.values():
+            sandbox.cleanup(container_id)
+        client.zrem(cpuset_load_key(daemon_id, cpuset), match_id)
+        return False
+
+    pipe = client.pipeline()
+    pipe.hset(reservation_key(match_id), mapping={
+        **containers, 'daemon': daemon_id, 'cpuset': cpuset,
+    })
+    pipe.expire(reservation_key(match_id), config['idle_timeout'])
+    pipe.execute()
+    return True
+
+
+def warm_container(match_id: str, player_id: str, language: str,
+                   sandbox: SandboxManager) -> Optional[str]:
+    """Return the player's warm container for a language, if this worker can reach it."""
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.hget(reservation_key(match_id), _field(player_id, language))
+    pipe.hget(reservation_key(match_id), 'daemon')
+    container_id, daemon_id = pipe.execute()
+    if container_id is None or daemon_id.decode() != sandbox.daemon_id():
+        return None
+    return container_id.decode()
+
+
+def release_match(match_id: str, sandbox: Optional[SandboxManager] = None):
+    """Remove the sandboxes of a finished match and free its cpuset."""
+    client = get_redis()
+    pipe = client.pipeline()
+    pipe.hgetall(reservation_key(match_id))
+    pipe.delete(reservation_key(match_id))
+    fields, _ = pipe.execute()
+    if not fields:
+        return
+    reservation = {field.decode(): value.decode() for field, value in fields.items()}
+    sandbox = sandbox or SandboxManager()
+    daemon_id, cpuset = reservation.pop('daemon'), reservation.pop('cpuset')
+    for container_id in reservation.values():
+        try:
+            sandbox.cleanup(container_id)
+        except SandboxError as e:
+            # The container still removes itself once its idle timeout passes
+            logger.warning(f"Failed to remove warm container {container_id}: {str(e)}")
+    client.zrem(cpuset_load_key(daemon_id, cpuset), match_id)
@@ -0,0 +1,104 @@
+"""
+Elo ratings for PvP matches.
+
+A finished match updates both players' ratings in one transaction, with
+their rating rows locked in a fixed order so concurrent matches sharing a
+player serialise instead of losing an update. The leaderboard is updated
+once the transaction commits.
+"""
+from datetime import datetime
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+
+from .db_router import use_primary
+from .leaderboard import update_ratings
+from .models import Match, PlayerRating
+from .profiles import award_match
+
+OUTCOMES = {1.0: 'win', 0.0: 'loss', 0.5: 'draw'}
+
+
+def expected_score(rating: float, opponent_rating: float) -> float:
+    """Return the expected score (0 to 1) of a player against an opponent."""
+    return 1 / (1 + 10 ** ((opponent_rating - rating) / 400))
+
+
+def rating_changes(rating_a: float, rating_b: float, score_a: float,
+                   k_factor: Optional[float] = None) -> Tuple[float, float]:
+    """
+    Return the rating changes of both players.
+
+    Args:
+        rating_a: Rating of player A before the match
+        rating_b: Rating of player B before the match
+        score_a: 1 if A won, 0 if A lost, 0.5 for a draw
+        k_factor: Maximum change per match
+
+    Returns:
+        Tuple of (change for A, change for B); they sum to zero
+    """
+    k_factor = k_factor or settings.RATING['k_factor']
+    change = k_factor * (score_a - expected_score(rating_a, rating_b))
+    return change, -change
+
+
+def apply_match_result(match_id: str, player_a_id: int, player_b_id: int, winner_id: Optional[int],
+                       started_at: Optional[datetime] = None,
+                       ended_at: Optional[datetime] = None, replay: bytes = b'') -> Match:
+    """
+    Record a finished match and update both players' ratings.
+
+    Idempotent: applying the same match again returns the recorded match.
+
+    Args:
+        winner_id: Winning player, or None for a draw
+        replay: Event log of the match (see core.replay)
+    """
+    initial = settings.RATING['initial']
+    with use_primary(), transaction.atomic():
+        for user_id in sorted((player_a_id, player_b_id)):
+            PlayerRating.objects.get_or_create(user_id=user_id, defaults={'rating': initial})
+        players = {
+            rating.user_id: rating
+            for rating in PlayerRating.objects.select_for_update()
+            .filter(user_id__in=[player_a_id, player_b_id]).order_by('user_id')
+        }
+        # Checked under the row locks, so a concurrent retry of this match sees it
+        existing = Match.objects.filter(id=match_id).first()
+        if existing:
+            return existing
+
+        a, b = players[player_a_id], players[player_b_id]
+        score_a = 0.5 if winner_id is None else float(winner_id == player_a_id)
+        change_a, change_b = rating_changes(a.rating, b.rating, score_a)
+        match = Match.objects.create(
+            id=match_id,
+            player_a_id=player_a_id,
+            player_b_id=player_b_id,
+            winner_id=winner_id,
+            rating_a=a.rating,
+            rating_b=b.rating,
+            rating_change_a=change_a,
+            rating_change_b=change_b,
+            started_at=started_at,
+            replay=replay,
+            **({'ended_at': ended_at} if ended_at else {}),
+        )
+        for player, change, score in ((a, change_a, score_a), (b, change_b, 1 - score_a)):
+            player.rating += change
+            if score == 1:
+                player.wins += 1
+            elif score == 0:
+                player.losses += 1
+            else:
+                player.draws += 1
+            player.save(update_fields=['rating', 'wins', 'losses', 'draws', 'updated_at'])
+        award_match({
+            a.user_id: OUTCOMES[score_a], b.user_id: OUTCOMES[1 - score_a],
+        })
+
+        new_ratings = {a.user_id: a.rating, b.user_id: b.rating}
+        transaction.on_commit(lambda: update_ratings(new_ratings))
+    return match
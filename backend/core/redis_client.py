@@ -0,0 +1,15 @@
+"""Shared Redis client for the app's own keys (queues, counters, pub/sub)."""
+from typing import Optional
+
+import redis
+from django.conf import settings
+
+_redis_client: Optional[redis.Redis] = None
+
+
+def get_redis() -> redis.Redis:
+    """Return the process-wide Redis client."""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(settings.REDIS_URL)
+    return _redis_client
@@ -0,0 +1,174 @@
+"""
+Compact event log of PvP matches, for spectators and replays.
+
+Each match has an append-only binary log in the Redis string
+``pvp_replay:{match_id}``, created with the match. All integers are
+unsigned LEB128 varints:
+
+- header: ``b'KWR'``, a format version byte and the match creation time
+  in milliseconds;
+- then one record per event: the milliseconds since the previous event
+  (or the creation time), the event kind and the kind's fields.
+
+========== ==== =================================
+kind       code fields
+========== ==== =================================
+ready      1    player
+start      2
+submission 3    player
+verdict    4    player, passed, total
+finish     5    player, won (0 or 1)
+========== ==== =================================
+
+Player IDs are user IDs, so a typical record is 4-6 bytes. The delta is
+computed and prepended by ``APPEND_SCRIPT``, which also keeps the time of
+the last event, so concurrent writers never reorder the clock.
+
+Every append is sent to the match's spectator group as a chunk tagged with
+its byte offset in the log. A spectator joins the group first and then
+reads the match snapshot and the log so far in one transaction; it applies
+live chunks from the end of what it read, ignoring bytes it already has.
+One match thus serves any number of spectators from one Redis string and
+one group send per event, with no database queries. Once the match is
+finalised the log is copied to ``Match.replay``.
+"""
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from .redis_client import get_redis
+
+MAGIC = b'KWR'
+VERSION = 1
+
+READY, START, SUBMISSION, VERDICT, FINISH = 1, 2, 3, 4, 5
+
+# Names and fields of each kind, in record order
+KINDS = {
+    READY: ('ready', ('player',)),
+    START: ('start', ()),
+    SUBMISSION: ('submission', ('player',)),
+    VERDICT: ('verdict', ('player', 'passed', 'total')),
+    FINISH: ('finish', ('player', 'won')),
+}
+
+APPEND_SCRIPT = """
+local now = tonumber(ARGV[1])
+local last = tonumber(redis.call('GET', KEYS[2]))
+if not last then
+  return -1
+end
+local delta = math.max(now - last, 0)
+if now > last then
+  redis.call('SET', KEYS[2], now, 'KEEPTTL')
+end
+local bytes = {}
+repeat
+  local byte = delta % 128
+  delta = math.floor(delta / 128)
+  if delta > 0 then
+    byte = byte + 128
+  end
+  bytes[#bytes + 1] = string.char(byte)
+until delta == 0
+local record = table.concat(bytes) .. ARGV[2]
+return {redis.call('APPEND', KEYS[1], record) - #record, record}
+"""
+
+
+def log_key(match_id: str) -> str:
+    return f'pvp_replay:{match_id}'
+
+
+def clock_key(match_id: str) -> str:
+    return f'pvp_replay:{match_id}:clock'
+
+
+def spectator_group(match_id: str) -> str:
+    return f'pvp_spectate_{match_id}'
+
+
+def encode_varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def decode_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """Return the varint at ``pos`` and the position after it."""
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def start_log(pipe, match_id: str, created_at: float, ttl: int):
+    """Create the log of a new match on ``pipe``."""
+    created_ms = int(created_at * 1000)
+    pipe.set(log_key(match_id), MAGIC + bytes([VERSION]) + encode_varint(created_ms), ex=ttl)
+    pipe.set(clock_key(match_id), created_ms, ex=ttl)
+
+
+def append(match_id: str, kind: int, *values: int, now: Optional[float] = None) -> Optional[int]:
+    """
+    Append an event to a match's log and send it to the spectators.
+
+    Returns:
+        The offset of the record in the log, or None if the match has no log
+    """
+    if len(values) != len(KINDS[kind][1]):
+        raise ValueError(f"'{KINDS[kind][0]}' events take {len(KINDS[kind][1])} values")
+    body = encode_varint(kind) + b''.join(encode_varint(int(value)) for value in values)
+    script = get_redis().register_script(APPEND_SCRIPT)
+    result = script(
+        keys=[log_key(match_id), clock_key(match_id)],
+        args=[int((now or time.time()) * 1000), body]
+    )
+    if result == -1:
+        return None
+    offset, record = result
+    async_to_sync(get_channel_layer().group_send)(
+        spectator_group(match_id), {'type': 'replay.chunk', 'offset': offset, 'data': record}
+    )
+    return offset
+
+
+def get_log(match_id: str) -> Optional[bytes]:
+    return get_redis().get(log_key(match_id))
+
+
+def decode(data: bytes) -> Dict[str, Any]:
+    """
+    Decode a whole log.
+
+    Returns:
+        Dict with the match creation time and its events, each with its
+        kind name, absolute time ``at`` (seconds) and fields
+    """
+    if data[:3] != MAGIC or data[3] != VERSION:
+        raise ValueError("Not a replay log")
+    clock, pos = decode_varint(data, 4)
+    created_at = clock / 1000
+    events: List[Dict[str, Any]] = []
+    while pos < len(data):
+        delta, pos = decode_varint(data, pos)
+        kind, pos = decode_varint(data, pos)
+        clock += delta
+        name, fields = KINDS[kind]
+        event = {'type': name, 'at': clock / 1000}
+        for field in fields:
+            event[field], pos = decode_varint(data, pos)
+        events.append(event)
+    return {'created_at': created_at, 'events': events}
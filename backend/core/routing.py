@@ -0,0 +1,9 @@
+from django.urls import path
+
+from .consumers import LobbyConsumer, MatchConsumer, SpectatorConsumer
+
+websocket_urlpatterns = [
+    path('ws/pvp/lobby/', LobbyConsumer.as_asgi()),
+    path('ws/pvp/match/<uuid:match_id>/', MatchConsumer.as_asgi()),
+    path('ws/pvp/match/<uuid:match_id>/spectate/', SpectatorConsumer.as_asgi()),
+]
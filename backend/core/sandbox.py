@@ -1,11 +1,18 @@
 import docker
 import logging
 import os
+import requests
 from typing import Dict, Any, Optional
 from django.conf import settings
+from .metrics import SANDBOX_OOM_KILLS, SANDBOX_TIMEOUTS, observe_phase
+from .tracing import traced
+from . import fake_docker
 
 logger = logging.getLogger(__name__)
 
+# Docker daemon IDs by daemon URL; they do not change while the process runs
+_daemon_ids: Dict[str, str] = {}
+
 class SandboxError(Exception):
     """Base exception for sandbox-related errors."""
     pass
@@ -20,9 +27,14 @@ class SecurityError(SandboxError):
 
 class SandboxManager:
     def __init__(self):
-        self.client = docker.from_env()
         self.config = settings.SANDBOX_CONFIG
+        if self.config.get('backend', 'docker') == 'fake':
+            # In-process stand-in for benchmarks without a daemon (see core.fake_docker)
+            self.client = fake_docker.get_client(self.config)
+        else:
+            self.client = docker.from_env()
 
+    @traced('sandbox.create_container')
     def create_container(self, image: str, command: str, **kwargs) -> Dict[str, Any]:
         """
         Create a sandboxed container with the specified configuration.
@@ -53,7 +65,8 @@ class SandboxManager:
                 **kwargs
             }
             
-            container = self.client.containers.create(**container_config)
+            with observe_phase('create'):
+                container = self.client.containers.create(**container_config)
             logger.info(f"Created sandbox container {container.id}")
             return {'container_id': container.id, 'config': container_config}
             
@@ -64,6 +77,7 @@ class SandboxManager:
             logger.error(f"Unexpected error creating sandbox container: {str(e)}")
             raise SandboxError(f"Unexpected error: {str(e)}")
 
+    @traced('sandbox.run_container')
     def run_container(self, container_id: str, timeout: Optional[int] = None) -> Dict[str, Any]:
         """
         Run a sandboxed container and wait for completion.
@@ -77,13 +91,27 @@ class SandboxManager:
         """
         try:
             container = self.client.containers.get(container_id)
-            container.start()
+            with observe_phase('start'):
+                container.start()
             
             timeout = timeout or self.config['default_timeout']
-            result = container.wait(timeout=timeout)
+            try:
+                with observe_phase('wait'):
+                    result = container.wait(timeout=timeout)
+            except (requests.exceptions.ReadTimeout, requests.exceptions.ConnectionError):
+                # The Docker client gives up waiting once the timeout passes
+                SANDBOX_TIMEOUTS.inc()
+                raise
+            if result['StatusCode'] == 137:
+                # Killed; tell the kernel's OOM killer apart from other kills
+                container.reload()
+                if container.attrs['State'].get('OOMKilled'):
+                    SANDBOX_OOM_KILLS.inc()
             
-            logs = container.logs().decode('utf-8')
-            container.remove()
+            with observe_phase('logs'):
+                logs = container.logs().decode('utf-8')
+            with observe_phase('remove'):
+                container.remove()
             
             return {
                 'exit_code': result['StatusCode'],
@@ -98,6 +126,111 @@ class SandboxManager:
             logger.error(f"Unexpected error running sandbox container {container_id}: {str(e)}")
             raise SandboxError(f"Unexpected error: {str(e)}")
 
+    @traced('sandbox.start_warm_container')
+    def start_warm_container(self, image: str, cpuset: str, idle_timeout: int,
+                             labels: Optional[Dict[str, str]] = None) -> str:
+        """
+        Start a sandbox container that idles until commands are executed in it.
+        
+        The container stops and removes itself after ``idle_timeout``
+        seconds, so one that is never released does not outlive its match.
+        
+        Args:
+            image: Docker image to use
+            cpuset: CPUs to pin the container to (``cpuset_cpus``)
+            idle_timeout: Seconds the container lives for
+            labels: Labels to put on the container
+            
+        Returns:
+            ID of the running container
+        """
+        container = self.create_container(
+            image=image,
+            command=f'sleep {idle_timeout}',
+            cpuset_cpus=cpuset,
+            auto_remove=True,
+            labels=labels or {}
+        )
+        try:
+            self.client.containers.get(container['container_id']).start()
+            return container['container_id']
+        except Exception as e:
+            logger.error(f"Failed to start warm container {container['container_id']}: {str(e)}")
+            self.cleanup(container['container_id'])
+            raise SandboxError(f"Container start failed: {str(e)}")
+
+    @traced('sandbox.exec_in_container')
+    def exec_in_container(self, container_id: str, command: str,
+                          timeout: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Execute a command in a running (warm) container and wait for it.
+        
+        Processes the command leaves behind (backgrounded or daemonized) are
+        killed afterwards, so they cannot skew or read the next execution.
+        
+        Args:
+            container_id: ID of the container
+            command: Command to execute
+            timeout: Optional timeout in seconds
+            
+        Returns:
+            Dict containing execution results, as ``run_container``
+        """
+        timeout = timeout or self.config['default_timeout']
+        try:
+            container = self.client.containers.get(container_id)
+            # coreutils timeout exits with 124 when the command overruns
+            with observe_phase('exec'):
+                exit_code, output = container.exec_run(
+                    ['timeout', str(timeout), 'sh', '-c', command]
+                )
+                # kill -1 signals everything but the container's init (the
+                # idle sleep) and the shell itself
+                container.exec_run(['sh', '-c', 'kill -9 -1'])
+            if exit_code == 124:
+                SANDBOX_TIMEOUTS.inc()
+            return {
+                'exit_code': exit_code,
+                'logs': output.decode('utf-8'),
+                'error': 'Execution timed out' if exit_code == 124 else None
+            }
+        except docker.errors.APIError as e:
+            logger.error(f"Failed to execute in sandbox container {container_id}: {str(e)}")
+            raise SandboxError(f"Container execution failed: {str(e)}")
+        except Exception as e:
+            logger.error(f"Unexpected error executing in sandbox container {container_id}: {str(e)}")
+            raise SandboxError(f"Unexpected error: {str(e)}")
+
+    def daemon_id(self) -> str:
+        """Get the ID of the Docker daemon (host) the containers run on."""
+        base_url = self.client.api.base_url
+        if base_url not in _daemon_ids:
+            try:
+                _daemon_ids[base_url] = self.client.info()['ID']
+            except docker.errors.APIError as e:
+                raise SandboxError(f"Docker daemon inspection failed: {str(e)}")
+        return _daemon_ids[base_url]
+
+    @traced('sandbox.image_digest')
+    def image_digest(self, image: str) -> str:
+        """
+        Get the digest identifying the current build of an image.
+        
+        Args:
+            image: Name of the image
+            
+        Returns:
+            The image ID (``sha256:...``)
+        """
+        try:
+            return self.client.images.get(image).id
+        except docker.errors.ImageNotFound:
+            raise SandboxError(f"Sandbox image {image} not found")
+        except docker.errors.APIError as e:
+            logger.error(f"Failed to inspect sandbox image {image}: {str(e)}")
+            raise SandboxError(f"Image inspection failed: {str(e)}")
+
+    @traced('sandbox.cleanup')
     def cleanup(self, container_id: str):
         """
         Clean up a sandbox container.
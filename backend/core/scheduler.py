@@ -0,0 +1,125 @@
+"""
+Delayed events for building timers.
+
+Construction and upgrade completions are future-dated events, potentially
+millions of them, so they are not Celery ``eta`` tasks (which the broker
+holds in memory, per worker, until due). Instead every event is a member
+``{kind}:{target}`` of the ``scheduler:due`` sorted set, scored by its due
+time. Scheduling an event again replaces its due time, and cancelling it
+is a ZREM.
+
+A single ``run_scheduler`` process fires them: ``POP_SCRIPT`` atomically
+moves up to ``batch_size`` due events to ``scheduler:inflight``, scored
+by a lease deadline, and the handler of each kind gets the whole batch at
+once. Events are acknowledged (removed from the in-flight set) only after
+their handler returns, and the script first puts back events whose lease
+expired, so events popped by a process that died are delivered again.
+Handlers must therefore be idempotent. Both sets live in Redis, which
+keeps them across restarts of the scheduler.
+"""
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+DUE_KEY = 'scheduler:due'
+INFLIGHT_KEY = 'scheduler:inflight'
+
+POP_SCRIPT = """
+local due, inflight = KEYS[1], KEYS[2]
+local now, limit, lease = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local expired = redis.call('ZRANGEBYSCORE', inflight, '-inf', now, 'LIMIT', 0, limit)
+for _, event in ipairs(expired) do
+  -- NX keeps a due time set by rescheduling the event while it was in flight
+  redis.call('ZADD', due, 'NX', now, event)
+  redis.call('ZREM', inflight, event)
+end
+local events = redis.call('ZRANGEBYSCORE', due, '-inf', now, 'LIMIT', 0, limit)
+for _, event in ipairs(events) do
+  redis.call('ZADD', inflight, now + lease, event)
+  redis.call('ZREM', due, event)
+end
+return events
+"""
+
+Handler = Callable[[List[str], float], None]
+
+
+def event_key(kind: str, target: str) -> str:
+    return f'{kind}:{target}'
+
+
+def schedule(kind: str, target: str, due_at: datetime, pipe=None):
+    """Schedule (or reschedule) the ``kind`` event of ``target`` for ``due_at``."""
+    (pipe or get_redis()).zadd(DUE_KEY, {event_key(kind, target): due_at.timestamp()})
+
+
+def cancel(kind: str, target: str, pipe=None):
+    (pipe or get_redis()).zrem(DUE_KEY, event_key(kind, target))
+
+
+class Scheduler:
+    """Fire due events in batches, grouped by kind."""
+
+    def __init__(self, handlers: Dict[str, Handler], client=None, config: Optional[Dict] = None):
+        self.handlers = handlers
+        self.client = client or get_redis()
+        self.config = config or settings.SCHEDULER
+        self._pop = self.client.register_script(POP_SCRIPT)
+
+    def pop_due(self, now: float) -> List[str]:
+        events = self._pop(
+            keys=[DUE_KEY, INFLIGHT_KEY],
+            args=[now, self.config['batch_size'], self.config['lease']]
+        )
+        return [event.decode() for event in events]
+
+    def fire(self, now: Optional[float] = None) -> int:
+        """
+        Fire one batch of due events.
+
+        Returns:
+            Number of events popped
+        """
+        now = now or time.time()
+        events = self.pop_due(now)
+        by_kind = defaultdict(list)
+        for event in events:
+            kind, _, target = event.partition(':')
+            by_kind[kind].append(target)
+        for kind, targets in by_kind.items():
+            handler = self.handlers.get(kind)
+            if handler is None:
+                logger.error(f"No handler for {len(targets)} '{kind}' events, dropping them")
+            else:
+                try:
+                    handler(targets, now)
+                except Exception as e:
+                    # Left in flight, so they are delivered again once the lease expires
+                    logger.error(f"Handling {len(targets)} '{kind}' events failed: {str(e)}")
+                    continue
+            self.client.zrem(INFLIGHT_KEY, *(event_key(kind, target) for target in targets))
+        return len(events)
+
+    def next_due(self) -> Optional[float]:
+        first = self.client.zrange(DUE_KEY, 0, 0, withscores=True)
+        return first[0][1] if first else None
+
+    def run(self, stop: Optional[Callable[[], bool]] = None):
+        """Fire events until ``stop`` returns True, sleeping while nothing is due."""
+        stop = stop or (lambda: False)
+        while not stop():
+            if self.fire() >= self.config['batch_size']:
+                continue
+            next_due = self.next_due()
+            idle = self.config['idle_sleep']
+            if next_due is not None:
+                idle = min(max(next_due - time.time(), 0), idle)
+            time.sleep(idle)
@@ -1,5 +1,6 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import CodeSubmission
+from .buildings import BUILDING_TEMPLATES
 
 class TestCaseSerializer(serializers.Serializer):
     input = serializers.JSONField()
@@ -14,6 +15,19 @@ class CodeSubmissionSerializer(serializers.Serializer):
     )
     language = serializers.ChoiceField(choices=['python', 'javascript'])
     test_cases = TestCaseSerializer(many=True, required=False, default=list)
+    mission_id = serializers.CharField(
+        required=False,
+        allow_blank=True,
+        default='',
+        max_length=100,
+        help_text="Mission the submission answers, if any"
+    )
+    match_id = serializers.UUIDField(
+        required=False,
+        allow_null=True,
+        default=None,
+        help_text="PvP match the submission is made in, if any"
+    )
     test_file = serializers.CharField(
         required=True,
         help_text="Path to the test file"
@@ -47,9 +61,186 @@ class TestResultSerializer(serializers.Serializer):
     input = serializers.JSONField()
     expected = serializers.JSONField()
     actual = serializers.JSONField()
+    diff = serializers.JSONField(
+        required=False,
+        help_text="Bounded diff of expected vs actual output for failed cases"
+    )
 
 class StatusResponseSerializer(serializers.Serializer):
     status = serializers.ChoiceField(choices=['pending', 'success', 'error'])
     output = serializers.CharField(required=False)
     error = serializers.CharField(required=False)
-    test_results = TestResultSerializer(many=True, required=False) 
\ No newline at end of file
+    test_results = TestResultSerializer(many=True, required=False)
+
+class BatchStatusRequestSerializer(serializers.Serializer):
+    submission_ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        min_length=1,
+        max_length=settings.STATUS_BATCH_MAX_IDS,
+        help_text="IDs of the submissions to look up"
+    )
+
+class BulkSubmissionItemSerializer(serializers.Serializer):
+    submission_id = serializers.UUIDField(
+        required=False,
+        help_text="Existing submission to rejudge in place; a new ID is assigned if omitted"
+    )
+    code = serializers.CharField(required=True, min_length=1, max_length=50000)
+    language = serializers.ChoiceField(choices=['python', 'javascript'])
+    test_cases = TestCaseSerializer(many=True, required=False, default=list)
+
+class BulkSubmissionSerializer(serializers.Serializer):
+    submissions = serializers.ListField(
+        child=BulkSubmissionItemSerializer(),
+        min_length=1,
+        max_length=settings.REJUDGE_CONFIG['max_batch_size']
+    )
+    priority = serializers.IntegerField(
+        required=False,
+        min_value=0,
+        max_value=9,
+        help_text="Celery priority, 0 is highest; defaults to the low rejudge priority"
+    )
+    chunk_size = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        max_value=1000,
+        help_text="Submissions dispatched per tick"
+    )
+    interval = serializers.FloatField(
+        required=False,
+        min_value=0,
+        max_value=60,
+        help_text="Seconds between dispatch ticks"
+    )
+
+class BatchResponseSerializer(serializers.Serializer):
+    batch_id = serializers.UUIDField()
+    total = serializers.IntegerField()
+    submission_ids = serializers.ListField(child=serializers.UUIDField())
+
+class SubmissionHistoryItemSerializer(serializers.Serializer):
+    id = serializers.UUIDField()
+    mission_id = serializers.CharField()
+    language = serializers.CharField()
+    status = serializers.ChoiceField(choices=['pending', 'success', 'error'])
+    created_at = serializers.DateTimeField()
+    completed_at = serializers.DateTimeField(allow_null=True)
+
+class SubmissionHistorySerializer(serializers.Serializer):
+    results = SubmissionHistoryItemSerializer(many=True)
+    next_cursor = serializers.CharField(
+        allow_null=True,
+        help_text="Pass as ?cursor= to fetch the next page; null on the last page"
+    )
+
+class SubmissionCodeSerializer(serializers.Serializer):
+    id = serializers.UUIDField()
+    language = serializers.CharField()
+    code = serializers.CharField()
+
+class MatchmakingRequestSerializer(serializers.Serializer):
+    shard = serializers.ChoiceField(
+        choices=settings.MATCHMAKING['shards'],
+        required=False,
+        default=settings.MATCHMAKING['shards'][0],
+        help_text="Matchmaking queue to join or leave"
+    )
+
+class MatchmakingStatusSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=['idle', 'in_queue', 'matched'])
+    waited = serializers.FloatField(required=False, help_text="Seconds spent in the queue so far")
+    match_id = serializers.UUIDField(required=False)
+
+class MissionSerializer(serializers.Serializer):
+    id = serializers.CharField()
+    title = serializers.CharField()
+    description = serializers.CharField(allow_blank=True)
+    difficulty = serializers.CharField()
+    rewards = serializers.ListField(child=serializers.CharField())
+    version = serializers.IntegerField()
+
+class PvPStatsSerializer(serializers.Serializer):
+    rating = serializers.FloatField()
+    wins = serializers.IntegerField()
+    losses = serializers.IntegerField()
+    draws = serializers.IntegerField()
+
+class ProfileSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    username = serializers.CharField()
+    email = serializers.CharField(allow_blank=True)
+    level = serializers.IntegerField()
+    experience = serializers.IntegerField()
+    credits = serializers.IntegerField()
+    completed_missions = serializers.IntegerField()
+    pvp_stats = PvPStatsSerializer()
+    created_at = serializers.DateTimeField()
+    last_active = serializers.DateTimeField(allow_null=True)
+
+class OnlinePlayerSerializer(serializers.Serializer):
+    user_id = serializers.IntegerField()
+    username = serializers.CharField(allow_null=True)
+    rating = serializers.FloatField()
+    status = serializers.ChoiceField(choices=['idle', 'in_queue', 'in_match'])
+    last_active = serializers.FloatField(help_text="Unix time of the player's last heartbeat")
+
+class LobbySerializer(serializers.Serializer):
+    counts = serializers.DictField(
+        child=serializers.IntegerField(), help_text="Online players per status"
+    )
+    online_players = OnlinePlayerSerializer(many=True)
+
+class LeaderboardEntrySerializer(serializers.Serializer):
+    rank = serializers.IntegerField()
+    user_id = serializers.IntegerField()
+    username = serializers.CharField(allow_null=True)
+    rating = serializers.FloatField()
+
+class LeaderboardSerializer(serializers.Serializer):
+    rank = serializers.IntegerField(required=False, help_text="Rank of the requesting user")
+    rating = serializers.FloatField(required=False, help_text="Rating of the requesting user")
+    entries = LeaderboardEntrySerializer(many=True)
+
+class ResourceSerializer(serializers.Serializer):
+    type = serializers.CharField()
+    amount = serializers.FloatField()
+    production_rate = serializers.FloatField(help_text="Amount produced per minute")
+    last_collection_time = serializers.DateTimeField()
+
+class BuildingSerializer(serializers.Serializer):
+    id = serializers.UUIDField()
+    type = serializers.CharField()
+    level = serializers.IntegerField()
+    position = serializers.SerializerMethodField()
+    health = serializers.IntegerField()
+    max_health = serializers.IntegerField()
+    state = serializers.CharField()
+    active_from = serializers.DateTimeField()
+    upgrade_completes_at = serializers.DateTimeField(allow_null=True)
+    cooldown_until = serializers.DateTimeField(allow_null=True)
+
+    def get_position(self, building):
+        return {'x': building.x, 'y': building.y}
+
+class PlayerBaseSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    grid_width = serializers.IntegerField()
+    grid_height = serializers.IntegerField()
+    buildings = BuildingSerializer(many=True)
+    resources = ResourceSerializer(many=True)
+
+class CreateBaseSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=100)
+
+class PositionSerializer(serializers.Serializer):
+    x = serializers.IntegerField(min_value=0)
+    y = serializers.IntegerField(min_value=0)
+
+class PlaceBuildingSerializer(serializers.Serializer):
+    type = serializers.ChoiceField(choices=list(BUILDING_TEMPLATES))
+    position = PositionSerializer()
+
+class MoveBuildingSerializer(serializers.Serializer):
+    position = PositionSerializer()
@@ -0,0 +1,176 @@
+"""
+Submission state storage and change notifications.
+
+Workers store submission state in the cache and publish a small
+notification on a Redis channel. Long-polling status views park on those
+notifications through a single pattern subscription per event loop, so
+thousands of waiting requests share one Redis connection.
+"""
+import asyncio
+import json
+import logging
+import weakref
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+from django.core.cache import cache
+
+from .bulk import batch_progress_key
+from .metrics import observe_verdict
+from .persistence import append_event, completed_event
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+SUBMISSION_CHANNEL_PREFIX = 'submission_status:'
+# Celery's Redis result backend publishes every stored result on its key
+TASK_CHANNEL_PREFIX = 'celery-task-meta-'
+
+
+def submission_channel(submission_id: str) -> str:
+    return f'{SUBMISSION_CHANNEL_PREFIX}{submission_id}'
+
+
+def task_channel(task_id: str) -> str:
+    return f'{TASK_CHANNEL_PREFIX}{task_id}'
+
+
+def store_submission_state(submission_id: str, state: Dict[str, Any], timeout: int = 300,
+                           batch_id: Optional[str] = None, submitted_at: Optional[float] = None):
+    """
+    Store a submission's state and notify anyone waiting on it.
+
+    Args:
+        submission_id: ID of the submission
+        state: State dict as returned by the status endpoint
+        timeout: Cache timeout in seconds
+        batch_id: Bulk batch the submission belongs to, if any; its
+            progress counters are bumped once the state is final
+        submitted_at: When the submission was made (UNIX timestamp); the
+            submit-to-verdict latency is recorded once the state is final
+
+    Final states are also appended to the submission stream, from which
+    they are persisted to the database in batches.
+    """
+    cache.set(f'submission_{submission_id}', state, timeout=timeout)
+    if submitted_at is not None and state.get('status') in ('success', 'error'):
+        observe_verdict(state['status'], submitted_at)
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.publish(
+            submission_channel(submission_id),
+            json.dumps({'status': state.get('status')})
+        )
+        if state.get('status') in ('success', 'error'):
+            append_event(completed_event(submission_id, state), pipe)
+            if batch_id:
+                pipe.hincrby(batch_progress_key(batch_id), 'completed', 1)
+                if state['status'] == 'error':
+                    pipe.hincrby(batch_progress_key(batch_id), 'failed', 1)
+        pipe.execute()
+    except redis.RedisError as e:
+        # The cached state is still served; only the history record is lost
+        logger.error(f"Failed to publish status for submission {submission_id}: {str(e)}")
+
+
+class StatusListener:
+    """Fan Redis pub/sub notifications out to the requests waiting on them."""
+
+    patterns = (f'{SUBMISSION_CHANNEL_PREFIX}*', f'{TASK_CHANNEL_PREFIX}*')
+
+    def __init__(self, url: str):
+        self.url = url
+        self._waiters: Dict[str, Set[asyncio.Future]] = defaultdict(set)
+        self._task: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Event] = None
+
+    async def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._ready = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        await self._ready.wait()
+
+    async def _run(self):
+        client = aioredis.from_url(self.url)
+        pubsub = client.pubsub()
+        try:
+            await pubsub.psubscribe(*self.patterns)
+            self._ready.set()
+            async for message in pubsub.listen():
+                if message['type'] != 'pmessage':
+                    continue
+                self._wake(message['channel'].decode())
+        except Exception as e:
+            logger.error(f"Status listener stopped: {str(e)}")
+        finally:
+            # Never leave requests parked on a dead subscription
+            self._ready.set()
+            for channel in list(self._waiters):
+                self._wake(channel)
+            await pubsub.aclose()
+            await client.aclose()
+
+    def _wake(self, channel: str):
+        for future in self._waiters.pop(channel, ()):
+            if not future.done():
+                future.set_result(True)
+
+    async def register(self, channel: str) -> asyncio.Future:
+        """Start listening for a notification on a channel."""
+        await self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[channel].add(future)
+        return future
+
+    def unregister(self, channel: str, future: asyncio.Future):
+        waiters = self._waiters.get(channel)
+        if waiters is not None:
+            waiters.discard(future)
+            if not waiters:
+                del self._waiters[channel]
+
+
+_listeners: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, StatusListener]' = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_status_listener() -> StatusListener:
+    """Return the listener for the running event loop."""
+    loop = asyncio.get_running_loop()
+    listener = _listeners.get(loop)
+    if listener is None:
+        listener = _listeners[loop] = StatusListener(settings.REDIS_URL)
+    return listener
+
+
+async def wait_for_change(channel: str, timeout: float,
+                          is_pending: Callable[[], Awaitable[bool]]) -> bool:
+    """
+    Wait until a notification arrives on a channel or the timeout expires.
+
+    The listener is registered before ``is_pending`` is checked, so a state
+    change between the check and the wait is never missed.
+
+    Args:
+        channel: Channel the state change is published on
+        timeout: Maximum time to wait in seconds
+        is_pending: Coroutine function telling whether there is anything to wait for
+
+    Returns:
+        True if a notification arrived or nothing was pending, False on timeout
+    """
+    listener = get_status_listener()
+    future = await listener.register(channel)
+    try:
+        if not await is_pending():
+            return True
+        await asyncio.wait_for(future, timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+    finally:
+        listener.unregister(channel, future)
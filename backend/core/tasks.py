@@ -2,109 +2,375 @@ import os
 import json
 import tempfile
 import shutil
+import secrets
 from typing import Dict, Any, Optional
-from celery import shared_task
+from celery import shared_task, group
 import docker
 from docker.errors import DockerException
 from django.conf import settings
 from .sandbox import SandboxManager, SandboxError, ResourceLimitError, SecurityError
+from .diff import bounded_diff, clip_value
+from .status import store_submission_state
+from .bulk import get_batch_settings, pop_pending, record_dispatched
+from .match_state import flush_progress, get_match_mission, get_snapshot, record_progress
+from .rating import apply_match_result
+from .replay import get_log
+from .leaderboard import rebuild_leaderboard
+from .combat import load_defence, simulate, validate_army
+from .presence import flush_last_active, prune, set_status
+from .profiles import reconcile_profiles
+from .missions import get_test_cases
+from .metrics import CONTAINERS_IN_FLIGHT, SANDBOX_ERRORS
+from .tracing import span
+from .pvp_sandbox import prewarm_match, release_match, warm_container
+from .verdicts import (
+    image_digest, verdict_keys, get_cached_verdicts, store_verdicts, merge_verdicts
+)
 import logging
-from django.core.cache import cache
+from datetime import datetime, timezone as dt_timezone
 
 logger = logging.getLogger(__name__)
 
 @shared_task
-def run_code_task(code, language, test_cases=None, submission_id=None):
-    """Execute code in sandboxed environment."""
+def run_code_task(code, language, test_cases=None, submission_id=None, batch_id=None,
+                  match_id=None, player_id=None, mission_id=None, mission_version=None,
+                  submitted_at=None):
+    """
+    Execute code in sandboxed environment.
+    
+    When every test case has a cached verdict for the same code and
+    sandbox image, the sandbox is not started at all.
+    Submissions made during a PvP match report their progress to it.
+    Given a mission version instead of test cases, the mission's test
+    cases are taken from the mission catalog cache. ``submitted_at`` (a
+    UNIX timestamp) times the submission up to its verdict.
+    """
     sandbox = SandboxManager()
     container = None
+    image = f'kodewar-sandbox-{language}'
     
     try:
-        # Create container
-        container = sandbox.create_container(
-            code=code,
-            language=language,
-            test_cases=test_cases
-        )
+        if mission_version is not None:
+            test_cases = get_test_cases(mission_id, mission_version)
+            if test_cases is None:
+                raise SandboxError(f"Mission {mission_id} v{mission_version} is not available")
         
-        # Run container
-        result = sandbox.run_container(container)
+        keys, cached = [], {}
+        pending_cases = test_cases
+        if test_cases:
+            digest = image_digest(sandbox, image)
+            if digest:
+                keys = verdict_keys(code, language, test_cases, digest)
+                cached = get_cached_verdicts(keys)
+                # The command does not feed the test cases to the program, so its
+                # output always covers every case: either all are cached or all run
+                if len(cached) == len(keys):
+                    pending_cases = []
+                else:
+                    cached = {}
+        
+        output = ''
+        if pending_cases or not test_cases:
+            command = prepare_execution_command(code, language, pending_cases)
+            warm = (
+                warm_container(match_id, player_id, language, sandbox)
+                if match_id and player_id else None
+            )
+            with CONTAINERS_IN_FLIGHT.track_inprogress():
+                if warm:
+                    # Pre-warmed for the match; it is removed when the match ends
+                    result = sandbox.exec_in_container(warm, command)
+                else:
+                    # Create container
+                    container = sandbox.create_container(image=image, command=command)
+                    
+                    # Run container
+                    result = sandbox.run_container(container['container_id'])
+            output = result['logs']
         
         # Process results
         if test_cases:
-            test_results = []
-            for test_case, output in zip(test_cases, result['output'].split('\n')):
-                test_results.append({
-                    'input': test_case['input'],
-                    'expected': test_case['expected'],
-                    'actual': output,
-                    'passed': output.strip() == test_case['expected'].strip()
-                })
-            
-            # Store results in cache
-            cache.set(
-                f'submission_{submission_id}',
-                {
-                    'status': 'success',
-                    'output': result['output'],
-                    'test_results': test_results
-                },
-                timeout=300  # 5 minutes
+            process_result_task.delay(
+                submission_id=submission_id,
+                test_cases=pending_cases,
+                output=output,
+                batch_id=batch_id,
+                case_keys=keys,
+                cached_verdicts=cached,
+                match_id=match_id,
+                player_id=player_id,
+                submitted_at=submitted_at
             )
         else:
-            # Store results in cache
-            cache.set(
-                f'submission_{submission_id}',
+            store_submission_state(
+                submission_id,
                 {
                     'status': 'success',
-                    'output': result['output']
+                    'output': output
                 },
-                timeout=300  # 5 minutes
+                batch_id=batch_id,
+                submitted_at=submitted_at
             )
             
     except ResourceLimitError as e:
-        cache.set(
-            f'submission_{submission_id}',
+        SANDBOX_ERRORS.labels(type(e).__name__).inc()
+        store_submission_state(
+            submission_id,
             {
                 'status': 'error',
                 'error': str(e)
             },
-            timeout=300  # 5 minutes
+            batch_id=batch_id,
+            submitted_at=submitted_at
         )
         raise
     except SecurityError as e:
-        cache.set(
-            f'submission_{submission_id}',
+        SANDBOX_ERRORS.labels(type(e).__name__).inc()
+        store_submission_state(
+            submission_id,
             {
                 'status': 'error',
                 'error': str(e)
             },
-            timeout=300  # 5 minutes
+            batch_id=batch_id,
+            submitted_at=submitted_at
         )
         raise
     except SandboxError as e:
-        cache.set(
-            f'submission_{submission_id}',
+        SANDBOX_ERRORS.labels(type(e).__name__).inc()
+        store_submission_state(
+            submission_id,
             {
                 'status': 'error',
                 'error': str(e)
             },
-            timeout=300  # 5 minutes
+            batch_id=batch_id,
+            submitted_at=submitted_at
         )
         raise
     except Exception as e:
-        cache.set(
-            f'submission_{submission_id}',
+        store_submission_state(
+            submission_id,
             {
                 'status': 'error',
                 'error': str(e)
             },
-            timeout=300  # 5 minutes
+            batch_id=batch_id,
+            submitted_at=submitted_at
         )
         raise
     finally:
         if container:
-            sandbox.cleanup(container)
+            sandbox.cleanup(container['container_id'])
+
+@shared_task
+def process_result_task(submission_id, test_cases, output, batch_id=None,
+                        case_keys=None, cached_verdicts=None, match_id=None, player_id=None,
+                        submitted_at=None):
+    """
+    Grade execution output against test cases and store the results.
+    
+    Args:
+        submission_id: ID of the submission
+        test_cases: The test cases that were executed
+        output: Raw output of the execution
+        batch_id: Bulk batch the submission belongs to, if any
+        case_keys: Verdict cache key of every test case of the submission,
+            executed or not; empty when verdict caching is unavailable
+        cached_verdicts: Cached verdicts of the test cases that were skipped
+        match_id: PvP match the submission was made in, if any
+        player_id: Player of the match who submitted
+        submitted_at: When the submission was made (UNIX timestamp), if timed
+    """
+    with span('grade', {'tests': len(test_cases)}):
+        test_results = build_test_results(test_cases, output)
+        if case_keys:
+            test_results, new_verdicts = merge_verdicts(
+                case_keys, cached_verdicts or {}, test_results
+            )
+            store_verdicts(new_verdicts)
+    
+    store_submission_state(
+        submission_id,
+        {
+            'status': 'success',
+            'output': clip_value(output),
+            'test_results': test_results
+        },
+        batch_id=batch_id,
+        submitted_at=submitted_at
+    )
+    
+    if match_id:
+        passed = sum(1 for result in test_results if result['passed'])
+        total = len(case_keys) if case_keys else len(test_cases)
+        if record_progress(match_id, player_id, passed, total):
+            flush_match_progress_task.apply_async(
+                args=[match_id], countdown=settings.PVP_MATCH['progress_window']
+            )
+        if total and passed == total:
+            finalize_match_task.delay(match_id)
+
+@shared_task
+def flush_match_progress_task(match_id):
+    """Broadcast the test progress coalesced over the last window of a match."""
+    flush_progress(match_id)
+
+@shared_task
+def finalize_match_task(match_id):
+    """Record a match once it has a winner and update both players' ratings."""
+    match = get_snapshot(match_id)
+    if not match or not match['winner']:
+        return
+    
+    def to_datetime(timestamp):
+        return datetime.fromtimestamp(timestamp, tz=dt_timezone.utc) if timestamp else None
+    
+    player_a, player_b = match['players']
+    apply_match_result(
+        match_id,
+        int(player_a),
+        int(player_b),
+        int(match['winner']),
+        started_at=to_datetime(match['started_at']),
+        ended_at=to_datetime(match['ended_at']),
+        replay=get_log(match_id) or b''
+    )
+    for player_id in match['players']:
+        set_status(int(player_id), 'idle')
+    release_match_sandboxes_task.delay(match_id)
+
+@shared_task
+def prewarm_match_sandboxes_task(match_id, player_ids):
+    """Start the sandboxes the players of a new match will submit to."""
+    prewarm_match(match_id, player_ids)
+    # Make sure the mission's test bundle is in Redis (and this worker)
+    # before the first submission needs it
+    mission = get_match_mission(match_id)
+    if mission is not None:
+        get_test_cases(mission['id'], mission['version'])
+
+@shared_task
+def release_match_sandboxes_task(match_id):
+    """Remove the pre-warmed sandboxes of a finished match."""
+    release_match(match_id)
+
+@shared_task
+def reconcile_leaderboard_task():
+    """Rebuild the leaderboard sorted set from the rating table."""
+    count = rebuild_leaderboard()
+    logger.info(f"Rebuilt leaderboard with {count} players")
+
+@shared_task
+def reconcile_profiles_task():
+    """Recount the denormalised profile counters from the source tables."""
+    count = reconcile_profiles()
+    logger.info(f"Reconciled profiles, {count} had drifted")
+
+@shared_task
+def flush_last_active_task():
+    """Write the players' heartbeat times to their profiles."""
+    count = flush_last_active()
+    logger.info(f"Flushed last activity of {count} players")
+
+@shared_task
+def prune_presence_task():
+    """Drop players who stopped sending heartbeats from the presence sets."""
+    prune()
+
+@shared_task
+def simulate_raid_task(defender_base_id, army, seed=None):
+    """
+    Simulate a raid on a base.
+    
+    Args:
+        defender_base_id: ID of the raided base
+        army: Dict of unit type to count
+        seed: Seed to replay a raid with; a new one is drawn if None
+    
+    Returns:
+        The raid outcome (see core.combat.simulate), including its seed
+    """
+    validate_army(army)
+    if seed is None:
+        seed = secrets.randbits(32)
+    result = simulate(load_defence(defender_base_id), army, seed)
+    result['defender_base_id'] = defender_base_id
+    return result
+
+@shared_task
+def dispatch_batch_task(batch_id):
+    """
+    Send the next chunk of a bulk batch to the execution queue.
+    
+    Each tick dispatches at most ``chunk_size`` submissions as one Celery
+    group at the batch's priority, then schedules the next tick. Ticks also
+    hold back while ``max_in_flight`` submissions are still running, so a
+    large rejudge trickles through instead of flooding the workers.
+    """
+    batch = get_batch_settings(batch_id)
+    if batch is None:
+        logger.warning(f"Batch {batch_id} expired before it was fully dispatched")
+        return
+    
+    budget = min(batch['chunk_size'], settings.REJUDGE_CONFIG['max_in_flight'] - batch['in_flight'])
+    if budget <= 0:
+        dispatch_batch_task.apply_async(args=[batch_id], countdown=batch['interval'])
+        return
+    
+    items = pop_pending(batch_id, budget)
+    if not items:
+        return
+    
+    group(
+        run_code_task.si(
+            code=item['code'],
+            language=item['language'],
+            test_cases=item['test_cases'],
+            submission_id=item['submission_id'],
+            batch_id=batch_id
+        ).set(priority=batch['priority'])
+        for item in items
+    ).apply_async()
+    record_dispatched(batch_id, len(items))
+    logger.info(f"Dispatched {len(items)} submissions of batch {batch_id}")
+    
+    if len(items) == budget:
+        dispatch_batch_task.apply_async(args=[batch_id], countdown=batch['interval'])
+
+def build_test_results(test_cases: list, output: str) -> list:
+    """
+    Compare each test case with its line of output.
+    
+    Every test case gets a result; a case without an output line is
+    compared with an empty one. Failed cases carry a bounded diff and long
+    values are clipped, so the payload stays small however much output the
+    submission produced.
+    
+    Args:
+        test_cases: Test cases with ``input`` and ``expected`` values
+        output: Raw output of the execution, one line per test case
+        
+    Returns:
+        List of test result dicts
+    """
+    lines = output.split('\n')
+    test_results = []
+    for position, test_case in enumerate(test_cases):
+        actual = lines[position] if position < len(lines) else ''
+        expected = test_case['expected']
+        expected_text = expected if isinstance(expected, str) else json.dumps(expected)
+        passed = actual.strip() == expected_text.strip()
+        test_result = {
+            'input': clip_value(test_case['input']),
+            'expected': clip_value(expected),
+            'actual': clip_value(actual),
+            'passed': passed
+        }
+        if not passed:
+            test_result['diff'] = bounded_diff(expected_text, actual)
+        test_results.append(test_result)
+    return test_results
 
 def prepare_execution_command(code: str, language: str, test_cases: list = None) -> str:
     """Prepare the execution command based on language and test cases."""
@@ -0,0 +1,34 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+from django.core.cache import cache
+
+@pytest.fixture(autouse=True)
+def no_tracing(settings):
+    """Keep tests from recording and exporting traces; test_tracing turns it back on."""
+    settings.TRACING = {**settings.TRACING, 'enabled': False, 'exporter': 'none'}
+
+@pytest.fixture
+def locmem_cache(settings):
+    """Serve Django's cache from process memory instead of Redis."""
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    cache.clear()
+
+@pytest.fixture
+def memory_channel_layer(settings):
+    settings.CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+@pytest.fixture
+def patched_module():
+    """Module whose Redis client and channel layer ``mock_redis`` and ``mock_layer`` replace."""
+    raise NotImplementedError("Define a patched_module fixture in the test module")
+
+@pytest.fixture
+def mock_redis(patched_module):
+    with patch(f'{patched_module}.get_redis') as mock:
+        yield mock.return_value
+
+@pytest.fixture
+def mock_layer(patched_module):
+    with patch(f'{patched_module}.get_channel_layer') as mock:
+        mock.return_value.group_send = AsyncMock()
+        yield mock.return_value
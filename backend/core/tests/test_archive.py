@@ -0,0 +1,95 @@
+import gzip
+import json
+import tempfile
+import uuid
+from datetime import date, datetime, timezone
+from django.test import TestCase, override_settings
+from ..archive import (
+    add_months, archive_cutoff, archive_month, archive_old_submissions, load_archived_submission
+)
+from ..models import Submission, SubmissionArchive, TestResult as TestResultModel
+from ..persistence import load_submission_state
+
+class ArchiveTest(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.settings = override_settings(SUBMISSION_ARCHIVE={
+            'root': self.root,
+            'older_than_months': 2,
+            'member_rows': 3,
+            'delete_batch_size': 4,
+        })
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+
+    def create_submission(self, created_at, **kwargs):
+        submission = Submission.objects.create(
+            language='python', code='print(1)', status='success', output='1',
+            created_at=created_at, **kwargs
+        )
+        TestResultModel.objects.create(
+            submission=submission, position=0, passed=True, input='1', expected='1', actual='1'
+        )
+        return submission
+
+    def test_months(self):
+        """Test month arithmetic and the retention cutoff."""
+        self.assertEqual(add_months(date(2024, 11, 1), 3), date(2025, 2, 1))
+        self.assertEqual(add_months(date(2024, 1, 1), -1), date(2023, 12, 1))
+        now = datetime(2024, 3, 15, tzinfo=timezone.utc)
+        self.assertEqual(archive_cutoff(2, now=now), date(2024, 2, 1))
+        self.assertEqual(archive_cutoff(1, now=now), date(2024, 3, 1))
+
+    def test_archive_month(self):
+        """Test that a month is exported to gzip members with an index and deleted."""
+        old = [self.create_submission(datetime(2023, 5, day, tzinfo=timezone.utc)) for day in range(1, 8)]
+        kept = self.create_submission(datetime(2023, 6, 1, tzinfo=timezone.utc))
+
+        archive = archive_month(date(2023, 5, 1))
+
+        self.assertEqual(archive.row_count, 7)
+        self.assertEqual(list(Submission.objects.all()), [kept])
+        self.assertEqual(TestResultModel.objects.count(), 1)
+        with gzip.open(archive.path, 'rt') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([r['id'] for r in records], [str(s.id) for s in old])
+
+        record = load_archived_submission(str(old[4].id))
+        self.assertEqual(record['code'], 'print(1)')
+        self.assertEqual(record['test_results'][0]['actual'], '1')
+        self.assertIsNone(load_archived_submission(str(uuid.uuid4())))
+        self.assertIsNone(load_archived_submission('not-a-uuid'))
+
+    def test_load_submission_state_falls_back_to_archive(self):
+        """Test that the status read path finds archived submissions."""
+        submission = self.create_submission(datetime(2023, 5, 1, tzinfo=timezone.utc))
+        archive_month(date(2023, 5, 1))
+
+        state = load_submission_state(str(submission.id))
+
+        self.assertEqual(state['status'], 'success')
+        self.assertEqual(state['output'], '1')
+        self.assertEqual(len(state['test_results']), 1)
+
+    def test_archive_old_submissions(self):
+        """Test that only months outside the retention window are archived."""
+        now = datetime.now(timezone.utc)
+        recent = self.create_submission(now)
+        self.create_submission(datetime(2020, 1, 10, tzinfo=timezone.utc))
+        self.create_submission(datetime(2020, 3, 10, tzinfo=timezone.utc))
+
+        archives = archive_old_submissions()
+
+        self.assertEqual(sorted(a.month for a in archives), [date(2020, 1, 1), date(2020, 3, 1)])
+        self.assertEqual(list(Submission.objects.all()), [recent])
+
+    def test_interrupted_purge_is_resumed(self):
+        """Test that an existing archive is purged again rather than rewritten."""
+        submission = self.create_submission(datetime(2020, 1, 10, tzinfo=timezone.utc))
+        archive = archive_month(date(2020, 1, 1))
+        Submission.objects.create(id=submission.id, created_at=submission.created_at)
+
+        archive_old_submissions()
+
+        self.assertFalse(Submission.objects.exists())
+        self.assertEqual(SubmissionArchive.objects.get().pk, archive.pk)
@@ -0,0 +1,83 @@
+import uuid
+import pytest
+from unittest.mock import Mock, patch
+from django.conf import settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+from ..views import BatchSubmissionStatusView
+
+class TestBatchSubmissionStatusView:
+    @pytest.fixture
+    def factory(self):
+        return APIRequestFactory()
+
+    @pytest.fixture
+    def mock_cache(self):
+        with patch('core.views.cache') as mock:
+            yield mock
+
+    def call(self, request):
+        force_authenticate(request, user=Mock(is_authenticated=True))
+        return BatchSubmissionStatusView.as_view()(request)
+
+    def test_single_round_trip(self, factory, mock_cache):
+        """Test that all ids are resolved with one get_many call."""
+        done, pending, unknown = (str(uuid.uuid4()) for _ in range(3))
+        mock_cache.get_many.return_value = {
+            f'submission_{done}': {'status': 'success', 'output': 'ok'},
+            f'submission_{pending}': {'status': 'pending'},
+        }
+
+        response = self.call(factory.post(
+            '/status/batch/', {'submission_ids': [done, pending, unknown, done]}, format='json'
+        ))
+
+        assert response.status_code == 200
+        assert response.data['statuses'] == {done: 'success', pending: 'pending', unknown: None}
+        mock_cache.get_many.assert_called_once_with(
+            [f'submission_{done}', f'submission_{pending}', f'submission_{unknown}']
+        )
+        mock_cache.get.assert_not_called()
+
+    def test_get_with_query_ids(self, factory, mock_cache):
+        """Test the comma-separated GET form."""
+        ids = [str(uuid.uuid4()), str(uuid.uuid4())]
+        mock_cache.get_many.return_value = {}
+
+        response = self.call(factory.get('/status/batch/', {'ids': ','.join(ids)}))
+
+        assert response.status_code == 200
+        assert list(response.data['statuses']) == ids
+
+    def test_etag_not_modified(self, factory, mock_cache):
+        """Test that unchanged state is answered with an empty 304."""
+        submission_id = str(uuid.uuid4())
+        mock_cache.get_many.return_value = {f'submission_{submission_id}': {'status': 'pending'}}
+
+        first = self.call(factory.get('/status/batch/', {'ids': submission_id}))
+        second = self.call(factory.get(
+            '/status/batch/', {'ids': submission_id}, HTTP_IF_NONE_MATCH=first['ETag']
+        ))
+
+        assert second.status_code == 304
+        assert second.data is None
+        assert second['ETag'] == first['ETag']
+
+        # A state change produces a new ETag and a full body
+        mock_cache.get_many.return_value = {f'submission_{submission_id}': {'status': 'success'}}
+        third = self.call(factory.get(
+            '/status/batch/', {'ids': submission_id}, HTTP_IF_NONE_MATCH=first['ETag']
+        ))
+        assert third.status_code == 200
+        assert third['ETag'] != first['ETag']
+
+    def test_validation(self, factory, mock_cache):
+        """Test that empty, malformed and oversized batches are rejected."""
+        too_many = [str(uuid.uuid4()) for _ in range(settings.STATUS_BATCH_MAX_IDS + 1)]
+
+        for ids in ([], ['not-a-uuid'], too_many):
+            response = self.call(factory.post(
+                '/status/batch/', {'submission_ids': ids}, format='json'
+            ))
+            assert response.status_code == 400
+
+        mock_cache.get_many.assert_not_called()
@@ -0,0 +1,145 @@
+import json
+import pytest
+from unittest.mock import patch
+from ..bulk import (
+    ENQUEUE_CHUNK, batch_pending_key, batch_progress_key, create_batch, get_batch_progress
+)
+from ..tasks import dispatch_batch_task
+
+REJUDGE_CONFIG = {
+    'priority': 9,
+    'chunk_size': 2,
+    'interval': 1.0,
+    'max_in_flight': 3,
+    'max_batch_size': 20000,
+    'progress_ttl': 60,
+}
+
+@pytest.fixture
+def mock_redis():
+    with patch('core.bulk.get_redis') as mock:
+        yield mock.return_value
+
+@pytest.fixture
+def mock_cache():
+    with patch('core.bulk.cache') as mock:
+        yield mock
+
+@pytest.fixture
+def rejudge_config(settings):
+    settings.REJUDGE_CONFIG = REJUDGE_CONFIG
+
+@pytest.mark.usefixtures('rejudge_config')
+class TestCreateBatch:
+    def test_pipelined_enqueue(self, mock_redis, mock_cache):
+        """Test that a batch is queued in one pipeline of chunked LPUSHes."""
+        submissions = [
+            {'code': f'print({i})', 'language': 'python'} for i in range(ENQUEUE_CHUNK + 1)
+        ]
+        pipe = mock_redis.pipeline.return_value
+
+        batch = create_batch(submissions)
+
+        assert len(batch['submission_ids']) == ENQUEUE_CHUNK + 1
+        assert pipe.lpush.call_count == 2
+        pipe.execute.assert_called_once()
+        progress = pipe.hset.call_args[1]['mapping']
+        assert progress['total'] == ENQUEUE_CHUNK + 1
+        assert progress['priority'] == 9
+        key, *items = pipe.lpush.call_args_list[0][0]
+        assert key == batch_pending_key(batch['batch_id'])
+        assert json.loads(items[0])['submission_id'] == batch['submission_ids'][0]
+
+        # Every submission is visible as pending through the status endpoints
+        pending = mock_cache.set_many.call_args[0][0]
+        assert len(pending) == ENQUEUE_CHUNK + 1
+        assert all(state == {'status': 'pending'} for state in pending.values())
+
+    def test_rejudge_in_place(self, mock_redis, mock_cache):
+        """Test that existing submission ids are kept."""
+        batch = create_batch(
+            [{'submission_id': 'abc', 'code': 'x', 'language': 'python'}], priority=5
+        )
+
+        assert batch['submission_ids'] == ['abc']
+        assert mock_redis.pipeline.return_value.hset.call_args[1]['mapping']['priority'] == 5
+
+class TestBatchProgress:
+    def test_progress(self, mock_redis):
+        """Test that progress is read from the aggregate counters."""
+        mock_redis.hgetall.return_value = {
+            b'total': b'10', b'dispatched': b'6', b'completed': b'4', b'failed': b'1'
+        }
+
+        progress = get_batch_progress('b1')
+
+        mock_redis.hgetall.assert_called_once_with(batch_progress_key('b1'))
+        assert progress == {
+            'batch_id': 'b1', 'total': 10, 'dispatched': 6, 'completed': 4,
+            'failed': 1, 'pending': 4, 'done': False
+        }
+
+    def test_unknown_batch(self, mock_redis):
+        """Test that expired batches report None."""
+        mock_redis.hgetall.return_value = {}
+
+        assert get_batch_progress('missing') is None
+
+@pytest.mark.usefixtures('rejudge_config')
+class TestDispatchBatchTask:
+    @pytest.fixture
+    def mocks(self):
+        with patch('core.tasks.get_batch_settings') as settings_mock, \
+                patch('core.tasks.pop_pending') as pop_mock, \
+                patch('core.tasks.record_dispatched') as record_mock, \
+                patch('core.tasks.group') as group_mock, \
+                patch.object(dispatch_batch_task, 'apply_async') as reschedule_mock:
+            yield settings_mock, pop_mock, record_mock, group_mock, reschedule_mock
+
+    def item(self, i):
+        return {'submission_id': str(i), 'code': 'x', 'language': 'python', 'test_cases': []}
+
+    def test_dispatch_chunk_as_group(self, mocks):
+        """Test that a full chunk is sent as one group and the next tick is scheduled."""
+        settings_mock, pop_mock, record_mock, group_mock, reschedule_mock = mocks
+        settings_mock.return_value = {
+            'priority': 9, 'chunk_size': 2, 'interval': 1.0, 'in_flight': 0
+        }
+        pop_mock.return_value = [self.item(1), self.item(2)]
+
+        dispatch_batch_task('b1')
+
+        pop_mock.assert_called_once_with('b1', 2)
+        signatures = list(group_mock.call_args[0][0])
+        assert len(signatures) == 2
+        assert signatures[0].options['priority'] == 9
+        assert signatures[0].kwargs['batch_id'] == 'b1'
+        group_mock.return_value.apply_async.assert_called_once()
+        record_mock.assert_called_once_with('b1', 2)
+        reschedule_mock.assert_called_once_with(args=['b1'], countdown=1.0)
+
+    def test_last_chunk_stops(self, mocks):
+        """Test that a partial chunk ends the dispatch loop."""
+        settings_mock, pop_mock, record_mock, group_mock, reschedule_mock = mocks
+        settings_mock.return_value = {
+            'priority': 9, 'chunk_size': 2, 'interval': 1.0, 'in_flight': 0
+        }
+        pop_mock.return_value = [self.item(1)]
+
+        dispatch_batch_task('b1')
+
+        record_mock.assert_called_once_with('b1', 1)
+        reschedule_mock.assert_not_called()
+
+    def test_throttle_in_flight(self, mocks):
+        """Test that dispatch waits while too many submissions are running."""
+        settings_mock, pop_mock, record_mock, group_mock, reschedule_mock = mocks
+        settings_mock.return_value = {
+            'priority': 9, 'chunk_size': 2, 'interval': 1.0, 'in_flight': 3
+        }
+
+        dispatch_batch_task('b1')
+
+        pop_mock.assert_not_called()
+        group_mock.assert_not_called()
+        reschedule_mock.assert_called_once_with(args=['b1'], countdown=1.0)
@@ -0,0 +1,83 @@
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from ..combat import Defence, InvalidArmy, simulate, validate_army
+from ..economy import create_base
+from ..models import Building
+from ..tasks import simulate_raid_task
+
+COMBAT = {'max_ticks': 600, 'max_units': 50, 'damage_spread': 0.1}
+
+def defence(*buildings):
+    rows = [
+        {'id': i, 'type': building_type, 'level': 1, 'x': x, 'y': y, 'health': health}
+        for i, (building_type, x, y, health) in enumerate(buildings)
+    ]
+    return Defence.from_buildings(rows, 10, 10)
+
+@override_settings(COMBAT=COMBAT)
+class SimulateTest(TestCase):
+    def setUp(self):
+        self.defence = defence(
+            ('command_center', 4, 4, 1000), ('defense_turret', 3, 3, 800),
+            ('defense_turret', 6, 6, 800), ('resource_collector', 1, 8, 500),
+        )
+
+    def test_seed_replays(self):
+        """Test that a raid is reproduced exactly from its seed and varies across seeds."""
+        army = {'soldier': 10, 'archer': 5}
+
+        first = simulate(self.defence, army, seed=7)
+
+        self.assertEqual(simulate(self.defence, army, seed=7), first)
+        self.assertEqual(first['seed'], 7)
+        outcomes = {simulate(self.defence, army, seed=s)['ticks'] for s in range(5)}
+        self.assertGreater(len(outcomes), 1)
+
+    def test_strong_army_wins(self):
+        """Test that a large army razes the base and a tiny one is wiped out."""
+        strong = simulate(self.defence, {'giant': 10, 'soldier': 20}, seed=3)
+        self.assertEqual(strong['winner'], 'attacker')
+        self.assertEqual(strong['destruction'], 1.0)
+        self.assertEqual(len(strong['destroyed_buildings']), 4)
+
+        weak = simulate(self.defence, {'soldier': 2}, seed=3)
+        self.assertEqual(weak['winner'], 'defender')
+        self.assertEqual(weak['units_lost'], {'soldier': 2})
+        self.assertLess(weak['destruction'], 0.1)
+
+    def test_turrets_under_construction_hold_fire(self):
+        """Test that only finished turrets shoot."""
+        rows = [{'id': 0, 'type': 'defense_turret', 'level': 1, 'x': 0, 'y': 0,
+                 'health': 800, 'active': False}]
+        result = simulate(Defence.from_buildings(rows, 10, 10), {'soldier': 1}, seed=1)
+
+        self.assertEqual(result['winner'], 'attacker')
+        self.assertEqual(result['units_lost'], {})
+
+    def test_validate_army(self):
+        """Test that unknown units and oversized armies are refused."""
+        validate_army({'soldier': 50})
+        with self.assertRaises(InvalidArmy):
+            validate_army({'dragon': 1})
+        with self.assertRaises(InvalidArmy):
+            validate_army({'soldier': 51})
+
+@override_settings(COMBAT=COMBAT)
+class SimulateRaidTaskTest(TestCase):
+    def test_task_loads_base(self):
+        """Test that the task simulates against the stored base and reports the seed."""
+        user = get_user_model().objects.create_user('alice', password='secret')
+        base = create_base(user, 'Alpha', 10, 10, {})
+        Building.objects.create(
+            base=base, type='command_center', x=4, y=4, health=1000, max_health=1000,
+            active_from=timezone.now()
+        )
+
+        with patch('core.tasks.secrets.randbits', return_value=42):
+            result = simulate_raid_task(base.id, {'soldier': 5})
+
+        self.assertEqual(result['seed'], 42)
+        self.assertEqual(result['defender_base_id'], base.id)
+        self.assertEqual(result, {**simulate_raid_task(base.id, {'soldier': 5}, seed=42)})
@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from django.test import RequestFactory, override_settings
+from ..db_router import (
+    PrimaryReplicaRouter, pin_if_recent_write, record_write, replica_routing_middleware, use_primary
+)
+
+ROUTING = {'replicas': ['replica'], 'sticky_seconds': 10}
+
+@pytest.fixture
+def routing(settings):
+    settings.DATABASE_ROUTING = ROUTING
+
+@pytest.mark.usefixtures('routing')
+class TestPrimaryReplicaRouter:
+    @pytest.fixture
+    def router(self):
+        return PrimaryReplicaRouter()
+
+    @pytest.fixture
+    def mock_cache(self):
+        with patch('core.db_router.cache') as mock:
+            yield mock
+
+    def test_reads_go_to_replica(self, router):
+        """Test that reads use a replica and writes the primary."""
+        assert router.db_for_read(None) == 'replica'
+        assert router.db_for_write(None) == 'default'
+        assert router.allow_migrate('default', 'core')
+        assert not router.allow_migrate('replica', 'core')
+
+    def test_without_replicas(self, router):
+        """Test that everything uses the primary when no replica is configured."""
+        with override_settings(DATABASE_ROUTING={'replicas': [], 'sticky_seconds': 10}):
+            assert router.db_for_read(None) == 'default'
+
+    def test_use_primary(self, router):
+        """Test that reads inside use_primary go to the primary."""
+        with use_primary():
+            assert router.db_for_read(None) == 'default'
+        assert router.db_for_read(None) == 'replica'
+
+    def test_middleware_pins_unsafe_requests(self, router):
+        """Test that non-safe requests read from the primary, and the pin ends with them."""
+        seen = []
+        middleware = replica_routing_middleware(lambda request: seen.append(router.db_for_read(None)))
+        factory = RequestFactory()
+
+        middleware(factory.post('/'))
+        middleware(factory.get('/'))
+
+        assert seen == ['default', 'replica']
+        assert router.db_for_read(None) == 'replica'
+
+    def test_async_middleware(self, router):
+        """Test that the middleware supports async views."""
+        async def view(request):
+            return router.db_for_read(None)
+
+        middleware = replica_routing_middleware(view)
+
+        assert asyncio.run(middleware(RequestFactory().post('/'))) == 'default'
+
+    def test_read_your_writes(self, router, mock_cache):
+        """Test that a user's reads stick to the primary after their own write."""
+        record_write(7)
+        mock_cache.set.assert_called_once_with('db_recent_write_7', True, timeout=10)
+
+        def view(request):
+            mock_cache.get.return_value = request.recent_write
+            pin_if_recent_write(7)
+            return router.db_for_read(None)
+
+        middleware = replica_routing_middleware(view)
+        factory = RequestFactory()
+        recent, stale = factory.get('/'), factory.get('/')
+        recent.recent_write, stale.recent_write = True, None
+
+        assert middleware(recent) == 'default'
+        assert middleware(stale) == 'replica'
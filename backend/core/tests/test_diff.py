@@ -0,0 +1,103 @@
+import pytest
+from ..diff import bounded_diff, clip_text, clip_value, _edit_script
+from ..tasks import build_test_results
+
+class TestEditScript:
+    def apply(self, a, b, ops):
+        """Rebuild both sides from an edit script."""
+        source, target = [], []
+        for op in ops:
+            if op[0] == '=':
+                source.extend(a[op[1]:op[1] + op[3]])
+                target.extend(b[op[2]:op[2] + op[3]])
+            elif op[0] == '-':
+                source.append(a[op[1]])
+            else:
+                target.append(b[op[1]])
+        return source, target
+
+    @pytest.mark.parametrize('a, b, edits', [
+        ([], [], 0),
+        (['a'], ['a'], 0),
+        (['a', 'b', 'c'], ['a', 'x', 'c'], 2),
+        (['a', 'b', 'c', 'a', 'b', 'b', 'a'], ['c', 'b', 'a', 'b', 'a', 'c'], 5),
+        ([], ['a', 'b'], 2),
+    ])
+    def test_shortest_script(self, a, b, edits):
+        """Test that the edit script is minimal and reproduces both sides."""
+        ops = _edit_script(a, b, 16)
+        assert self.apply(a, b, ops) == (a, b)
+        assert sum(1 for op in ops if op[0] != '=') == edits
+
+    def test_edit_distance_cap(self):
+        """Test that the search gives up beyond the edit distance cap."""
+        assert _edit_script(list('abcdef'), list('uvwxyz'), 4) is None
+
+class TestBoundedDiff:
+    def test_identical(self):
+        """Test that identical outputs produce no hunks."""
+        assert bounded_diff('a\nb', 'a\nb') == {'hunks': [], 'truncated': False}
+
+    def test_single_change_with_context(self):
+        """Test a single changed line with surrounding context."""
+        diff = bounded_diff('1\n2\n3\n4\n5\n6\n7', '1\n2\n3\nX\n5\n6\n7', {'context_lines': 1})
+        assert diff['truncated'] is False
+        assert diff['hunks'] == [{
+            'expected_start': 3,
+            'actual_start': 3,
+            'lines': [[' ', '3'], ['-', '4'], ['+', 'X'], [' ', '5']]
+        }]
+
+    def test_max_hunks(self):
+        """Test that only the first few mismatches are reported."""
+        expected = '\n'.join(str(i) for i in range(100))
+        actual = '\n'.join(str(i) if i % 10 else 'x' for i in range(100))
+        diff = bounded_diff(expected, actual, {'max_hunks': 2, 'context_lines': 1})
+        assert len(diff['hunks']) == 2
+        assert diff['truncated'] is True
+        assert diff['hunks'][1]['expected_start'] == 10
+
+    def test_long_line_window(self):
+        """Test that long lines are clipped around the first difference."""
+        diff = bounded_diff('a' * 10000 + 'X', 'a' * 10000 + 'Y', {'max_line_length': 20})
+        removed, added = diff['hunks'][0]['lines']
+        assert removed[0] == '-' and removed[1].endswith('X')
+        assert added[0] == '+' and added[1].endswith('Y')
+        assert len(added[1]) <= 21
+
+    def test_large_unrelated_outputs(self):
+        """Test that very different outputs stay bounded."""
+        expected = '\n'.join(str(i) for i in range(50000))
+        actual = '\n'.join(str(-i) for i in range(1, 50001))
+        diff = bounded_diff(expected, actual, {'max_edit_distance': 8, 'max_hunk_lines': 10})
+        assert diff['truncated'] is True
+        assert sum(len(hunk['lines']) for hunk in diff['hunks']) <= 10
+
+class TestClipping:
+    def test_clip_text(self):
+        """Test text clipping around a position."""
+        assert clip_text('short', 10) == 'short'
+        assert clip_text('abcdefghij', 4, center=5) == '…defg…'
+        assert clip_text('abcdefghij', 4) == 'abcd…'
+
+    def test_clip_value_non_string(self):
+        """Test that non-string values are left untouched."""
+        assert clip_value({'a': 1}, 1) == {'a': 1}
+
+class TestBuildTestResults:
+    def test_passed_and_failed(self):
+        """Test that only failed cases carry a diff."""
+        test_cases = [
+            {'input': '2', 'expected': '4'},
+            {'input': '3', 'expected': '6'}
+        ]
+        results = build_test_results(test_cases, '4\n7')
+        assert results[0]['passed'] is True
+        assert 'diff' not in results[0]
+        assert results[1]['passed'] is False
+        assert results[1]['diff']['hunks'][0]['lines'] == [['-', '6'], ['+', '7']]
+
+    def test_large_actual_is_clipped(self):
+        """Test that huge outputs are clipped in the payload."""
+        results = build_test_results([{'input': '1', 'expected': '1'}], 'x' * 100000)
+        assert len(results[0]['actual']) < 2000
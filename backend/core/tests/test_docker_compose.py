@@ -49,7 +49,8 @@ class DockerComposeTest:
         workers = {
             'celery_worker_code': 'code_execution',
             'celery_worker_test': 'test_execution',
-            'celery_worker_result': 'result_processing'
+            'celery_worker_result': 'result_processing',
+            'celery_worker_simulation': 'simulation'
         }
         
         for worker_name, queue in workers.items():
@@ -0,0 +1,101 @@
+import pytest
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+from ..buildings import production
+from ..economy import (
+    InsufficientResources, batch_amounts, checkpoint, create_base, current_resources, richest_bases
+)
+from ..models import Building, ResourceBalance
+from ..views import CollectResourcesView
+
+STARTING = {'credits': 100, 'minerals': 50}
+
+@pytest.mark.usefixtures('locmem_cache')
+class EconomyTest(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.now = timezone.now()
+        self.user = User.objects.create_user('alice', password='secret')
+        self.base = create_base(self.user, 'Alpha', 10, 10, STARTING)
+        ResourceBalance.objects.filter(base=self.base).update(checkpoint_at=self.now)
+
+    def build(self, base, building_type='resource_collector', level=1, active_from=None, x=0):
+        return Building.objects.create(
+            base=base, type=building_type, level=level, x=x, y=0, health=500, max_health=500,
+            active_from=active_from or self.now
+        )
+
+    def amounts(self, base, at):
+        return {r['type']: r['amount'] for r in current_resources(base, at)}
+
+    def test_production_scales_with_level(self):
+        """Test that each level multiplies production by the upgrade multiplier."""
+        self.assertEqual(production('resource_collector', 1), ('credits', 10))
+        self.assertAlmostEqual(production('resource_collector', 3)[1], 10 * 1.3 ** 2)
+        self.assertIsNone(production('defense_turret', 2))
+
+    def test_amount_is_closed_form(self):
+        """Test that amounts grow linearly from the checkpoint without any writes."""
+        self.build(self.base)
+        self.build(self.base, level=2, x=1)
+
+        amounts = self.amounts(self.base, self.now + timedelta(minutes=6))
+
+        self.assertAlmostEqual(amounts['credits'], 100 + 6 * (10 + 13))
+        self.assertEqual(amounts['minerals'], 50)
+        self.assertTrue(ResourceBalance.objects.filter(amount=100).exists())
+
+    def test_construction_delays_production(self):
+        """Test that a building under construction produces from when it completes."""
+        self.build(self.base, active_from=self.now + timedelta(minutes=3))
+
+        self.assertEqual(self.amounts(self.base, self.now + timedelta(minutes=2))['credits'], 100)
+        self.assertAlmostEqual(self.amounts(self.base, self.now + timedelta(minutes=5))['credits'], 120)
+
+    def test_checkpoint_spends(self):
+        """Test that a checkpoint folds in production and spends, or writes nothing."""
+        self.build(self.base)
+        later = self.now + timedelta(minutes=10)
+
+        with self.assertRaises(InsufficientResources):
+            checkpoint(self.base, {'credits': 500}, now=later)
+        self.assertEqual(ResourceBalance.objects.get(resource='credits').amount, 100)
+
+        checkpoint(self.base, {'credits': 150}, now=later)
+        credits = ResourceBalance.objects.get(resource='credits')
+        self.assertAlmostEqual(credits.amount, 50)
+        self.assertEqual(credits.checkpoint_at, later)
+        self.assertAlmostEqual(self.amounts(self.base, later + timedelta(minutes=1))['credits'], 60)
+
+    def test_batch_matches_single(self):
+        """Test that the NumPy batch path agrees with the per-base computation."""
+        other = create_base(
+            get_user_model().objects.create_user('bob', password='secret'), 'Beta', 10, 10, STARTING
+        )
+        ResourceBalance.objects.filter(base=other).update(checkpoint_at=self.now)
+        self.build(self.base, level=4)
+        self.build(other, active_from=self.now + timedelta(minutes=1))
+        self.build(other, 'defense_turret', x=1)
+        at = self.now + timedelta(minutes=7)
+
+        batch = batch_amounts('credits', now=at)
+
+        for base in (self.base, other):
+            self.assertAlmostEqual(batch[base.id], self.amounts(base, at)['credits'])
+        self.assertEqual([b['base_id'] for b in richest_bases('credits', 1, now=at)], [self.base.id])
+
+    def test_collect_view(self):
+        """Test that collecting returns the current resources."""
+        request = APIRequestFactory().post('/api/base/collect/')
+        force_authenticate(request, user=self.user)
+
+        response = CollectResourcesView.as_view()(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {r['type'] for r in response.data},
+            {'credits', 'minerals', 'energy', 'research_points'}
+        )
@@ -0,0 +1,110 @@
+import json
+import os
+import pytest
+from unittest.mock import patch
+from ..fake_docker import DEFAULT_PROFILE, FakeDockerClient, _clients, load_profile
+from ..sandbox import SandboxError, SandboxManager
+from ..tasks import run_code_task
+
+def profile(**failures):
+    return {
+        **DEFAULT_PROFILE,
+        'output_bytes': [130],
+        'failures': {'create_error': 0.0, 'timeout': 0.0, 'oom': 0.0, **failures},
+    }
+
+@pytest.fixture
+def fake_backend(settings, tmp_path):
+    """Point the sandbox at a fake daemon with the profile the test writes."""
+    path = tmp_path / 'profile.json'
+
+    def use(**failures):
+        path.write_text(json.dumps(profile(**failures)))
+        _clients.clear()
+        settings.SANDBOX_CONFIG = {
+            **settings.SANDBOX_CONFIG,
+            'backend': 'fake',
+            'fake_profile': str(path),
+            'fake_time_scale': 0.0,
+            'fake_seed': 7,
+        }
+    yield use
+    _clients.clear()
+
+class TestFakeDocker:
+    def test_selected_by_config(self, fake_backend):
+        """Test that the fake backend replaces the Docker client without touching the daemon."""
+        fake_backend()
+        with patch('docker.from_env') as from_env:
+            sandbox = SandboxManager()
+
+        from_env.assert_not_called()
+        assert isinstance(sandbox.client, FakeDockerClient)
+        assert SandboxManager().client is sandbox.client
+        assert sandbox.daemon_id() == f'FAKE:{os.getpid()}'
+        assert sandbox.image_digest('kodewar-sandbox-python').startswith('sha256:')
+        with pytest.raises(SandboxError):
+            sandbox.image_digest('unknown')
+
+    def test_container_lifecycle(self, fake_backend):
+        """Test that a container runs to completion, yields output and is removed."""
+        fake_backend()
+        sandbox = SandboxManager()
+
+        container = sandbox.create_container(image='kodewar-sandbox-python', command='true')
+        result = sandbox.run_container(container['container_id'])
+
+        assert result['exit_code'] == 0
+        assert len(result['logs']) == 130
+        assert sandbox.client._containers == {}
+
+    def test_failure_modes(self, fake_backend):
+        """Test that simulated failures surface as Docker's would."""
+        fake_backend(create_error=1.0)
+        with pytest.raises(SandboxError, match='Container creation failed'):
+            SandboxManager().create_container(image='kodewar-sandbox-python', command='true')
+
+        fake_backend(oom=1.0)
+        sandbox = SandboxManager()
+        container = sandbox.create_container(image='kodewar-sandbox-python', command='true')
+        assert sandbox.run_container(container['container_id'])['exit_code'] == 137
+
+        fake_backend(timeout=1.0)
+        sandbox = SandboxManager()
+        container = sandbox.create_container(image='kodewar-sandbox-python', command='true')
+        with pytest.raises(SandboxError, match='Read timed out'):
+            sandbox.run_container(container['container_id'], timeout=1)
+        warm = sandbox.start_warm_container('kodewar-sandbox-python', cpuset='0', idle_timeout=60)
+        assert sandbox.exec_in_container(warm, 'true', timeout=1)['error'] == 'Execution timed out'
+
+    def test_cleanup_of_removed_container(self, fake_backend):
+        """Test that cleaning up a container that is already gone only warns."""
+        fake_backend()
+        sandbox = SandboxManager()
+        container = sandbox.create_container(image='kodewar-sandbox-python', command='true')
+        sandbox.run_container(container['container_id'])
+
+        sandbox.cleanup(container['container_id'])
+
+    def test_run_code_task(self, fake_backend):
+        """Test that the execution task runs end to end on the fake backend."""
+        fake_backend()
+        with patch('core.tasks.store_submission_state') as store:
+            run_code_task('print(1)', 'python', submission_id='s1')
+
+        state = store.call_args[0][1]
+        assert state['status'] == 'success'
+        assert len(state['output']) == 130
+
+    def test_profile_validation(self, tmp_path):
+        """Test that recorded profiles fill gaps from the default and reject unknown modes."""
+        path = tmp_path / 'profile.json'
+        path.write_text(json.dumps({'wait': [0.5], 'failures': {'oom': 0.5}}))
+        loaded = load_profile(str(path))
+        assert loaded['wait'] == [0.5]
+        assert loaded['create'] == DEFAULT_PROFILE['create']
+        assert loaded['failures']['oom'] == 0.5
+
+        path.write_text(json.dumps({'failures': {'segfault': 0.1}}))
+        with pytest.raises(ValueError):
+            load_profile(str(path))
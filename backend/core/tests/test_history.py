@@ -0,0 +1,86 @@
+import base64
+import uuid
+from unittest.mock import patch
+from datetime import datetime, timedelta, timezone
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+from ..history import InvalidCursor, decode_cursor, encode_cursor, get_history_page
+from ..models import Submission
+from ..views import SubmissionCodeView, SubmissionHistoryView
+
+@override_settings(SUBMISSION_HISTORY={'page_size': 3, 'max_page_size': 5})
+class SubmissionHistoryTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('alice', password='secret')
+        self.other = get_user_model().objects.create_user('bob', password='secret')
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        # Pairs of submissions share a timestamp to exercise the id tie-break
+        self.submissions = [
+            Submission.objects.create(
+                user=self.user, language='python', code=f'print({i})',
+                created_at=start + timedelta(minutes=i // 2)
+            )
+            for i in range(8)
+        ]
+        Submission.objects.create(user=self.other, language='python', code='x', created_at=start)
+        self.expected = sorted(self.submissions, key=lambda s: (s.created_at, s.id), reverse=True)
+        self.factory = APIRequestFactory()
+        patcher = patch('core.db_router.cache')
+        patcher.start().get.return_value = None
+        self.addCleanup(patcher.stop)
+
+    def test_cursor_round_trip(self):
+        """Test that cursors decode to what was encoded and reject garbage."""
+        created_at, submission_id = datetime(2024, 1, 1, tzinfo=timezone.utc), uuid.uuid4()
+        self.assertEqual(decode_cursor(encode_cursor(created_at, submission_id)), (created_at, submission_id))
+        with self.assertRaises(InvalidCursor):
+            decode_cursor('not a cursor')
+        with self.assertRaises(InvalidCursor):
+            decode_cursor(base64.urlsafe_b64encode(b'["2024-01-01T00:00:00+00:00",5]').decode())
+
+    def test_pages_cover_history_once(self):
+        """Test that walking the cursors returns every submission once, newest first."""
+        seen, cursor = [], None
+        while True:
+            page = get_history_page(self.user.id, cursor=cursor)
+            self.assertLessEqual(len(page['results']), 3)
+            seen.extend(row['id'] for row in page['results'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(seen, [s.id for s in self.expected])
+
+    def test_rows_omit_code(self):
+        """Test that history rows never carry the code and the limit is capped."""
+        page = get_history_page(self.user.id, limit=50)
+        self.assertEqual(len(page['results']), 5)
+        self.assertNotIn('code', page['results'][0])
+
+    def test_history_view(self):
+        """Test the history endpoint and its cursor validation."""
+        request = self.factory.get('/api/submissions/', {'limit': 2})
+        force_authenticate(request, user=self.user)
+        response = SubmissionHistoryView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next_cursor'])
+
+        for params in ({'cursor': '!!'}, {'limit': -1}, {'limit': -5}, {'limit': 0}):
+            request = self.factory.get('/api/submissions/', params)
+            force_authenticate(request, user=self.user)
+            self.assertEqual(SubmissionHistoryView.as_view()(request).status_code, 400)
+
+    def test_code_view(self):
+        """Test that code is served to its owner only."""
+        submission = self.submissions[3]
+        request = self.factory.get('/')
+        force_authenticate(request, user=self.user)
+        response = SubmissionCodeView.as_view()(request, submission_id=submission.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['code'], 'print(3)')
+
+        request = self.factory.get('/')
+        force_authenticate(request, user=self.other)
+        response = SubmissionCodeView.as_view()(request, submission_id=submission.id)
+        self.assertEqual(response.status_code, 404)
@@ -7,7 +7,7 @@ from django.test import TestCase
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
-from ..models import CodeSubmission
+from ..models import Submission
 from ..tasks import run_code_task
 from ..sandbox import SandboxManager
 
@@ -0,0 +1,244 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import Mock, patch
+from channels.testing import WebsocketCommunicator
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+from ..consumers import CLOSE_NOT_A_PLAYER, MatchConsumer
+from ..match_state import (
+    flush_progress, get_snapshot, match_group, progress_flush_key, record_progress,
+    record_submission, set_ready
+)
+from ..matchmaking import match_key
+from .. import replay
+from ..tasks import process_result_task
+from ..views import CodeSubmissionView
+
+MATCH_ID = 'c6a2b1f4-1e7a-4a65-9d3b-2f0e9c3d4a51'
+
+@pytest.fixture
+def patched_module():
+    return 'core.match_state'
+
+@pytest.fixture
+def mock_redis(mock_redis):
+    """The shared Redis mock, serving the fields of a match in progress."""
+    mock_redis.fields = {
+        'players': json.dumps(['1', '2']), 'status': 'in_progress',
+        'mission_id': 'm1', 'mission_version': '3',
+    }
+    mock_redis.hget.side_effect = lambda key, name: mock_redis.fields.get(name)
+    mock_redis.hmget.side_effect = lambda key, names: [mock_redis.fields.get(n) for n in names]
+    mock_redis.hincrby.return_value = 7
+    return mock_redis
+
+def sent_deltas(layer):
+    return [c[0][1]['delta'] for c in layer.group_send.call_args_list]
+
+class TestMatchState:
+    @pytest.fixture(autouse=True)
+    def mock_replay(self):
+        with patch('core.match_state.replay.append') as append:
+            yield append
+
+    def test_snapshot(self, mock_redis):
+        """Test that the hash fields are decoded into the snapshot."""
+        mock_redis.hgetall.return_value = {
+            b'status': b'in_progress', b'players': b'["1", "2"]', b'seq': b'4',
+            b'ready:1': b'1', b'ready:2': b'1', b'progress:1': b'3/5', b'started_at': b'10.0',
+        }
+
+        snapshot = get_snapshot(MATCH_ID)
+
+        assert snapshot['seq'] == 4
+        assert snapshot['ready'] == ['1', '2']
+        assert snapshot['progress'] == {'1': [3, 5]}
+        assert snapshot['started_at'] == 10.0
+        assert snapshot['winner'] is None
+
+    def test_ready_starts_match(self, mock_redis, mock_layer, mock_replay):
+        """Test that the last player to ready up starts the match, once."""
+        mock_redis.pipeline.return_value.execute.return_value = [1, [b'1', b'1']]
+        mock_redis.hsetnx.return_value = 1
+
+        assert set_ready(MATCH_ID, '2')
+
+        assert [c[0][1] for c in mock_replay.call_args_list] == [replay.READY, replay.START]
+
+        deltas = sent_deltas(mock_layer)
+        assert [d['type'] for d in deltas] == ['ready', 'status']
+        assert deltas[0] == {'type': 'ready', 'player': '2', 'seq': 7}
+        assert mock_layer.group_send.call_args[0][0] == match_group(MATCH_ID)
+        mock_redis.hset.assert_called_once_with(match_key(MATCH_ID), 'status', 'in_progress')
+
+    def test_outsider_cannot_ready(self, mock_redis, mock_layer):
+        """Test that only players of the match can ready up."""
+        assert not set_ready(MATCH_ID, '3')
+        mock_layer.group_send.assert_not_called()
+
+    @override_settings(PVP_MATCH={'progress_window': 0.25})
+    def test_progress_is_coalesced(self, mock_redis, mock_layer):
+        """Test that only the first update of a burst asks for a flush and none is broadcast."""
+        pipe = mock_redis.pipeline.return_value
+        pipe.execute.side_effect = [[1, True], [1, None]]
+
+        assert record_progress(MATCH_ID, '1', 1, 5)
+        assert not record_progress(MATCH_ID, '1', 2, 5)
+
+        pipe.set.assert_called_with(progress_flush_key(MATCH_ID), 1, nx=True, px=2500)
+        mock_layer.group_send.assert_not_called()
+
+    def test_flush_sends_latest_progress(self, mock_redis, mock_layer):
+        """Test that a flush clears the flag and broadcasts one progress delta."""
+        mock_redis.hgetall.return_value = {
+            b'status': b'in_progress', b'players': b'["1", "2"]',
+            b'progress:1': b'2/5', b'progress:2': b'4/5',
+        }
+
+        flush_progress(MATCH_ID)
+
+        mock_redis.delete.assert_called_once_with(progress_flush_key(MATCH_ID))
+        assert sent_deltas(mock_layer) == [
+            {'type': 'progress', 'progress': {'1': [2, 5], '2': [4, 5]}, 'seq': 7}
+        ]
+
+    @override_settings(PVP_MATCH={'progress_window': 0.25})
+    def test_all_passed_finishes(self, mock_redis, mock_layer):
+        """Test that passing every test finishes the player and the first finisher wins."""
+        mock_redis.pipeline.return_value.execute.return_value = [1, None]
+        mock_redis.hsetnx.return_value = 1
+
+        record_progress(MATCH_ID, '1', 5, 5)
+
+        (delta,) = sent_deltas(mock_layer)
+        assert delta['type'] == 'finish'
+        assert delta['winner'] == '1'
+
+    @override_settings(PVP_MATCH={'progress_window': 0.25})
+    def test_progress_only_counts_in_progress(self, mock_redis, mock_layer):
+        """Test that progress before the start or after the end of a match is ignored."""
+        for match_status in ('waiting', 'completed'):
+            mock_redis.fields['status'] = match_status
+            assert not record_progress(MATCH_ID, '1', 5, 5)
+
+        mock_redis.pipeline.assert_not_called()
+        mock_redis.hsetnx.assert_not_called()
+        mock_layer.group_send.assert_not_called()
+
+    def test_submission_gets_match_mission(self, mock_redis, mock_replay):
+        """Test that players of a match in progress are given its mission, others nothing."""
+        assert record_submission(MATCH_ID, '1') == {'id': 'm1', 'version': 3}
+        assert record_submission(MATCH_ID, '3') is None
+        mock_redis.fields['status'] = 'waiting'
+        assert record_submission(MATCH_ID, '1') is None
+        assert mock_replay.call_count == 1
+
+    @override_settings(PVP_MATCH={'progress_window': 0.25})
+    def test_result_task_reports_progress(self):
+        """Test that graded match submissions report progress and schedule one flush."""
+        with patch('core.tasks.store_submission_state'), \
+                patch('core.tasks.record_progress', return_value=True) as record, \
+                patch('core.tasks.flush_match_progress_task') as flush:
+            process_result_task(
+                's1', [{'input': '1', 'expected': '2'}, {'input': '2', 'expected': '4'}], '2\n5',
+                match_id=MATCH_ID, player_id='1'
+            )
+
+        record.assert_called_once_with(MATCH_ID, '1', 1, 2)
+        flush.apply_async.assert_called_once_with(args=[MATCH_ID], countdown=0.25)
+
+    def test_missing_output_lines_fail(self):
+        """Test that cases without an output line fail, so a short output cannot win."""
+        test_cases = [{'input': str(i), 'expected': str(i)} for i in (1, 2, 3)]
+        with patch('core.tasks.store_submission_state') as store, \
+                patch('core.tasks.record_progress', return_value=False) as record, \
+                patch('core.tasks.finalize_match_task') as finalize:
+            process_result_task('s1', test_cases, '1', match_id=MATCH_ID, player_id='1')
+
+        results = store.call_args[0][1]['test_results']
+        assert [r['passed'] for r in results] == [True, False, False]
+        assert results[2]['actual'] == '' and 'diff' in results[2]
+        record.assert_called_once_with(MATCH_ID, '1', 1, 3)
+        finalize.delay.assert_not_called()
+
+class TestMatchSubmission:
+    def submit(self, **data):
+        request = APIRequestFactory().post('/api/submit/', {
+            'code': 'print(1)', 'language': 'python', 'test_file': 'test.py',
+            'match_id': MATCH_ID, 'test_cases': [{'input': '', 'expected': '1'}], **data
+        }, format='json')
+        force_authenticate(request, user=Mock(is_authenticated=True, id=1))
+        return CodeSubmissionView.as_view()(request)
+
+    @pytest.fixture(autouse=True)
+    def mock_submission(self):
+        with patch('core.views.cache'), patch('core.views.append_event'), \
+                patch('core.views.record_write'), \
+                patch('core.views.run_code_task') as task:
+            yield task
+
+    def test_graded_against_match_mission(self, mock_submission):
+        """Test that a match submission is graded on the match's mission, not the client's cases."""
+        with patch('core.views.record_submission', return_value={'id': 'm1', 'version': 3}):
+            response = self.submit()
+
+        assert response.status_code == 202
+        queued = mock_submission.delay.call_args.kwargs
+        assert queued['test_cases'] == []
+        assert (queued['mission_id'], queued['mission_version']) == ('m1', 3)
+
+    def test_refused_outside_match_in_progress(self, mock_submission):
+        """Test that a submission to a match the user is not playing is refused."""
+        with patch('core.views.record_submission', return_value=None):
+            response = self.submit()
+
+        assert response.status_code == 403
+        mock_submission.delay.assert_not_called()
+
+@pytest.mark.usefixtures('memory_channel_layer')
+class TestMatchConsumer:
+    def connect(self, user):
+        communicator = WebsocketCommunicator(MatchConsumer.as_asgi(), f'/ws/pvp/match/{MATCH_ID}/')
+        communicator.scope['url_route'] = {'kwargs': {'match_id': MATCH_ID}}
+        communicator.scope['user'] = user
+        return communicator
+
+    def test_player_gets_snapshot_then_deltas(self):
+        """Test that a player receives a snapshot and then group deltas."""
+        snapshot = {'seq': 2, 'status': 'waiting', 'players': ['1', '2']}
+
+        async def scenario():
+            communicator = self.connect(Mock(is_authenticated=True, id=1))
+            connected, _ = await communicator.connect()
+            assert connected
+            assert await communicator.receive_json_from() == {
+                'type': 'snapshot', 'seq': 2, 'match': snapshot
+            }
+            await communicator.send_json_to({'type': 'ready'})
+            await communicator.receive_nothing()
+
+            from channels.layers import get_channel_layer
+            await get_channel_layer().group_send(
+                match_group(MATCH_ID), {'type': 'match.delta', 'delta': {'type': 'ready', 'seq': 3}}
+            )
+            assert await communicator.receive_json_from() == {'type': 'ready', 'seq': 3}
+            await communicator.disconnect()
+
+        with patch('core.consumers.get_players', return_value=['1', '2']), \
+                patch('core.consumers.get_snapshot', return_value=snapshot), \
+                patch('core.consumers.set_ready') as ready:
+            asyncio.run(scenario())
+
+        ready.assert_called_once_with(MATCH_ID, '1')
+
+    def test_outsider_rejected(self):
+        """Test that users who are not in the match are refused."""
+        async def scenario():
+            communicator = self.connect(Mock(is_authenticated=True, id=3))
+            connected, code = await communicator.connect()
+            assert not connected
+            assert code == CLOSE_NOT_A_PLAYER
+
+        with patch('core.consumers.get_players', return_value=['1', '2']):
+            asyncio.run(scenario())
@@ -0,0 +1,204 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from rest_framework.test import APIRequestFactory, force_authenticate
+from ..matchmaking import (
+    MatchmakingLoop, MemoryMatchQueue, RedisMatchQueue, assignment_key, create_match, join_queue,
+    joined_key, match_key, queue_status, ratings_key, search_window
+)
+from ..views import MatchmakingQueueView
+
+MATCHMAKING = {
+    'shards': ['default'],
+    'base_window': 50,
+    'widen_per_second': 10,
+    'max_window': 400,
+    'interval': 0.5,
+    'batch_size': 2,
+    'match_ttl': 60,
+}
+
+@pytest.fixture
+def matchmaking_config(settings):
+    settings.MATCHMAKING = MATCHMAKING
+
+def pair(queue, now):
+    return asyncio.run(queue.pair(now))
+
+@pytest.mark.usefixtures('matchmaking_config')
+class TestMemoryMatchQueue:
+    @pytest.fixture
+    def queue(self):
+        return MemoryMatchQueue()
+
+    def join(self, queue, player_id, rating, now=0):
+        asyncio.run(queue.join(player_id, rating, now))
+
+    def test_search_window_widens(self):
+        """Test that the rating window grows with the wait and is capped."""
+        assert search_window(0) == 50
+        assert search_window(10) == 150
+        assert search_window(1000) == 400
+
+    def test_closest_rating_wins(self, queue):
+        """Test that a player is paired with the nearest rated opponent."""
+        for player_id, rating in [('a', 1500), ('b', 1400), ('c', 1530), ('d', 1900)]:
+            self.join(queue, player_id, rating)
+
+        assert pair(queue, 0) == [('a', 'c')]
+        assert asyncio.run(queue.size()) == 2
+
+    def test_window_widens_over_wait(self, queue):
+        """Test that distant players are paired only after waiting long enough."""
+        self.join(queue, 'a', 1000)
+        self.join(queue, 'b', 1200)
+
+        assert pair(queue, 10) == []
+        assert pair(queue, 15) == [('a', 'b')]
+
+    def test_rejoin_keeps_wait(self, queue):
+        """Test that joining again keeps the original join time."""
+        self.join(queue, 'a', 1000, now=0)
+        self.join(queue, 'a', 1000, now=14)
+        self.join(queue, 'b', 1200, now=14)
+
+        assert pair(queue, 15) == [('a', 'b')]
+
+    def test_requeue_keeps_wait(self, queue):
+        """Test that a requeued pair is back with its ratings and join times."""
+        self.join(queue, 'a', 1000, now=0)
+        self.join(queue, 'b', 1200, now=5)
+        assert pair(queue, 20) == [('a', 'b')]
+
+        asyncio.run(queue.requeue(('a', 'b')))
+
+        assert pair(queue, 15) == [('a', 'b')]
+
+@pytest.mark.usefixtures('matchmaking_config')
+class TestRedisMatchQueue:
+    def test_pair_walks_queue_in_batches(self):
+        """Test that the pairing script is called until the queue is exhausted."""
+        client = Mock()
+        script = AsyncMock(side_effect=[
+            [1, 2, [b'a', b'1500.5', b'3', b'b', b'1510', b'7']],
+            [1, 1, []],
+        ])
+        client.register_script.return_value = script
+        client.pipeline.return_value.execute = AsyncMock()
+        queue = RedisMatchQueue('default', client=client)
+
+        assert pair(queue, 100) == [('a', 'b')]
+
+        first, second = script.call_args_list
+        assert first[1]['keys'] == [ratings_key('default'), joined_key('default')]
+        assert first[1]['args'] == [100, 50, 10, 400, 0, 2]
+        assert second[1]['args'][4] == 1
+
+        asyncio.run(queue.requeue(('a', 'b')))
+        zadd = client.pipeline.return_value.zadd
+        zadd.assert_any_call(ratings_key('default'), {'a': 1500.5})
+        zadd.assert_any_call(joined_key('default'), {'b': 7.0}, nx=True)
+
+@pytest.mark.usefixtures('matchmaking_config')
+class TestQueueApi:
+    @pytest.fixture
+    def mock_redis(self):
+        with patch('core.matchmaking.get_redis') as mock:
+            yield mock.return_value
+
+    def test_join(self, mock_redis):
+        """Test that joining clears a stale assignment and keeps an earlier join time."""
+        pipe = mock_redis.pipeline.return_value
+
+        join_queue('7', 1200, now=5)
+
+        pipe.delete.assert_called_once_with(assignment_key('7'))
+        pipe.zadd.assert_any_call(ratings_key('default'), {'7': 1200})
+        pipe.zadd.assert_any_call(joined_key('default'), {'7': 5}, nx=True)
+
+    def test_status(self, mock_redis):
+        """Test the idle, queued and matched states."""
+        pipe = mock_redis.pipeline.return_value
+        pipe.execute.return_value = [None, None]
+        assert queue_status('7') == {'status': 'idle'}
+        pipe.execute.return_value = [None, 0.0]
+        assert queue_status('7')['status'] == 'in_queue'
+        pipe.execute.return_value = [b'match-1', None]
+        assert queue_status('7') == {'status': 'matched', 'match_id': 'match-1'}
+
+    def test_match_gets_mission(self, mock_redis):
+        """Test that a new match is played on a mission of the catalog, chosen by the server."""
+        pipe = mock_redis.pipeline.return_value
+        catalog = {'missions': [{'id': 'm1', 'version': 3}]}
+
+        with patch('core.matchmaking.get_catalog', return_value=catalog), \
+                patch('core.matchmaking.start_log'):
+            match_id = create_match(('7', '8'))
+
+        fields = pipe.hset.call_args.kwargs['mapping']
+        assert pipe.hset.call_args[0][0] == match_key(match_id)
+        assert (fields['mission_id'], fields['mission_version']) == ('m1', 3)
+
+        with patch('core.matchmaking.get_catalog', return_value={'missions': []}):
+            with pytest.raises(ValueError):
+                create_match(('7', '8'))
+
+    def test_view(self):
+        """Test joining and leaving through the API."""
+        factory = APIRequestFactory()
+        user = Mock(is_authenticated=True, id=7)
+
+        with patch('core.views.join_queue') as join, \
+                patch('core.views.get_rating', return_value=1200), \
+                patch('core.views.queue_status', return_value={'status': 'in_queue', 'waited': 0.0}), \
+                patch('core.views.set_status') as presence:
+            request = factory.post('/api/pvp/queue/', {}, format='json')
+            force_authenticate(request, user=user)
+            response = MatchmakingQueueView.as_view()(request)
+        assert response.status_code == 202
+        join.assert_called_once_with('7', 1200, 'default')
+        presence.assert_called_once_with(7, 'in_queue')
+
+        with patch('core.views.leave_queue', return_value=False):
+            request = factory.delete('/api/pvp/queue/')
+            force_authenticate(request, user=user)
+            assert MatchmakingQueueView.as_view()(request).status_code == 404
+
+        request = factory.get('/api/pvp/queue/', {'shard': 'unknown'})
+        force_authenticate(request, user=user)
+        assert MatchmakingQueueView.as_view()(request).status_code == 400
+
+class TestMatchmakingLoop:
+    @pytest.fixture
+    def catalog(self):
+        catalog = {'missions': [{'id': 'm1', 'version': 3}]}
+        with patch('core.matchmaking.get_catalog', return_value=catalog):
+            yield catalog
+
+    def test_tick_reports_matches(self, catalog):
+        """Test that every pair of a tick is handed to the match callback."""
+        queue = Mock(pair=AsyncMock(return_value=[('a', 'b'), ('c', 'd')]))
+        on_match = AsyncMock()
+
+        asyncio.run(MatchmakingLoop(queue, on_match, interval=1).tick(now=10))
+
+        queue.pair.assert_awaited_once_with(10)
+        assert [c[0][0] for c in on_match.call_args_list] == [('a', 'b'), ('c', 'd')]
+
+    def test_failed_match_requeues_pair(self, catalog):
+        """Test that a pair whose match fails is requeued and the other pairs still play."""
+        queue = Mock(pair=AsyncMock(return_value=[('a', 'b'), ('c', 'd')]), requeue=AsyncMock())
+        on_match = AsyncMock(side_effect=[ValueError('no mission'), None])
+
+        pairs = asyncio.run(MatchmakingLoop(queue, on_match, interval=1).tick(now=10))
+
+        assert pairs == [('c', 'd')]
+        queue.requeue.assert_awaited_once_with(('a', 'b'))
+
+    def test_no_pairing_without_missions(self, catalog):
+        """Test that players stay queued while no mission is published."""
+        catalog['missions'] = []
+        queue = Mock(pair=AsyncMock())
+
+        assert asyncio.run(MatchmakingLoop(queue, AsyncMock(), interval=1).tick(now=10)) == []
+        queue.pair.assert_not_awaited()
@@ -0,0 +1,123 @@
+import time
+import pytest
+import requests
+from unittest.mock import Mock, patch
+from django.test import RequestFactory
+from prometheus_client import REGISTRY
+from ..metrics import QueueDepthCollector, observe_queue_wait, stamp_sent_at
+from ..sandbox import SandboxError, SandboxManager, SecurityError
+from ..status import store_submission_state
+from ..tasks import run_code_task
+from ..views import metrics
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+@pytest.fixture
+def metrics_config(settings):
+    settings.METRICS = {
+        'worker_port': 9808,
+        'queues': ['code_execution', 'result_processing'],
+        'priority_steps': 2,
+    }
+
+@pytest.mark.usefixtures('locmem_cache')
+class TestPipelineMetrics:
+    def test_queue_wait(self):
+        """Test that the wait between publishing and starting a task is observed per queue."""
+        headers = {}
+        stamp_sent_at(headers=headers)
+        fast = sample('kodewar_task_queue_wait_seconds_bucket', queue='code_execution', le='1.0')
+        slow = sample('kodewar_task_queue_wait_seconds_bucket', queue='code_execution', le='2.5')
+
+        task = Mock()
+        task.request.sent_at = headers['sent_at'] - 2
+        task.request.delivery_info = {'routing_key': 'code_execution'}
+        observe_queue_wait(task=task)
+
+        assert sample('kodewar_task_queue_wait_seconds_bucket', queue='code_execution', le='1.0') == fast
+        assert sample('kodewar_task_queue_wait_seconds_bucket', queue='code_execution', le='2.5') == slow + 1
+
+    def test_container_phases_and_oom(self):
+        """Test that each container operation is timed and OOM kills are counted."""
+        phases = ('create', 'start', 'wait', 'logs', 'remove')
+        before = {phase: sample('kodewar_sandbox_phase_seconds_count', phase=phase) for phase in phases}
+        oom_before = sample('kodewar_sandbox_oom_kills_total')
+
+        with patch('docker.from_env') as from_env:
+            client = from_env.return_value
+            client.containers.create.return_value.id = 'c1'
+            container = client.containers.get.return_value
+            container.wait.return_value = {'StatusCode': 137}
+            container.attrs = {'State': {'OOMKilled': True}}
+            container.logs.return_value = b''
+
+            sandbox = SandboxManager()
+            sandbox.create_container(image='kodewar-sandbox-python', command='true')
+            assert sandbox.run_container('c1')['exit_code'] == 137
+
+        for phase in phases:
+            assert sample('kodewar_sandbox_phase_seconds_count', phase=phase) == before[phase] + 1
+        assert sample('kodewar_sandbox_oom_kills_total') == oom_before + 1
+
+    def test_wait_timeout_counted(self):
+        """Test that giving up on a container that overruns counts as a timeout."""
+        before = sample('kodewar_sandbox_timeouts_total')
+
+        with patch('docker.from_env') as from_env:
+            container = from_env.return_value.containers.get.return_value
+            container.wait.side_effect = requests.exceptions.ReadTimeout()
+
+            with pytest.raises(SandboxError):
+                SandboxManager().run_container('c1', timeout=1)
+
+        assert sample('kodewar_sandbox_timeouts_total') == before + 1
+
+    def test_errors_by_class(self):
+        """Test that sandbox errors are counted by class and leave no container in flight."""
+        before = sample('kodewar_sandbox_errors_total', error='SecurityError')
+
+        with patch('core.tasks.SandboxManager') as manager, \
+                patch('core.tasks.store_submission_state'):
+            manager.return_value.run_container.side_effect = SecurityError('blocked')
+            with pytest.raises(SecurityError):
+                run_code_task('print(1)', 'python', submission_id='s1')
+
+        assert sample('kodewar_sandbox_errors_total', error='SecurityError') == before + 1
+        assert sample('kodewar_sandbox_containers_in_flight') == 0
+
+    def test_submit_to_verdict(self):
+        """Test that the latency of a submission is observed once its state is final."""
+        before = sample('kodewar_submission_latency_seconds_count', status='success')
+
+        with patch('core.status.get_redis'):
+            store_submission_state('s1', {'status': 'pending'}, submitted_at=time.time())
+            store_submission_state('s1', {'status': 'success'}, submitted_at=time.time() - 3)
+
+        assert sample('kodewar_submission_latency_seconds_count', status='success') == before + 1
+
+@pytest.mark.usefixtures('metrics_config')
+class TestScrape:
+    def test_queue_depth(self):
+        """Test that queue depth adds up the lists of every priority step."""
+        broker = Mock()
+        broker.pipeline.return_value.execute.return_value = [3, 1, 0, 2]
+
+        with patch('core.metrics._broker', broker):
+            family = next(QueueDepthCollector().collect())
+
+        broker.pipeline.return_value.llen.assert_any_call('code_execution:1')
+        assert {s.labels['queue']: s.value for s in family.samples} == {
+            'code_execution': 4, 'result_processing': 2
+        }
+
+    def test_endpoint(self):
+        """Test that the endpoint serves the text exposition format."""
+        with patch('core.metrics._broker') as broker:
+            broker.pipeline.return_value.execute.return_value = [0, 0, 0, 0]
+            response = metrics(RequestFactory().get('/metrics'))
+
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/plain')
+        assert b'kodewar_sandbox_phase_seconds_bucket' in response.content
+        assert b'kodewar_queue_depth{queue="code_execution"} 0.0' in response.content
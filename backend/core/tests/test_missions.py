@@ -0,0 +1,149 @@
+import json
+import pytest
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIRequestFactory, force_authenticate
+from ..missions import (
+    LRUCache, VERSION_KEY, _on_invalidate, bundle_key, catalog_key, current_version, encode_bundle,
+    get_catalog, get_mission, get_test_cases, reset
+)
+from ..models import Mission
+from ..views import CodeSubmissionView, MissionListView
+
+CATALOG = [
+    {'id': 'm1', 'title': 'Hello', 'description': '', 'difficulty': 'easy',
+     'rewards': [], 'version': 2},
+]
+
+@pytest.fixture
+def missions_config(settings):
+    settings.MISSIONS = {
+        'lru_size': 4,
+        'version_check_interval': 5,
+        'pubsub': False,
+        'bundle_ttl': 60,
+    }
+    reset()
+    yield
+    reset()
+
+@pytest.fixture
+def redis_store():
+    """A dict standing in for the Redis keys the catalog reads."""
+    store = {}
+    with patch('core.missions.get_redis') as mock:
+        client = mock.return_value
+        client.get.side_effect = store.get
+        client.set.side_effect = lambda key, value, **kwargs: store.setdefault(key, value)
+        yield store, client
+
+@pytest.mark.usefixtures('missions_config')
+class TestMissionCache:
+    def test_lru_evicts_least_recent(self):
+        """Test that the LRU drops the least recently read entry."""
+        lru = LRUCache(2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+
+        assert lru.get('b') is None
+        assert (lru.get('a'), lru.get('c')) == (1, 3)
+
+    def test_catalog_served_from_process_cache(self, redis_store):
+        """Test that repeated reads within the check interval only read Redis once."""
+        store, client = redis_store
+        store.update({VERSION_KEY: b'3', catalog_key(3): json.dumps(CATALOG).encode()})
+
+        assert get_mission('m1')['title'] == 'Hello'
+        assert get_catalog()['version'] == 3
+        assert get_mission('missing') is None
+        assert client.get.call_count == 2
+
+    def test_version_bump_switches_catalog(self, redis_store):
+        """Test that a newer version announced on the channel is picked up, an older one is not."""
+        store, _ = redis_store
+        renamed = [dict(CATALOG[0], title='Hello again', version=3)]
+        store.update({
+            VERSION_KEY: b'3',
+            catalog_key(3): json.dumps(CATALOG).encode(),
+            catalog_key(4): json.dumps(renamed).encode(),
+        })
+        assert get_mission('m1')['version'] == 2
+
+        _on_invalidate({'data': b'4'})
+        assert get_mission('m1')['title'] == 'Hello again'
+
+        _on_invalidate({'data': b'3'})
+        assert current_version() == 4
+
+    def test_bundle_decoded_once(self, redis_store):
+        """Test that a mission version's test cases are read from Redis once per process."""
+        store, client = redis_store
+        test_cases = [{'input': '1', 'expected': '1'}]
+        store[bundle_key('m1', 2)] = encode_bundle('m1', 2, test_cases)
+
+        assert get_test_cases('m1', 2) == test_cases
+        assert get_test_cases('m1', 2) == test_cases
+        assert client.get.call_count == 1
+
+    @pytest.mark.django_db
+    def test_rebuilt_from_database(self, redis_store):
+        """Test that a catalog or bundle missing from Redis is rebuilt from the missions table."""
+        store, _ = redis_store
+        Mission.objects.create(id='m1', title='Hello', published=True, version=2,
+                               test_cases=[{'input': '1', 'expected': '1'}])
+        Mission.objects.create(id='m2', title='Draft', published=False)
+        store[VERSION_KEY] = b'7'
+
+        assert [mission['id'] for mission in get_catalog()['missions']] == ['m1']
+        assert catalog_key(7) in store
+        assert get_test_cases('m1', 2) == [{'input': '1', 'expected': '1'}]
+        assert get_test_cases('m1', 1) is None
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('missions_config')
+class TestMissionApi:
+    def test_etag(self, redis_store):
+        """Test that the mission list is answered with 304 while the catalog version holds."""
+        store, _ = redis_store
+        store.update({VERSION_KEY: b'3', catalog_key(3): json.dumps(CATALOG).encode()})
+        user = get_user_model().objects.create_user('alice')
+        factory = APIRequestFactory()
+
+        request = factory.get('/api/missions/')
+        force_authenticate(request, user=user)
+        response = MissionListView.as_view()(request)
+        assert response.status_code == 200
+        assert response.data['missions'][0]['id'] == 'm1'
+
+        request = factory.get('/api/missions/', HTTP_IF_NONE_MATCH=response['ETag'])
+        force_authenticate(request, user=user)
+        assert MissionListView.as_view()(request).status_code == 304
+
+    def test_submission_graded_against_catalog(self, redis_store):
+        """Test that a mission submission ignores the client's test cases for the catalog's."""
+        store, _ = redis_store
+        store.update({VERSION_KEY: b'3', catalog_key(3): json.dumps(CATALOG).encode()})
+        user = get_user_model().objects.create_user('alice')
+
+        def submit(mission_id):
+            request = APIRequestFactory().post('/api/submit/', {
+                'code': 'print(1)', 'language': 'python', 'test_file': 'test.py',
+                'mission_id': mission_id, 'test_cases': [{'input': '', 'expected': '1'}],
+            }, format='json')
+            force_authenticate(request, user=user)
+            with patch('core.views.append_event') as append, patch('core.views.cache'), \
+                    patch('core.views.record_write'), patch('core.views.run_code_task') as task:
+                assert CodeSubmissionView.as_view()(request).status_code == 202
+            return append.call_args[0][0], task.delay.call_args.kwargs
+
+        event, queued = submit('m1')
+        assert (event['mission_id'], event['mission_version']) == ('m1', 2)
+        assert queued['test_cases'] == []
+        assert (queued['mission_id'], queued['mission_version']) == ('m1', 2)
+
+        # Unknown missions are graded against the client's cases and complete nothing
+        event, queued = submit('m9')
+        assert (event['mission_id'], event['mission_version']) == ('', None)
+        assert queued['test_cases'] == [{'input': '', 'expected': '1'}]
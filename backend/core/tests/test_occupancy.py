@@ -0,0 +1,88 @@
+import pytest
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from ..construction import (
+    CONSTRUCTION_COMPLETE, BuildingError, building_neighbours, move_building, place_building,
+    remove_building
+)
+from ..economy import create_base
+from ..models import Building, PlayerBase
+from ..occupancy import OccupancyGrid, get_grid
+
+class OccupancyGridTest(TestCase):
+    def test_serialised_size(self):
+        """Test that a 10x10 grid serialises to a 4-byte header and 13 bytes of bits."""
+        grid = OccupancyGrid(10, 10)
+        grid.occupy(9, 9)
+        data = grid.to_bytes()
+
+        self.assertEqual(len(data), 17)
+        self.assertTrue(OccupancyGrid.from_bytes(data).is_occupied(9, 9))
+
+    def test_footprints(self):
+        """Test that footprints overlap, leave the grid and are released as expected."""
+        grid = OccupancyGrid(10, 10)
+        grid.occupy(2, 2, 2, 2)
+
+        self.assertFalse(grid.is_free(3, 3))
+        self.assertFalse(grid.is_free(1, 1, 2, 2))
+        self.assertTrue(grid.is_free(4, 2, 2, 2))
+        self.assertFalse(grid.is_free(9, 9, 2, 1))
+        grid.release(2, 2, 2, 2)
+        self.assertTrue(grid.is_free(2, 2, 2, 2))
+
+    def test_neighbours(self):
+        """Test that the ring around a footprint is checked, diagonals included, within bounds."""
+        grid = OccupancyGrid(10, 10)
+        for cell in [(0, 0), (1, 2), (3, 3), (5, 5)]:
+            grid.occupy(*cell)
+
+        self.assertEqual(sorted(grid.neighbours(1, 1)), [(0, 0), (1, 2)])
+        self.assertEqual(grid.neighbours(0, 0), [])
+
+@pytest.mark.usefixtures('locmem_cache')
+@patch('core.construction.schedule')
+class PlacementTest(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user('alice', password='secret')
+        self.base = create_base(
+            user, 'Alpha', 10, 10, {'credits': 5000, 'minerals': 5000, 'energy': 5000}
+        )
+
+    def place(self, x, y, building_type='resource_collector'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return place_building(self.base, building_type, x, y)
+
+    def test_place_and_overlap(self, schedule):
+        """Test that placing occupies the grid, schedules construction and rejects overlaps."""
+        building = self.place(2, 3)
+
+        schedule.assert_called_once_with(
+            CONSTRUCTION_COMPLETE, str(building.id), building.active_from
+        )
+        self.assertTrue(OccupancyGrid.from_bytes(
+            PlayerBase.objects.get(id=self.base.id).occupancy
+        ).is_occupied(2, 3))
+        with self.assertRaises(BuildingError):
+            self.place(2, 3)
+        with self.assertRaises(BuildingError):
+            self.place(10, 0)
+
+    def test_move_and_remove(self, schedule):
+        """Test that moving and demolishing update the stored and cached grids."""
+        building = self.place(0, 0)
+        other = self.place(5, 5)
+
+        with self.assertRaises(BuildingError):
+            move_building(building, 5, 5)
+        with self.captureOnCommitCallbacks(execute=True):
+            move_building(building, 4, 4)
+        self.assertEqual([b.id for b in building_neighbours(other)], [building.id])
+
+        with patch('core.construction.cancel'), self.captureOnCommitCallbacks(execute=True):
+            remove_building(other)
+        grid = get_grid(self.base)
+        self.assertFalse(grid.is_occupied(5, 5))
+        self.assertTrue(grid.is_occupied(4, 4))
+        self.assertFalse(Building.objects.filter(id=other.id).exists())
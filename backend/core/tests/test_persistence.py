@@ -0,0 +1,159 @@
+import json
+import uuid
+from unittest.mock import Mock, patch
+from django.contrib.auth import get_user_model
+from django.db import OperationalError
+from django.test import TestCase
+from ..models import Submission, TestResult as TestResultModel
+from ..persistence import (
+    SubmissionStreamConsumer, completed_event, created_event, load_submission_state, persist_events
+)
+
+class PersistEventsTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('alice', password='secret')
+        self.submission_id = str(uuid.uuid4())
+        self.created = created_event(
+            self.submission_id, 'python', 'print(1)', user_id=self.user.id, mission_id='m1'
+        )
+        self.completed = completed_event(self.submission_id, {
+            'status': 'success',
+            'output': '1',
+            'test_results': [
+                {'passed': True, 'input': '1', 'expected': '1', 'actual': '1'},
+                {'passed': False, 'input': '2', 'expected': '2', 'actual': '3',
+                 'diff': {'hunks': [], 'truncated': False}},
+            ]
+        })
+
+    def assert_persisted(self):
+        submission = Submission.objects.get(id=self.submission_id)
+        self.assertEqual(submission.user, self.user)
+        self.assertEqual(submission.mission_id, 'm1')
+        self.assertEqual(submission.code, 'print(1)')
+        self.assertEqual(submission.status, 'success')
+        self.assertIsNotNone(submission.completed_at)
+        self.assertEqual(
+            [r.passed for r in submission.test_results.all()], [True, False]
+        )
+
+    def test_created_and_completed_in_one_batch(self):
+        """Test that both events of a submission are coalesced into one row."""
+        # Six writes plus the lookup of missions the batch completes
+        with self.assertNumQueries(7):
+            persist_events([self.created, self.completed])
+        self.assert_persisted()
+
+    def test_completed_before_created(self):
+        """Test that event order across batches does not matter."""
+        persist_events([self.completed])
+        persist_events([self.created])
+        self.assert_persisted()
+
+    def test_replay_is_idempotent(self):
+        """Test that redelivered events do not duplicate rows."""
+        persist_events([self.created, self.completed])
+        persist_events([self.created, self.completed])
+        self.assertEqual(Submission.objects.count(), 1)
+        self.assertEqual(TestResultModel.objects.count(), 2)
+
+    def test_rejudge_replaces_results(self):
+        """Test that a later completion replaces the stored test results."""
+        persist_events([self.created, self.completed])
+        rejudged = completed_event(self.submission_id, {
+            'status': 'success',
+            'test_results': [{'passed': True, 'input': '1', 'expected': '1', 'actual': '1'}]
+        })
+        persist_events([rejudged])
+        self.assertEqual(TestResultModel.objects.filter(submission_id=self.submission_id).count(), 1)
+
+    def test_load_submission_state(self):
+        """Test that the status payload is rebuilt from the database."""
+        persist_events([self.created, self.completed])
+
+        state = load_submission_state(self.submission_id)
+
+        self.assertEqual(state['status'], 'success')
+        self.assertEqual(state['output'], '1')
+        self.assertEqual(len(state['test_results']), 2)
+        self.assertNotIn('diff', state['test_results'][0])
+        self.assertIn('diff', state['test_results'][1])
+        self.assertIsNone(load_submission_state(str(uuid.uuid4())))
+        self.assertIsNone(load_submission_state('not-a-uuid'))
+
+class SubmissionStreamConsumerTest(TestCase):
+    def test_run_once_persists_and_acknowledges(self):
+        """Test that a batch is persisted, then acknowledged and removed from the stream."""
+        submission_id = str(uuid.uuid4())
+        event = created_event(submission_id, 'python', 'print(1)')
+        mock_redis = Mock()
+        mock_redis.xautoclaim.return_value = [b'0-0', [], []]
+        mock_redis.xreadgroup.return_value = [
+            [b'submissions:events', [(b'1-0', {b'event': json.dumps(event).encode()})]]
+        ]
+
+        with patch('core.persistence.get_redis', return_value=mock_redis):
+            consumer = SubmissionStreamConsumer('test', batch_size=10, block_ms=0)
+            self.assertEqual(consumer.run_once(), 1)
+
+        self.assertTrue(Submission.objects.filter(id=submission_id).exists())
+        pipe = mock_redis.pipeline.return_value
+        pipe.xack.assert_called_once_with('submissions:events', 'submission-persisters', b'1-0')
+        pipe.xdel.assert_called_once_with('submissions:events', b'1-0')
+
+    def test_claims_stale_entries_first(self):
+        """Test that entries abandoned by a crashed consumer are picked up."""
+        event = created_event(str(uuid.uuid4()), 'python', 'print(1)')
+        mock_redis = Mock()
+        mock_redis.xautoclaim.return_value = [
+            b'0-0', [(b'1-0', {b'event': json.dumps(event).encode()})], []
+        ]
+
+        with patch('core.persistence.get_redis', return_value=mock_redis):
+            consumer = SubmissionStreamConsumer('test', batch_size=10, block_ms=0)
+            self.assertEqual(consumer.run_once(), 1)
+
+        mock_redis.xreadgroup.assert_not_called()
+
+    def test_poison_event_dead_lettered(self):
+        """Test that an event failing on its own is dead-lettered and the rest persisted."""
+        good = created_event(str(uuid.uuid4()), 'python', 'print(1)')
+        bad = dict(created_event(str(uuid.uuid4()), 'python', 'print(2)'), created_at=None)
+        mock_redis = Mock()
+        mock_redis.xautoclaim.return_value = [b'0-0', [
+            (b'1-0', {b'event': json.dumps(bad).encode()}),
+            (b'2-0', {b'event': b'not json'}),
+            (b'3-0', {b'event': json.dumps(good).encode()}),
+        ], []]
+
+        with patch('core.persistence.get_redis', return_value=mock_redis):
+            consumer = SubmissionStreamConsumer('test', batch_size=10, block_ms=0)
+            self.assertEqual(consumer.run_once(), 3)
+
+        self.assertTrue(Submission.objects.filter(id=good['id']).exists())
+        pipe = mock_redis.pipeline.return_value
+        dead = [c[0][1] for c in pipe.xadd.call_args_list]
+        self.assertEqual([d['entry_id'] for d in dead], [b'1-0', b'2-0'])
+        self.assertEqual(json.loads(dead[1]['event']), {'raw': 'not json'})
+        pipe.xack.assert_called_once_with(
+            'submissions:events', 'submission-persisters', b'1-0', b'2-0', b'3-0'
+        )
+
+    def test_database_outage_retries_batch(self):
+        """Test that a batch the database was unavailable for is kept and retried."""
+        event = created_event(str(uuid.uuid4()), 'python', 'print(1)')
+        mock_redis = Mock()
+        mock_redis.xautoclaim.return_value = [
+            b'0-0', [(b'1-0', {b'event': json.dumps(event).encode()})], []
+        ]
+
+        with patch('core.persistence.get_redis', return_value=mock_redis):
+            consumer = SubmissionStreamConsumer('test', batch_size=10, block_ms=0)
+            with patch('core.persistence.persist_events', side_effect=OperationalError('down')):
+                with self.assertRaises(OperationalError):
+                    consumer.run_once()
+            mock_redis.pipeline.return_value.xack.assert_not_called()
+            self.assertEqual(consumer.run_once(), 1)
+
+        self.assertEqual(mock_redis.xautoclaim.call_count, 1)
+        self.assertTrue(Submission.objects.filter(id=event['id']).exists())
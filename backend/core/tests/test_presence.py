@@ -0,0 +1,155 @@
+import asyncio
+import pytest
+from datetime import datetime, timezone as dt_timezone
+from unittest.mock import Mock, patch
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from ..consumers import LobbyConsumer
+from ..models import UserProfile
+from ..presence import (
+    FLUSHING_KEY, LAST_SEEN_KEY, LOBBY_GROUP, counts, flush_last_active, heartbeat,
+    online_players, prune, set_status, status_key
+)
+
+PRESENCE = {
+    'heartbeat_interval': 15,
+    'ttl': 45,
+    'flush_batch_size': 2,
+    'lobby_limit': 50,
+}
+
+@pytest.fixture
+def presence_config(settings):
+    settings.PRESENCE = PRESENCE
+
+@pytest.fixture
+def patched_module():
+    return 'core.presence'
+
+@pytest.mark.usefixtures('presence_config')
+class TestPresence:
+    def test_heartbeat_keeps_status(self, mock_redis):
+        """Test that a heartbeat refreshes the player under their current status."""
+        script = mock_redis.register_script.return_value
+        script.return_value = b'in_queue'
+
+        assert heartbeat(7, now=1000.0) == 'in_queue'
+
+        keys = script.call_args.kwargs['keys']
+        assert keys[0] == 'presence:user:7'
+        assert keys[1:4] == [status_key('idle'), status_key('in_queue'), status_key('in_match')]
+        assert keys[4] == LAST_SEEN_KEY
+        assert script.call_args.kwargs['args'] == [7, 1000.0, 45]
+
+    def test_status_change_is_broadcast(self, mock_redis, mock_layer):
+        """Test that moving a player to a new status tells the lobby."""
+        mock_redis.register_script.return_value.return_value = b'idle'
+
+        set_status(7, 'in_queue', now=1000.0)
+
+        mock_layer.group_send.assert_called_once_with(
+            LOBBY_GROUP, {'type': 'presence.status', 'user_id': 7, 'status': 'in_queue'}
+        )
+
+    def test_unchanged_status_is_not_broadcast(self, mock_redis, mock_layer):
+        """Test that setting the status a player already has sends nothing."""
+        mock_redis.register_script.return_value.return_value = b'in_queue'
+
+        set_status(7, 'in_queue', now=1000.0)
+
+        mock_layer.group_send.assert_not_called()
+
+    def test_counts_only_fresh_heartbeats(self, mock_redis):
+        """Test that each status is counted from the TTL cutoff onwards."""
+        pipe = mock_redis.pipeline.return_value
+        pipe.execute.return_value = [3, 1, 2]
+
+        assert counts(now=1000.0) == {'idle': 3, 'in_queue': 1, 'in_match': 2}
+        pipe.zcount.assert_any_call(status_key('idle'), 955.0, '+inf')
+
+    def test_online_players_most_recent_first(self, mock_redis):
+        """Test that players of every status are merged by last heartbeat and limited."""
+        pipe = mock_redis.pipeline.return_value
+        pipe.execute.return_value = [
+            [(b'1', 990.0), (b'2', 960.0)], [(b'3', 995.0)], [(b'4', 970.0)],
+        ]
+
+        players = online_players(3, now=1000.0)
+
+        assert [p['user_id'] for p in players] == [3, 1, 4]
+        assert players[0] == {'user_id': 3, 'status': 'in_queue', 'last_active': 995.0}
+        pipe.zrevrangebyscore.assert_any_call(
+            status_key('idle'), '+inf', 955.0, start=0, num=3, withscores=True
+        )
+
+    def test_prune_drops_expired(self, mock_redis):
+        """Test that entries older than the TTL are removed from every status set."""
+        pipe = mock_redis.pipeline.return_value
+        pipe.execute.return_value = [2, 0, 1]
+
+        assert prune(now=1000.0) == 3
+        pipe.zremrangebyscore.assert_any_call(status_key('in_match'), '-inf', '(955.0')
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('presence_config', 'locmem_cache')
+class TestFlushLastActive:
+    def test_flush_upserts_profiles_in_batches(self, mock_redis):
+        """Test that drained heartbeat times create or update profiles of existing users."""
+        User = get_user_model()
+        alice = User.objects.create_user('alice')
+        bob = User.objects.create_user('bob')
+        UserProfile.objects.create(user=alice)
+        mock_redis.exists.return_value = False
+        mock_redis.hscan_iter.return_value = iter([
+            (str(alice.id).encode(), b'1000.0'),
+            (str(bob.id).encode(), b'2000.0'),
+            (b'999999', b'3000.0'),
+        ])
+
+        assert flush_last_active() == 3
+
+        mock_redis.rename.assert_called_once_with(LAST_SEEN_KEY, FLUSHING_KEY)
+        mock_redis.delete.assert_called_once_with(FLUSHING_KEY)
+        assert UserProfile.objects.count() == 2
+        assert UserProfile.objects.get(user=bob).last_active == datetime.fromtimestamp(
+            2000, tz=dt_timezone.utc
+        )
+        assert UserProfile.objects.get(user=alice).last_active == datetime.fromtimestamp(
+            1000, tz=dt_timezone.utc
+        )
+
+    def test_unfinished_flush_is_resumed(self, mock_redis):
+        """Test that a flush left over by a failed run is finished before taking a new one."""
+        mock_redis.exists.return_value = True
+        mock_redis.hscan_iter.return_value = iter([])
+
+        flush_last_active()
+
+        mock_redis.rename.assert_not_called()
+        mock_redis.delete.assert_called_once_with(FLUSHING_KEY)
+
+@pytest.mark.usefixtures('memory_channel_layer')
+class TestLobbyConsumer:
+    def test_heartbeats_and_status_relay(self):
+        """Test that the lobby socket sends heartbeats and relays status changes."""
+        async def scenario():
+            communicator = WebsocketCommunicator(LobbyConsumer.as_asgi(), '/ws/pvp/lobby/')
+            communicator.scope['user'] = Mock(is_authenticated=True, id=7)
+            connected, _ = await communicator.connect()
+            assert connected
+            await communicator.send_json_to({'type': 'heartbeat'})
+            await communicator.receive_nothing()
+
+            from channels.layers import get_channel_layer
+            await get_channel_layer().group_send(
+                LOBBY_GROUP, {'type': 'presence.status', 'user_id': 8, 'status': 'in_match'}
+            )
+            assert await communicator.receive_json_from() == {
+                'type': 'player_status', 'payload': {'playerId': '8', 'status': 'in_match'}
+            }
+            await communicator.disconnect()
+
+        with patch('core.consumers.heartbeat') as beat:
+            asyncio.run(scenario())
+
+        assert beat.call_count == 2
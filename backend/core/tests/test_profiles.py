@@ -0,0 +1,120 @@
+import uuid
+import pytest
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from ..models import CompletedMission, Match, PlayerRating, UserProfile
+from ..persistence import completed_event, created_event, persist_events
+from ..profiles import get_profile, profile_cache_key, reconcile_profiles
+from ..rating import apply_match_result
+
+PROFILE = {
+    'experience_per_level': 1000,
+    'mission_experience': 100,
+    'mission_credits': 50,
+    'match_experience': {'win': 50, 'loss': 10, 'draw': 25},
+    'match_credits': {'win': 25, 'loss': 0, 'draw': 10},
+    'cache_timeout': 300,
+    'reconcile_chunk': 1,
+}
+
+@pytest.mark.usefixtures('locmem_cache')
+@override_settings(PROFILE=PROFILE)
+class ProfileCountersTest(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.alice = User.objects.create_user('alice', password='secret')
+        self.bob = User.objects.create_user('bob', password='secret')
+        cache.clear()
+        patcher = patch('core.rating.update_ratings')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def submission_events(self, mission_id, passed, mission_version=1):
+        submission_id = str(uuid.uuid4())
+        return [
+            created_event(submission_id, 'python', 'print(1)', user_id=self.alice.id,
+                          mission_id=mission_id, mission_version=mission_version),
+            completed_event(submission_id, {
+                'status': 'success',
+                'output': '1',
+                'test_results': [
+                    {'passed': True, 'input': '1', 'expected': '1', 'actual': '1'},
+                    {'passed': passed, 'input': '2', 'expected': '2', 'actual': '2'},
+                ],
+            }),
+        ]
+
+    def test_first_passing_submission_completes_mission(self):
+        """Test that only the first fully passing submission of a mission is credited."""
+        persist_events(self.submission_events('m1', passed=False))
+        self.assertFalse(UserProfile.objects.filter(user=self.alice, completed_missions__gt=0).exists())
+
+        persist_events(self.submission_events('m1', passed=True))
+        persist_events(self.submission_events('m1', passed=True))
+        persist_events(self.submission_events('m2', passed=True))
+
+        profile = UserProfile.objects.get(user=self.alice)
+        self.assertEqual(profile.completed_missions, 2)
+        self.assertEqual(profile.experience, 200)
+        self.assertEqual(profile.credits, 100)
+
+    def test_client_tested_submission_never_counts(self):
+        """Test that passing test cases of the client's choosing completes no mission."""
+        persist_events(self.submission_events('m1', passed=True, mission_version=None))
+
+        self.assertFalse(CompletedMission.objects.exists())
+        self.assertEqual(reconcile_profiles(), 0)
+        self.assertFalse(CompletedMission.objects.exists())
+
+    def test_redelivered_events_count_once(self):
+        """Test that replaying a batch after a crash does not credit a mission twice."""
+        events = self.submission_events('m1', passed=True)
+        persist_events(events)
+        persist_events(events)
+
+        self.assertEqual(UserProfile.objects.get(user=self.alice).completed_missions, 1)
+
+    def test_match_awards_both_players(self):
+        """Test that a finished match adds experience and credits to both players."""
+        apply_match_result(str(uuid.uuid4()), self.alice.id, self.bob.id, self.alice.id)
+
+        alice = UserProfile.objects.get(user=self.alice)
+        bob = UserProfile.objects.get(user=self.bob)
+        self.assertEqual((alice.experience, alice.credits), (50, 25))
+        self.assertEqual((bob.experience, bob.credits), (10, 0))
+
+    def test_profile_is_cached_and_invalidated(self):
+        """Test that profile hits need no queries and a counter change drops the cached copy."""
+        profile = get_profile(self.alice.id)
+        self.assertEqual(profile['level'], 1)
+        self.assertEqual(profile['pvp_stats']['wins'], 0)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_profile(self.alice.id), profile)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_match_result(str(uuid.uuid4()), self.alice.id, self.bob.id, self.alice.id)
+        self.assertIsNone(cache.get(profile_cache_key(self.alice.id)))
+        profile = get_profile(self.alice.id)
+        self.assertEqual(profile['experience'], 50)
+        self.assertEqual(profile['pvp_stats']['wins'], 1)
+
+    def test_reconcile_fixes_drift(self):
+        """Test that reconciliation recounts counters and backfills missed completions."""
+        persist_events(self.submission_events('m1', passed=True))
+        apply_match_result(str(uuid.uuid4()), self.alice.id, self.bob.id, None)
+        CompletedMission.objects.all().delete()
+        UserProfile.objects.filter(user=self.alice).update(completed_missions=7, experience=0)
+        PlayerRating.objects.filter(user=self.bob).update(draws=0, losses=3)
+
+        self.assertEqual(reconcile_profiles(), 2)
+
+        alice = UserProfile.objects.get(user=self.alice)
+        self.assertEqual((alice.completed_missions, alice.experience), (1, 125))
+        self.assertEqual(CompletedMission.objects.get().mission_id, 'm1')
+        bob = PlayerRating.objects.get(user=self.bob)
+        self.assertEqual((bob.wins, bob.losses, bob.draws), (0, 0, 1))
+        self.assertEqual(Match.objects.count(), 1)
+        self.assertEqual(reconcile_profiles(), 0)
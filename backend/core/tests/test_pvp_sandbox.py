@@ -0,0 +1,133 @@
+import pytest
+from unittest.mock import Mock, patch
+from ..pvp_sandbox import (
+    cpuset_load_key, prewarm_match, release_match, reservation_key, warm_container
+)
+from ..sandbox import SandboxError, SandboxManager
+from ..tasks import prewarm_match_sandboxes_task, run_code_task
+
+MATCH_ID = 'c6a2b1f4-1e7a-4a65-9d3b-2f0e9c3d4a51'
+
+PVP_SANDBOX = {
+    'languages': ['python', 'javascript'],
+    'cpusets': ['0-1', '2-3'],
+    'idle_timeout': 3600,
+}
+
+@pytest.fixture
+def pvp_sandbox_config(settings):
+    settings.PVP_SANDBOX = PVP_SANDBOX
+
+@pytest.fixture
+def mock_redis():
+    with patch('core.pvp_sandbox.get_redis') as mock:
+        client = mock.return_value
+        client.register_script.return_value.return_value = 2
+        yield client
+
+@pytest.fixture
+def sandbox():
+    sandbox = Mock(spec=SandboxManager)
+    sandbox.daemon_id.return_value = 'daemon-1'
+    sandbox.start_warm_container.side_effect = lambda **kwargs: (
+        f"{kwargs['labels']['kodewar.player']}-{kwargs['image']}"
+    )
+    return sandbox
+
+@pytest.mark.usefixtures('pvp_sandbox_config')
+class TestPrewarm:
+    def test_both_players_share_host_and_cpuset(self, mock_redis, sandbox):
+        """Test that every container of a match is pinned to the cpuset picked for it."""
+        with patch('core.pvp_sandbox.time.time', return_value=1000.0):
+            assert prewarm_match(MATCH_ID, ['1', '2'], sandbox)
+
+        script = mock_redis.register_script.return_value
+        script.assert_called_once_with(
+            keys=[cpuset_load_key('daemon-1', '0-1'), cpuset_load_key('daemon-1', '2-3')],
+            args=[1000.0, 4600.0, MATCH_ID]
+        )
+        calls = sandbox.start_warm_container.call_args_list
+        assert len(calls) == 4
+        assert {c.kwargs['cpuset'] for c in calls} == {'2-3'}
+        mapping = mock_redis.pipeline.return_value.hset.call_args.kwargs['mapping']
+        assert mapping['1:python'] == '1-kodewar-sandbox-python'
+        assert mapping['2:javascript'] == '2-kodewar-sandbox-javascript'
+        assert mapping['daemon'] == 'daemon-1'
+        assert mapping['cpuset'] == '2-3'
+
+    def test_failed_prewarm_runs_cold(self, mock_redis, sandbox):
+        """Test that a failed start removes the started containers and frees the cpuset."""
+        sandbox.start_warm_container.side_effect = ['c1', SandboxError('no image')]
+
+        assert not prewarm_match(MATCH_ID, ['1', '2'], sandbox)
+
+        sandbox.cleanup.assert_called_once_with('c1')
+        mock_redis.zrem.assert_called_once_with(cpuset_load_key('daemon-1', '2-3'), MATCH_ID)
+        mock_redis.pipeline.return_value.hset.assert_not_called()
+
+    def test_warm_container_needs_same_daemon(self, mock_redis, sandbox):
+        """Test that a worker on another Docker daemon does not use the reservation."""
+        pipe = mock_redis.pipeline.return_value
+        pipe.execute.return_value = [b'c1', b'daemon-1']
+        assert warm_container(MATCH_ID, '1', 'python', sandbox) == 'c1'
+
+        pipe.execute.return_value = [b'c1', b'daemon-2']
+        assert warm_container(MATCH_ID, '1', 'python', sandbox) is None
+
+    def test_release(self, mock_redis, sandbox):
+        """Test that releasing a match removes its containers and frees its cpuset once."""
+        pipe = mock_redis.pipeline.return_value
+        pipe.execute.return_value = [
+            {b'1:python': b'c1', b'2:python': b'c2', b'daemon': b'daemon-1', b'cpuset': b'0-1'}, 1
+        ]
+
+        release_match(MATCH_ID, sandbox)
+
+        pipe.delete.assert_called_once_with(reservation_key(MATCH_ID))
+        assert {c.args[0] for c in sandbox.cleanup.call_args_list} == {'c1', 'c2'}
+        mock_redis.zrem.assert_called_once_with(cpuset_load_key('daemon-1', '0-1'), MATCH_ID)
+
+        pipe.execute.return_value = [{}, 0]
+        sandbox.cleanup.reset_mock()
+        release_match(MATCH_ID, sandbox)
+        sandbox.cleanup.assert_not_called()
+
+    def test_task_prefetches_mission_bundle(self):
+        """Test that pre-warming also loads the test bundle of the match's mission."""
+        with patch('core.tasks.prewarm_match') as prewarm, \
+                patch('core.tasks.get_match_mission', return_value={'id': 'm1', 'version': 3}), \
+                patch('core.tasks.get_test_cases') as get_test_cases:
+            prewarm_match_sandboxes_task(MATCH_ID, ['1', '2'])
+
+        prewarm.assert_called_once_with(MATCH_ID, ['1', '2'])
+        get_test_cases.assert_called_once_with('m1', 3)
+
+class TestWarmExecution:
+    def test_match_submission_runs_in_warm_container(self):
+        """Test that a match submission executes in the warm container and leaves it running."""
+        with patch('core.tasks.SandboxManager') as manager, \
+                patch('core.tasks.warm_container', return_value='c1'), \
+                patch('core.tasks.store_submission_state'):
+            sandbox = manager.return_value
+            sandbox.exec_in_container.return_value = {'exit_code': 0, 'logs': 'ok', 'error': None}
+
+            run_code_task(
+                'print(1)', 'python', submission_id='s1', match_id=MATCH_ID, player_id='1'
+            )
+
+        sandbox.exec_in_container.assert_called_once()
+        assert sandbox.exec_in_container.call_args[0][0] == 'c1'
+        sandbox.create_container.assert_not_called()
+        sandbox.cleanup.assert_not_called()
+
+    def test_exec_timeout(self):
+        """Test that commands are wrapped in a timeout, overruns reported and leftovers killed."""
+        with patch('docker.from_env') as from_env:
+            container = from_env.return_value.containers.get.return_value
+            container.exec_run.return_value = (124, b'')
+
+            result = SandboxManager().exec_in_container('c1', 'python -c 1', timeout=5)
+
+        commands = [c.args[0] for c in container.exec_run.call_args_list]
+        assert commands == [['timeout', '5', 'sh', '-c', 'python -c 1'], ['sh', '-c', 'kill -9 -1']]
+        assert result['error'] == 'Execution timed out'
@@ -0,0 +1,144 @@
+import uuid
+import pytest
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+from ..db_router import use_primary
+from ..leaderboard import (
+    JOURNAL_KEY, LEADERBOARD_KEY, REBUILDING_KEY, REBUILD_KEY, SWAP_SCRIPT, UPDATE_SCRIPT, around,
+    rebuild_leaderboard, top, update_ratings
+)
+from ..models import Match, PlayerRating
+from ..rating import apply_match_result, expected_score, rating_changes
+from ..views import LeaderboardAroundView
+
+RATING = {'initial': 1200, 'k_factor': 32, 'leaderboard_max_limit': 100}
+
+@override_settings(RATING=RATING)
+class EloTest(TestCase):
+    def test_expected_score(self):
+        """Test the Elo expectation for equal and unequal ratings."""
+        self.assertAlmostEqual(expected_score(1500, 1500), 0.5)
+        self.assertAlmostEqual(expected_score(1600, 1200), 1 / (1 + 10 ** -1))
+
+    def test_rating_changes(self):
+        """Test that changes are zero-sum and an upset moves ratings more."""
+        change_a, change_b = rating_changes(1500, 1500, 1)
+        self.assertAlmostEqual(change_a, 16)
+        self.assertAlmostEqual(change_a + change_b, 0)
+        upset, _ = rating_changes(1200, 1600, 1)
+        expected_win, _ = rating_changes(1600, 1200, 1)
+        self.assertGreater(upset, expected_win)
+        self.assertAlmostEqual(rating_changes(1500, 1500, 0.5)[0], 0)
+
+@pytest.mark.usefixtures('locmem_cache')
+@override_settings(RATING=RATING)
+class ApplyMatchResultTest(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.alice = User.objects.create_user('alice', password='secret')
+        self.bob = User.objects.create_user('bob', password='secret')
+        patcher = patch('core.rating.update_ratings')
+        self.update_ratings = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_win_updates_both_players(self):
+        """Test that a win moves both ratings and records the match once committed."""
+        match_id = str(uuid.uuid4())
+        with self.captureOnCommitCallbacks(execute=True):
+            match = apply_match_result(match_id, self.alice.id, self.bob.id, self.alice.id)
+
+        alice, bob = PlayerRating.objects.get(user=self.alice), PlayerRating.objects.get(user=self.bob)
+        self.assertAlmostEqual(alice.rating, 1216)
+        self.assertAlmostEqual(bob.rating, 1184)
+        self.assertEqual((alice.wins, bob.losses), (1, 1))
+        self.assertAlmostEqual(match.rating_change_b, -16)
+        self.update_ratings.assert_called_once_with({self.alice.id: 1216, self.bob.id: 1184})
+
+    def test_idempotent(self):
+        """Test that applying a match twice changes ratings once."""
+        match_id = str(uuid.uuid4())
+        apply_match_result(match_id, self.alice.id, self.bob.id, None)
+        apply_match_result(match_id, self.alice.id, self.bob.id, None)
+
+        self.assertEqual(Match.objects.count(), 1)
+        self.assertEqual(PlayerRating.objects.get(user=self.alice).draws, 1)
+
+    def test_rebuild_leaderboard(self):
+        """Test that the leaderboard is rebuilt from the primary and swapped in with the journal."""
+        PlayerRating.objects.create(user=self.alice, rating=1300)
+        PlayerRating.objects.create(user=self.bob, rating=1100)
+
+        with patch('core.leaderboard.get_redis') as get_redis, \
+                patch('core.leaderboard.use_primary', wraps=use_primary) as primary:
+            count = rebuild_leaderboard()
+
+        client = get_redis.return_value
+        self.assertEqual(count, 2)
+        primary.assert_called_once()
+        pipe = client.pipeline.return_value
+        pipe.delete.assert_called_once_with(REBUILD_KEY, JOURNAL_KEY)
+        pipe.set.assert_called_once_with(REBUILDING_KEY, 1, ex=3600)
+        client.zadd.assert_called_once_with(
+            REBUILD_KEY, {str(self.alice.id): 1300, str(self.bob.id): 1100}
+        )
+        client.register_script.assert_called_once_with(SWAP_SCRIPT)
+        client.register_script.return_value.assert_called_once_with(
+            keys=[REBUILD_KEY, LEADERBOARD_KEY, JOURNAL_KEY, REBUILDING_KEY]
+        )
+
+    def test_updates_journaled(self):
+        """Test that rating updates go through the script that journals them during a rebuild."""
+        with patch('core.leaderboard.get_redis') as get_redis:
+            update_ratings({7: 1216.0, 8: 1184.0})
+
+        client = get_redis.return_value
+        client.register_script.assert_called_once_with(UPDATE_SCRIPT)
+        client.register_script.return_value.assert_called_once_with(
+            keys=[LEADERBOARD_KEY, JOURNAL_KEY, REBUILDING_KEY], args=[1216.0, '7', 1184.0, '8']
+        )
+
+@override_settings(RATING=RATING)
+class LeaderboardTest(TestCase):
+    def setUp(self):
+        patcher = patch('core.leaderboard.get_redis')
+        self.redis = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+    def test_top(self):
+        """Test that ranks are numbered from one."""
+        self.redis.zrevrange.return_value = [(b'3', 1500.0), (b'9', 1400.0)]
+        self.assertEqual(top(2), [
+            {'rank': 1, 'user_id': 3, 'rating': 1500.0},
+            {'rank': 2, 'user_id': 9, 'rating': 1400.0},
+        ])
+
+    def test_around(self):
+        """Test the window around a player near the top."""
+        self.redis.zrevrank.return_value = 1
+        self.redis.zrevrange.return_value = [(b'3', 1500.0), (b'9', 1400.0), (b'4', 1300.0)]
+
+        rank, entries = around(9, 2)
+
+        self.assertEqual(rank, 2)
+        self.redis.zrevrange.assert_called_once_with(LEADERBOARD_KEY, 0, 3, withscores=True)
+        self.assertEqual([e['rank'] for e in entries], [1, 2, 3])
+
+        self.redis.zrevrank.return_value = None
+        self.assertIsNone(around(5, 2))
+
+    def test_around_view(self):
+        """Test that the view adds usernames and the user's own rating."""
+        user = get_user_model().objects.create_user('carol', password='secret')
+        self.redis.zrevrank.return_value = 0
+        self.redis.zrevrange.return_value = [(str(user.id).encode(), 1500.0)]
+        request = APIRequestFactory().get('/api/leaderboard/me/', {'radius': 3})
+        force_authenticate(request, user=user)
+
+        response = LeaderboardAroundView.as_view()(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['rank'], 1)
+        self.assertEqual(response.data['rating'], 1500.0)
+        self.assertEqual(response.data['entries'][0]['username'], 'carol')
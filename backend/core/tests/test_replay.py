@@ -0,0 +1,149 @@
+import asyncio
+import uuid
+import pytest
+from unittest.mock import Mock, patch
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIRequestFactory, force_authenticate
+from ..consumers import FRAME_HEADER, SpectatorConsumer
+from ..models import Match
+from ..replay import (
+    FINISH, MAGIC, READY, START, VERDICT, VERSION, append, clock_key, decode, decode_varint,
+    encode_varint, log_key, spectator_group, start_log
+)
+from ..views import MatchReplayView
+
+MATCH_ID = 'c6a2b1f4-1e7a-4a65-9d3b-2f0e9c3d4a51'
+
+def record(delta_ms, kind, *values):
+    """Encode a record as the append script does."""
+    return encode_varint(delta_ms) + encode_varint(kind) + b''.join(encode_varint(v) for v in values)
+
+def sample_log():
+    return (
+        MAGIC + bytes([VERSION]) + encode_varint(1_700_000_000_000)
+        + record(1500, READY, 7) + record(0, START) + record(61_250, VERDICT, 7, 3, 5)
+        + record(300, FINISH, 7, 1)
+    )
+
+@pytest.fixture
+def patched_module():
+    return 'core.replay'
+
+class TestReplayLog:
+    def test_varint_round_trip(self):
+        """Test that varints take one byte below 128 and decode back to their value."""
+        assert encode_varint(0) == b'\x00'
+        assert encode_varint(127) == b'\x7f'
+        assert encode_varint(300) == b'\xac\x02'
+        for value in (0, 1, 127, 128, 16_383, 16_384, 1_700_000_000_000):
+            assert decode_varint(encode_varint(value), 0) == (value, len(encode_varint(value)))
+
+    def test_decode(self):
+        """Test that delta-encoded records decode to absolute times."""
+        log = decode(sample_log())
+
+        assert log['created_at'] == 1_700_000_000.0
+        assert log['events'] == [
+            {'type': 'ready', 'at': 1_700_000_001.5, 'player': 7},
+            {'type': 'start', 'at': 1_700_000_001.5},
+            {'type': 'verdict', 'at': 1_700_000_062.75, 'player': 7, 'passed': 3, 'total': 5},
+            {'type': 'finish', 'at': 1_700_000_063.05, 'player': 7, 'won': 1},
+        ]
+
+    def test_records_are_compact(self):
+        """Test that a verdict record fits in a handful of bytes."""
+        assert len(record(61_250, VERDICT, 12_345, 3, 5)) <= 8
+
+    def test_start_log(self):
+        """Test that a match's log starts with the header and the clock at creation."""
+        pipe = Mock()
+
+        start_log(pipe, MATCH_ID, 1_700_000_000.0, 3600)
+
+        pipe.set.assert_any_call(
+            log_key(MATCH_ID), MAGIC + bytes([VERSION]) + encode_varint(1_700_000_000_000), ex=3600
+        )
+        pipe.set.assert_any_call(clock_key(MATCH_ID), 1_700_000_000_000, ex=3600)
+
+    def test_append_sends_chunk(self, mock_redis, mock_layer):
+        """Test that an appended record is sent to the spectators with its offset."""
+        mock_redis.register_script.return_value.return_value = [20, b'\x05\x04\x07\x03\x05']
+
+        assert append(MATCH_ID, VERDICT, 7, 3, 5, now=1_700_000_000.0) == 20
+
+        script = mock_redis.register_script.return_value
+        assert script.call_args.kwargs['args'] == [1_700_000_000_000, b'\x04\x07\x03\x05']
+        mock_layer.group_send.assert_called_once_with(
+            spectator_group(MATCH_ID),
+            {'type': 'replay.chunk', 'offset': 20, 'data': b'\x05\x04\x07\x03\x05'}
+        )
+
+    def test_append_without_log(self, mock_redis, mock_layer):
+        """Test that events of a match without a log are dropped."""
+        mock_redis.register_script.return_value.return_value = -1
+
+        assert append(MATCH_ID, READY, 7) is None
+        mock_layer.group_send.assert_not_called()
+
+    def test_append_checks_fields(self, mock_redis):
+        """Test that an event must carry exactly the fields of its kind."""
+        with pytest.raises(ValueError):
+            append(MATCH_ID, VERDICT, 7)
+
+@pytest.mark.usefixtures('memory_channel_layer')
+class TestSpectatorConsumer:
+    def test_catch_up_then_tail(self):
+        """Test that a spectator gets the snapshot and log so far, then live chunks."""
+        log = sample_log()
+        snapshot = {'seq': 4, 'status': 'completed', 'players': ['7', '8']}
+
+        async def scenario():
+            communicator = WebsocketCommunicator(
+                SpectatorConsumer.as_asgi(), f'/ws/pvp/match/{MATCH_ID}/spectate/'
+            )
+            communicator.scope['url_route'] = {'kwargs': {'match_id': MATCH_ID}}
+            communicator.scope['user'] = Mock(is_authenticated=True, id=9)
+            connected, _ = await communicator.connect()
+            assert connected
+            assert await communicator.receive_json_from() == {
+                'type': 'snapshot', 'offset': len(log), 'match': snapshot
+            }
+            assert await communicator.receive_from() == FRAME_HEADER.pack(0) + log
+
+            from channels.layers import get_channel_layer
+            await get_channel_layer().group_send(
+                spectator_group(MATCH_ID),
+                {'type': 'replay.chunk', 'offset': len(log), 'data': b'\x01\x02'}
+            )
+            assert await communicator.receive_from() == FRAME_HEADER.pack(len(log)) + b'\x01\x02'
+            await communicator.disconnect()
+
+        with patch('core.consumers.get_spectator_view', return_value=(snapshot, log)):
+            asyncio.run(scenario())
+
+@pytest.mark.django_db
+class TestReplayApi:
+    def test_finalised_match_served_from_record(self):
+        """Test that the log of an expired match is served from the match record."""
+        User = get_user_model()
+        alice, bob = User.objects.create_user('alice'), User.objects.create_user('bob')
+        match_id = uuid.uuid4()
+        Match.objects.create(
+            id=match_id, player_a=alice, player_b=bob, rating_a=1200, rating_b=1200,
+            rating_change_a=0, rating_change_b=0, replay=sample_log()
+        )
+        factory = APIRequestFactory()
+
+        with patch('core.views.get_log', return_value=None):
+            request = factory.get(f'/api/pvp/matches/{match_id}/replay/')
+            force_authenticate(request, user=alice)
+            response = MatchReplayView.as_view()(request, match_id=match_id)
+
+            assert response.status_code == 200
+            assert response['Content-Type'] == 'application/octet-stream'
+            assert response.content == sample_log()
+
+            request = factory.get(f'/api/pvp/matches/{uuid.uuid4()}/replay/')
+            force_authenticate(request, user=alice)
+            assert MatchReplayView.as_view()(request, match_id=uuid.uuid4()).status_code == 404
@@ -0,0 +1,97 @@
+from datetime import timedelta
+from unittest.mock import Mock, patch
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from ..construction import (
+    UPGRADE_COMPLETE, BuildingError, complete_constructions, complete_upgrades, start_upgrade
+)
+from ..economy import create_base, current_resources
+from ..models import Building, ResourceBalance
+from ..scheduler import DUE_KEY, INFLIGHT_KEY, Scheduler
+
+CONFIG = {'batch_size': 3, 'lease': 60, 'idle_sleep': 0.5}
+
+class SchedulerTest(TestCase):
+    def scheduler(self, events, handlers):
+        client = Mock()
+        client.register_script.return_value = Mock(return_value=[e.encode() for e in events])
+        return Scheduler(handlers, client=client, config=CONFIG), client
+
+    def test_fire_batches_by_kind(self):
+        """Test that due events reach their handler as one batch per kind and are acknowledged."""
+        upgrades, constructions = Mock(), Mock()
+        scheduler, client = self.scheduler(
+            ['upgrade_complete:a', 'construction_complete:b', 'upgrade_complete:c'],
+            {'upgrade_complete': upgrades, 'construction_complete': constructions}
+        )
+
+        self.assertEqual(scheduler.fire(now=100), 3)
+
+        upgrades.assert_called_once_with(['a', 'c'], 100)
+        constructions.assert_called_once_with(['b'], 100)
+        script = client.register_script.return_value
+        script.assert_called_once_with(keys=[DUE_KEY, INFLIGHT_KEY], args=[100, 3, 60])
+        client.zrem.assert_any_call(INFLIGHT_KEY, 'upgrade_complete:a', 'upgrade_complete:c')
+
+    def test_failed_batch_stays_in_flight(self):
+        """Test that events of a failing handler are not acknowledged, so they are redelivered."""
+        scheduler, client = self.scheduler(
+            ['upgrade_complete:a'], {'upgrade_complete': Mock(side_effect=RuntimeError('db down'))}
+        )
+
+        scheduler.fire(now=100)
+
+        client.zrem.assert_not_called()
+
+class ConstructionTest(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        user = get_user_model().objects.create_user('alice', password='secret')
+        self.base = create_base(
+            user, 'Alpha', 10, 10, {'credits': 1000, 'minerals': 1000, 'energy': 1000}
+        )
+        ResourceBalance.objects.filter(base=self.base).update(checkpoint_at=self.now)
+        self.building = Building.objects.create(
+            base=self.base, type='resource_collector', x=0, y=0, health=500, max_health=500,
+            state='constructing', active_from=self.now
+        )
+
+    def credits(self, at):
+        return next(r['amount'] for r in current_resources(self.base, at) if r['type'] == 'credits')
+
+    def test_construction_completes(self):
+        """Test that a construction event activates only buildings that are finished."""
+        early = self.now - timedelta(seconds=1)
+        complete_constructions([str(self.building.id)], early.timestamp())
+        self.building.refresh_from_db()
+        self.assertEqual(self.building.state, 'constructing')
+
+        complete_constructions([str(self.building.id)], self.now.timestamp())
+        self.building.refresh_from_db()
+        self.assertEqual(self.building.state, 'active')
+
+    def test_upgrade_lifecycle(self):
+        """Test that an upgrade is paid, scheduled, switches rate on time and applies once."""
+        with patch('core.construction.schedule') as schedule, \
+                self.captureOnCommitCallbacks(execute=True):
+            building = start_upgrade(self.building, now=self.now)
+
+        completes_at = self.now + timedelta(seconds=180 * 1.3)
+        self.assertEqual(building.upgrade_completes_at, completes_at)
+        schedule.assert_called_once_with(UPGRADE_COMPLETE, str(building.id), completes_at)
+        self.assertAlmostEqual(
+            ResourceBalance.objects.get(resource='credits').amount, 1000 - 500 * 1.3
+        )
+        with self.assertRaises(BuildingError):
+            start_upgrade(building, now=self.now)
+
+        # The next level's rate applies from completion, before the event fires
+        later = completes_at + timedelta(minutes=1)
+        self.assertAlmostEqual(self.credits(later) - self.credits(completes_at), 13)
+
+        complete_upgrades([str(building.id)], later.timestamp())
+        complete_upgrades([str(building.id)], later.timestamp())
+        building.refresh_from_db()
+        self.assertEqual((building.level, building.state, building.max_health), (2, 'active', 650))
+        self.assertIsNone(building.upgrade_completes_at)
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import pytest
+import redis
+from unittest.mock import AsyncMock, patch
+from django.test import RequestFactory
+from ..status import (
+    StatusListener, store_submission_state, submission_channel, wait_for_change
+)
+from ..views import _parse_wait
+
+class TestStoreSubmissionState:
+    @pytest.fixture
+    def mock_cache(self):
+        with patch('core.status.cache') as mock:
+            yield mock
+
+    @pytest.fixture
+    def mock_pipeline(self):
+        with patch('core.status.get_redis') as mock:
+            yield mock.return_value.pipeline.return_value
+
+    def test_store_and_publish(self, mock_cache, mock_pipeline):
+        """Test that state is cached and a notification is published."""
+        store_submission_state('abc', {'status': 'success', 'output': 'ok'})
+
+        mock_cache.set.assert_called_once_with(
+            'submission_abc', {'status': 'success', 'output': 'ok'}, timeout=300
+        )
+        mock_pipeline.publish.assert_called_once_with(
+            submission_channel('abc'), json.dumps({'status': 'success'})
+        )
+        mock_pipeline.hincrby.assert_not_called()
+        mock_pipeline.execute.assert_called_once()
+
+    def test_batch_progress(self, mock_cache, mock_pipeline):
+        """Test that final states of batch members bump the batch counters."""
+        store_submission_state('abc', {'status': 'error'}, batch_id='b1')
+
+        mock_pipeline.hincrby.assert_any_call('rejudge:b1', 'completed', 1)
+        mock_pipeline.hincrby.assert_any_call('rejudge:b1', 'failed', 1)
+
+    def test_publish_failure_is_not_fatal(self, mock_cache, mock_pipeline):
+        """Test that a Redis outage does not fail the worker."""
+        mock_pipeline.execute.side_effect = redis.ConnectionError('down')
+
+        store_submission_state('abc', {'status': 'error'})
+
+        mock_cache.set.assert_called_once()
+
+class TestWaitForChange:
+    @pytest.fixture
+    def listener(self):
+        listener = StatusListener('redis://localhost:6379/0')
+        listener._ensure_started = AsyncMock()
+        with patch('core.status.get_status_listener', return_value=listener):
+            yield listener
+
+    def test_not_pending_returns_immediately(self, listener):
+        """Test that nothing is awaited when the state is already final."""
+        is_pending = AsyncMock(return_value=False)
+
+        assert asyncio.run(wait_for_change('channel', 10, is_pending)) is True
+        assert listener._waiters == {}
+
+    def test_timeout(self, listener):
+        """Test that the wait gives up after the timeout."""
+        is_pending = AsyncMock(return_value=True)
+
+        assert asyncio.run(wait_for_change('channel', 0.01, is_pending)) is False
+        assert listener._waiters == {}
+
+    def test_notification_wakes_waiter(self, listener):
+        """Test that a published notification ends the wait."""
+        async def scenario():
+            waiter = asyncio.ensure_future(
+                wait_for_change('channel', 10, AsyncMock(return_value=True))
+            )
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            listener._wake('channel')
+            return await waiter
+
+        assert asyncio.run(scenario()) is True
+        assert listener._waiters == {}
+
+    def test_wake_only_matching_channel(self, listener):
+        """Test that notifications are delivered per channel."""
+        async def scenario():
+            first = await listener.register('a')
+            second = await listener.register('b')
+            listener._wake('a')
+            return first.done(), second.done()
+
+        assert asyncio.run(scenario()) == (True, False)
+
+class TestParseWait:
+    def test_wait_must_be_finite(self, settings):
+        """Test that the wait is capped and that negative or non-finite waits are rejected."""
+        settings.STATUS_LONG_POLL = {**settings.STATUS_LONG_POLL, 'max_wait': 30}
+        factory = RequestFactory()
+
+        assert _parse_wait(factory.get('/', {'wait': '100'})) == (30, None)
+        for wait in ('-1', 'soon', 'nan', 'inf', '-inf'):
+            _, error = _parse_wait(factory.get('/', {'wait': wait}))
+            assert error.status_code == 400
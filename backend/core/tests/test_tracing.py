@@ -0,0 +1,116 @@
+import json
+import pytest
+from unittest.mock import Mock, patch
+from ..tracing import (
+    CONSUMER, STATUS_ERROR, SpanContext, end_task_span, extract, flush, inject,
+    inject_task_headers, span, start_task_span
+)
+
+TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+
+@pytest.fixture
+def tracing_config(settings, tmp_path):
+    settings.TRACING = {
+        'enabled': True,
+        'sample_rate': 1.0,
+        'slow_threshold': 60.0,
+        'exporter': 'none',
+        'file_path': str(tmp_path / 'traces.jsonl'),
+        'otlp_endpoint': 'http://localhost:4318/v1/traces',
+        'service_name': 'kodewar-test',
+        'export_queue_size': 10,
+    }
+    return settings.TRACING
+
+@pytest.fixture
+def exported():
+    segments = []
+    with patch('core.tracing._enqueue', side_effect=segments.append):
+        yield segments
+
+@pytest.mark.usefixtures('tracing_config')
+class TestTracing:
+    def test_traceparent_round_trip(self):
+        """Test that the current span is injected and extracted in W3C format."""
+        headers = {}
+        with span('submit') as root:
+            inject(headers)
+
+        assert headers['traceparent'] == f'00-{root.trace_id}-{root.span_id}-01'
+        assert extract(headers['traceparent']) == SpanContext(root.trace_id, root.span_id, True)
+        assert extract(f'00-{TRACE_ID}-00f067aa0ba902b7-00').sampled is False
+        assert extract('00-xyz') is None
+        assert extract(f'00-{"0" * 32}-00f067aa0ba902b7-01') is None
+
+    def test_children_exported_with_root(self, exported):
+        """Test that nested spans join their root's trace and are exported together."""
+        with span('submit') as root:
+            with span('sandbox.run_container') as child:
+                pass
+
+        assert len(exported) == 1
+        assert [s.name for s in exported[0]] == ['sandbox.run_container', 'submit']
+        assert child.trace_id == root.trace_id
+        assert child.parent_id == root.span_id
+
+    def test_head_sampling_and_slow_traces(self, tracing_config, exported):
+        """Test that unsampled traces are dropped unless slower than the threshold."""
+        tracing_config['sample_rate'] = 0.0
+        with span('fast'):
+            pass
+        assert exported == []
+
+        tracing_config['slow_threshold'] = 0.0
+        with span('slow') as slow:
+            pass
+        assert exported == [[slow]]
+        assert slow.attributes['kodewar.kept'] == 'slow'
+
+    def test_errors_recorded(self, exported):
+        """Test that an exception leaving a span marks it as failed."""
+        with pytest.raises(ValueError):
+            with span('grade'):
+                raise ValueError('bad output')
+
+        assert exported[0][0].status == (STATUS_ERROR, 'ValueError: bad output')
+
+    def test_propagated_through_task_headers(self, exported):
+        """Test that a task's span continues the trace of the span that published it."""
+        headers = {}
+        with span('submit') as root:
+            inject_task_headers(headers=headers)
+
+        task = Mock()
+        task.name = 'core.tasks.run_code_task'
+        task.request.traceparent = headers['traceparent']
+        task.request.delivery_info = {'routing_key': 'code_execution'}
+        task.request.retries = 0
+        start_task_span(task_id='t1', task=task)
+        with span('sandbox.create_container'):
+            pass
+        end_task_span(task_id='t1', state='FAILURE')
+
+        task_span = exported[-1][-1]
+        assert task_span.kind == CONSUMER
+        assert (task_span.trace_id, task_span.parent_id) == (root.trace_id, root.span_id)
+        assert task_span.status[0] == STATUS_ERROR
+        assert exported[-1][0].parent_id == task_span.span_id
+
+    def test_file_exporter(self, tracing_config, tmp_path):
+        """Test that kept spans are written as one OTLP/JSON document per line."""
+        tracing_config['exporter'] = 'file'
+        with span('earlier'):
+            pass
+        # A new configuration replaces the exporter of the earlier one
+        tracing_config['file_path'] = str(tmp_path / 'other.jsonl')
+        with span('submit', {'submission.language': 'python', 'tests': 3}):
+            pass
+        flush()
+
+        with open(tracing_config['file_path']) as f:
+            document = json.loads(f.readline())
+        resource_spans = document['resourceSpans'][0]
+        assert resource_spans['resource']['attributes'][0]['value'] == {'stringValue': 'kodewar-test'}
+        exported_span = resource_spans['scopeSpans'][0]['spans'][0]
+        assert exported_span['name'] == 'submit'
+        assert {'key': 'tests', 'value': {'intValue': '3'}} in exported_span['attributes']
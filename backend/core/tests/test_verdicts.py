@@ -0,0 +1,110 @@
+import pytest
+from unittest.mock import patch
+from ..verdicts import code_hash, verdict_keys, merge_verdicts
+from ..verdicts import test_case_hash as case_hash
+from ..tasks import run_code_task, process_result_task
+
+TEST_CASES = [
+    {'input': '1', 'expected': '2'},
+    {'input': '2', 'expected': '4'},
+    {'input': '3', 'expected': '6'},
+]
+
+class TestVerdictKeys:
+    def test_hashes(self):
+        """Test that keys depend on code, language, test case and image."""
+        assert code_hash('x', 'python') != code_hash('x', 'javascript')
+        assert case_hash({'expected': '2', 'input': '1'}) == case_hash(TEST_CASES[0])
+        assert case_hash(TEST_CASES[0]) != case_hash(TEST_CASES[1])
+
+        keys = verdict_keys('x', 'python', TEST_CASES, 'sha256:a')
+        assert len(set(keys)) == 3
+        assert keys != verdict_keys('x', 'python', TEST_CASES, 'sha256:b')
+        assert keys[1:] == verdict_keys('x', 'python', TEST_CASES[1:], 'sha256:a')
+
+    def test_merge(self):
+        """Test that cached and fresh results are merged in test case order."""
+        keys = ['a', 'b', 'c']
+        cached = {'b': {'passed': True, 'actual': 'cached'}}
+        fresh = [{'passed': False, 'actual': 'x'}, {'passed': True, 'actual': 'y'}]
+
+        results, new_verdicts = merge_verdicts(keys, cached, fresh)
+
+        assert [r['actual'] for r in results] == ['x', 'cached', 'y']
+        assert new_verdicts == {'a': fresh[0], 'c': fresh[1]}
+
+        results, new_verdicts = merge_verdicts(keys, {}, fresh)
+        assert [r['passed'] for r in results] == [False, True, False]
+        assert list(new_verdicts) == ['a', 'b']
+
+class TestIncrementalExecution:
+    @pytest.fixture
+    def mock_sandbox(self):
+        with patch('core.tasks.SandboxManager') as mock:
+            instance = mock.return_value
+            instance.image_digest.return_value = 'sha256:test'
+            instance.create_container.return_value = {'container_id': 'test-container'}
+            instance.run_container.return_value = {'exit_code': 0, 'logs': '6', 'error': None}
+            yield instance
+
+    @pytest.fixture(autouse=True)
+    def no_digest_memo(self):
+        with patch('core.verdicts._image_digests', {}):
+            yield
+
+    @pytest.fixture
+    def mock_process(self):
+        with patch('core.tasks.process_result_task') as mock:
+            yield mock.delay
+
+    def test_partly_cached_runs_everything(self, mock_sandbox, mock_process):
+        """Test that one missing verdict runs and grades every case, as the output covers all."""
+        keys = verdict_keys('code', 'python', TEST_CASES, 'sha256:test')
+        cached = {keys[0]: {'passed': True}, keys[1]: {'passed': True}}
+
+        with patch('core.tasks.get_cached_verdicts', return_value=cached), \
+                patch('core.tasks.prepare_execution_command', return_value='cmd') as prepare:
+            run_code_task('code', 'python', TEST_CASES, submission_id='s1')
+
+        prepare.assert_called_once_with('code', 'python', TEST_CASES)
+        mock_sandbox.run_container.assert_called_once()
+        kwargs = mock_process.call_args[1]
+        assert kwargs['test_cases'] == TEST_CASES
+        assert kwargs['case_keys'] == keys
+        assert kwargs['cached_verdicts'] == {}
+
+    def test_fully_cached_skips_sandbox(self, mock_sandbox, mock_process):
+        """Test that no container is started when every verdict is cached."""
+        keys = verdict_keys('code', 'python', TEST_CASES, 'sha256:test')
+
+        with patch('core.tasks.get_cached_verdicts', return_value={k: {'passed': True} for k in keys}):
+            run_code_task('code', 'python', TEST_CASES, submission_id='s1')
+
+        mock_sandbox.create_container.assert_not_called()
+        assert mock_process.call_args[1]['test_cases'] == []
+
+    def test_unknown_digest_runs_everything(self, mock_sandbox, mock_process):
+        """Test that verdict caching is skipped when the image cannot be resolved."""
+        mock_sandbox.image_digest.side_effect = Exception('no image')
+
+        with patch('core.tasks.get_cached_verdicts') as get_cached:
+            run_code_task('code', 'python', TEST_CASES, submission_id='s1')
+
+        get_cached.assert_not_called()
+        assert mock_process.call_args[1]['test_cases'] == TEST_CASES
+        assert mock_process.call_args[1]['case_keys'] == []
+
+    def test_process_result_stores_new_verdicts(self):
+        """Test that fresh results are cached and merged with cached verdicts."""
+        keys = ['k1', 'k2', 'k3']
+        cached = {'k1': {'passed': True, 'actual': '2'}, 'k2': {'passed': True, 'actual': '4'}}
+
+        with patch('core.tasks.store_verdicts') as store, \
+                patch('core.tasks.store_submission_state') as store_state:
+            process_result_task('s1', [TEST_CASES[2]], '6', case_keys=keys, cached_verdicts=cached)
+
+        new_verdicts = store.call_args[0][0]
+        assert list(new_verdicts) == ['k3']
+        assert new_verdicts['k3']['passed'] is True
+        state = store_state.call_args[0][1]
+        assert [r['actual'] for r in state['test_results']] == ['2', '4', '6']
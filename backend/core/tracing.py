@@ -0,0 +1,331 @@
+"""
+Distributed tracing of submissions, from the API through Celery into the sandbox.
+
+A trace starts in the submission view. Its context is propagated in the
+W3C ``traceparent`` format (``00-{trace id}-{span id}-{flags}``) in the
+headers of every task published inside a span, and each task runs in a
+span continuing the trace of its publisher. Sandbox calls and grading are
+spans of their own, so a slow verdict shows where its time went.
+
+Whether a trace is kept is decided twice:
+
+- head sampling: a new trace is sampled with ``TRACING['sample_rate']``
+  and the decision travels in the ``traceparent`` flags;
+- slow traces: spans are recorded either way and buffered per process
+  segment (the spans under one local root, such as a task). A segment
+  slower than ``TRACING['slow_threshold']`` seconds is kept even when its
+  trace was not sampled.
+
+Kept segments are encoded as OTLP/JSON and handed to a background thread
+that writes them with the configured exporter: ``file`` appends one OTLP
+document per line (the format the OpenTelemetry Collector's file receiver
+reads), ``otlp`` posts them to a collector's OTLP/HTTP endpoint. The
+default exporter, ``none``, drops them.
+"""
+import json
+import logging
+import os
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import requests
+from celery.signals import before_task_publish, task_postrun, task_prerun
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT = 'traceparent'
+TRACEPARENT_PATTERN = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+# OTLP span kinds and status codes
+INTERNAL, SERVER, CONSUMER = 1, 2, 5
+STATUS_OK, STATUS_ERROR = 1, 2
+
+
+class SpanContext(NamedTuple):
+    trace_id: str
+    span_id: Optional[str]
+    sampled: bool
+
+
+class Span:
+    def __init__(self, name: str, parent: SpanContext, kind: int,
+                 attributes: Optional[Dict[str, Any]], segment: List['Span']):
+        self.name = name
+        self.trace_id = parent.trace_id
+        self.parent_id = parent.span_id
+        self.span_id = secrets.token_hex(8)
+        self.sampled = parent.sampled
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.status = (STATUS_OK, '')
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        # Spans of this process under the same local root, in finishing order
+        self.segment = segment
+
+    @property
+    def context(self) -> SpanContext:
+        return SpanContext(self.trace_id, self.span_id, self.sampled)
+
+    @property
+    def duration(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_error(self, message: str):
+        self.status = (STATUS_ERROR, message)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            'status': {'code': self.status[0], 'message': self.status[1]},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+
+_current: ContextVar[Optional[Span]] = ContextVar('kodewar_span', default=None)
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        encoded = {'boolValue': value}
+    elif isinstance(value, int):
+        encoded = {'intValue': str(value)}
+    elif isinstance(value, float):
+        encoded = {'doubleValue': value}
+    else:
+        encoded = {'stringValue': str(value)}
+    return {'key': key, 'value': encoded}
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, attributes: Optional[Dict[str, Any]] = None, kind: int = INTERNAL,
+         parent: Optional[SpanContext] = None):
+    """
+    Run a block in a span.
+
+    The span is a child of the current span of this context, or of
+    ``parent`` (a remote context), or else the root of a new trace.
+    Yields None when tracing is disabled.
+    """
+    config = settings.TRACING
+    if not config['enabled']:
+        yield None
+        return
+    current = _current.get()
+    if parent is None and current is not None:
+        new = Span(name, current.context, kind, attributes, current.segment)
+    else:
+        if parent is None:
+            parent = SpanContext(secrets.token_hex(16), None, random.random() < config['sample_rate'])
+        new = Span(name, parent, kind, attributes, [])
+    token = _current.set(new)
+    try:
+        yield new
+    except Exception as e:
+        new.set_error(f'{type(e).__name__}: {str(e)}')
+        raise
+    finally:
+        _current.reset(token)
+        new.end_ns = time.time_ns()
+        new.segment.append(new)
+        if current is None or current.segment is not new.segment:
+            _finish_segment(new)
+
+
+def traced(name: str, kind: int = INTERNAL):
+    """Decorate a function to run in a span."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, kind=kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def inject(headers: Dict[str, Any]):
+    """Put the current span's context into ``headers``."""
+    current = _current.get()
+    if current is not None:
+        flags = '01' if current.sampled else '00'
+        headers[TRACEPARENT] = f'00-{current.trace_id}-{current.span_id}-{flags}'
+
+
+def extract(traceparent: Optional[str]) -> Optional[SpanContext]:
+    """Parse a ``traceparent`` value; None if absent or malformed."""
+    match = TRACEPARENT_PATTERN.match(traceparent or '')
+    if not match or set(match.group(1)) == {'0'} or set(match.group(2)) == {'0'}:
+        return None
+    trace_id, span_id, flags = match.groups()
+    return SpanContext(trace_id, span_id, bool(int(flags, 16) & 1))
+
+
+def _finish_segment(root: Span):
+    config = settings.TRACING
+    if root.sampled or root.duration >= config['slow_threshold']:
+        if not root.sampled:
+            root.set_attribute('kodewar.kept', 'slow')
+        _enqueue(root.segment)
+
+
+def encode(spans: List[Span]) -> bytes:
+    """Encode spans as an OTLP/JSON ``ExportTraceServiceRequest``."""
+    return json.dumps({
+        'resourceSpans': [{
+            'resource': {'attributes': [
+                _otlp_attribute('service.name', settings.TRACING['service_name'])
+            ]},
+            'scopeSpans': [{
+                'scope': {'name': __name__},
+                'spans': [span.to_otlp() for span in spans],
+            }],
+        }]
+    }, separators=(',', ':')).encode()
+
+
+class FileExporter:
+    """Append one OTLP/JSON document per line to a file."""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.path = config['file_path']
+
+    def export(self, payload: bytes):
+        with open(self.path, 'ab') as f:
+            f.write(payload + b'\n')
+
+
+class OTLPExporter:
+    """Post OTLP/JSON to a collector's OTLP/HTTP traces endpoint."""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.endpoint = config['otlp_endpoint']
+        self.session = requests.Session()
+
+    def export(self, payload: bytes):
+        response = self.session.post(
+            self.endpoint, data=payload, headers={'Content-Type': 'application/json'}, timeout=5
+        )
+        response.raise_for_status()
+
+
+EXPORTERS = {
+    'file': FileExporter,
+    'otlp': OTLPExporter,
+}
+
+_export: Dict[str, Any] = {'key': None, 'queue': None}
+_export_lock = threading.Lock()
+
+
+def _export_loop(pending: queue.Queue, exporter):
+    while True:
+        spans = pending.get()
+        if spans is None:
+            pending.task_done()
+            return
+        try:
+            exporter.export(encode(spans))
+        except Exception as e:
+            logger.warning(f"Failed to export {len(spans)} spans: {str(e)}")
+        finally:
+            pending.task_done()
+
+
+def _enqueue(spans: List[Span]):
+    """
+    Hand spans to this process's exporter thread.
+
+    The thread is started again after a fork, and replaced when the
+    exporter configuration changes; the replaced one finishes its queue.
+    """
+    config = settings.TRACING
+    if config['exporter'] == 'none':
+        return
+    key = (os.getpid(), config['exporter'], config['file_path'], config['otlp_endpoint'])
+    with _export_lock:
+        if _export['key'] != key:
+            if _export['key'] is not None and _export['key'][0] == key[0]:
+                _export['queue'].put(None)
+            pending: queue.Queue = queue.Queue(maxsize=config['export_queue_size'])
+            exporter = EXPORTERS[config['exporter']](config)
+            threading.Thread(
+                target=_export_loop, args=(pending, exporter), name='trace-exporter', daemon=True
+            ).start()
+            _export.update(key=key, queue=pending)
+    try:
+        _export['queue'].put_nowait(spans)
+    except queue.Full:
+        logger.warning(f"Trace export queue full, dropping {len(spans)} spans")
+
+
+def flush():
+    """Wait until every kept span of this process is exported."""
+    if _export['key'] is not None and _export['key'][0] == os.getpid():
+        _export['queue'].join()
+
+
+# Celery propagation: the publisher's span context rides in the task
+# headers, which workers expose as attributes of the task request
+_task_spans: Dict[str, Any] = {}
+
+
+def inject_task_headers(headers=None, **kwargs):
+    """``before_task_publish`` receiver."""
+    if headers is not None:
+        inject(headers)
+
+
+def start_task_span(task_id=None, task=None, **kwargs):
+    """``task_prerun`` receiver: run the task in a span continuing its publisher's trace."""
+    request = task.request
+    context = span(
+        f'celery {task.name}',
+        {
+            'celery.task_id': task_id,
+            'celery.queue': (request.delivery_info or {}).get('routing_key') or '',
+            'celery.retries': request.retries or 0,
+        },
+        kind=CONSUMER,
+        parent=extract(getattr(request, TRACEPARENT, None))
+    )
+    _task_spans[task_id] = (context, context.__enter__())
+
+
+def end_task_span(task_id=None, state=None, **kwargs):
+    """``task_postrun`` receiver."""
+    entry = _task_spans.pop(task_id, None)
+    if entry is None:
+        return
+    context, task_span = entry
+    if task_span is not None and state not in ('SUCCESS', None):
+        task_span.set_error(state)
+    context.__exit__(None, None, None)
+
+
+before_task_publish.connect(inject_task_headers)
+task_prerun.connect(start_task_span)
+task_postrun.connect(end_task_span)
@@ -1,10 +1,46 @@
 from django.urls import path
-from .views import CodeSubmissionView, TaskStatusView, hello_world, SubmissionStatusView
+from .views import (
+    CodeSubmissionView, BulkSubmissionView, BatchProgressView, BatchSubmissionStatusView,
+    SubmissionHistoryView, SubmissionCodeView,
+    MatchmakingQueueView, LobbyView, MatchReplayView,
+    LeaderboardView, LeaderboardAroundView, ProfileView, MissionListView, MissionDetailView,
+    BaseView, CollectResourcesView, UpgradeBuildingView,
+    BuildingsView, BuildingDetailView, BuildingNeighboursView,
+    hello_world, submission_status, task_status
+)
 
 urlpatterns = [
     path('hello/', hello_world, name='hello_world'),
     path('api/submit/', CodeSubmissionView.as_view(), name='code_submission'),
-    path('api/task/<str:task_id>/', TaskStatusView.as_view(), name='task_status'),
+    path('api/task/<str:task_id>/', task_status, name='task_status'),
     path('submit/', CodeSubmissionView.as_view(), name='code-submission'),
-    path('status/', SubmissionStatusView.as_view(), name='submission-status'),
-] 
\ No newline at end of file
+    path('submit/bulk/', BulkSubmissionView.as_view(), name='bulk-submission'),
+    path('batch/<str:batch_id>/', BatchProgressView.as_view(), name='batch-progress'),
+    path('status/', submission_status, name='submission-status'),
+    path('status/batch/', BatchSubmissionStatusView.as_view(), name='submission-status-batch'),
+    path('submissions/', SubmissionHistoryView.as_view(), name='submission-history'),
+    path('submissions/<uuid:submission_id>/code/', SubmissionCodeView.as_view(), name='submission-code'),
+    path('pvp/queue/', MatchmakingQueueView.as_view(), name='matchmaking-queue'),
+    path('pvp/lobby/', LobbyView.as_view(), name='pvp-lobby'),
+    path('pvp/matches/<uuid:match_id>/replay/', MatchReplayView.as_view(), name='match-replay'),
+    path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+    path('leaderboard/me/', LeaderboardAroundView.as_view(), name='leaderboard-around'),
+    path('profile/', ProfileView.as_view(), name='profile'),
+    path('missions/', MissionListView.as_view(), name='missions'),
+    path('missions/<str:mission_id>/', MissionDetailView.as_view(), name='mission-detail'),
+    path('base/', BaseView.as_view(), name='base'),
+    path('base/collect/', CollectResourcesView.as_view(), name='base-collect'),
+    path('base/buildings/', BuildingsView.as_view(), name='buildings'),
+    path(
+        'base/buildings/<uuid:building_id>/', BuildingDetailView.as_view(),
+        name='building-detail'
+    ),
+    path(
+        'base/buildings/<uuid:building_id>/neighbours/', BuildingNeighboursView.as_view(),
+        name='building-neighbours'
+    ),
+    path(
+        'base/buildings/<uuid:building_id>/upgrade/', UpgradeBuildingView.as_view(),
+        name='building-upgrade'
+    ),
+]
@@ -0,0 +1,101 @@
+"""
+Per-test-case verdict cache.
+
+A graded test result depends only on the submitted code, the test case
+and the sandbox image it ran in, so it is cached under a key built from
+the hashes of those three. A submission whose every test case has a
+cached verdict is not executed again. The execution command does not
+select test cases yet, so a single missing verdict runs the whole set.
+"""
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# image name -> (digest, time it was looked up)
+_image_digests: Dict[str, Tuple[str, float]] = {}
+
+
+def code_hash(code: str, language: str) -> str:
+    return hashlib.sha256(f'{language}\0{code}'.encode()).hexdigest()
+
+
+def test_case_hash(test_case: Dict[str, Any]) -> str:
+    canonical = json.dumps(
+        {'input': test_case['input'], 'expected': test_case['expected']},
+        sort_keys=True,
+        separators=(',', ':')
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def image_digest(sandbox, image: str) -> Optional[str]:
+    """
+    Return the digest of a sandbox image, memoised for a short while.
+
+    Returns:
+        The image ID, or None if it cannot be determined, in which case
+        verdicts are neither read from nor written to the cache
+    """
+    cached = _image_digests.get(image)
+    if cached and time.monotonic() - cached[1] < settings.VERDICT_CACHE['image_digest_ttl']:
+        return cached[0]
+    try:
+        digest = sandbox.image_digest(image)
+    except Exception as e:
+        logger.warning(f"Could not resolve digest of image {image}: {str(e)}")
+        return None
+    _image_digests[image] = (digest, time.monotonic())
+    return digest
+
+
+def verdict_keys(code: str, language: str, test_cases: List[Dict[str, Any]], digest: str) -> List[str]:
+    """Return the verdict cache key of each test case, in order."""
+    prefix = f'verdict_{code_hash(code, language)}_{digest}'
+    return [f'{prefix}_{test_case_hash(test_case)}' for test_case in test_cases]
+
+
+def get_cached_verdicts(keys: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Fetch the cached verdicts for the given keys in one round-trip."""
+    return cache.get_many(keys)
+
+
+def store_verdicts(verdicts: Dict[str, Dict[str, Any]]):
+    if verdicts:
+        cache.set_many(verdicts, timeout=settings.VERDICT_CACHE['timeout'])
+
+
+def merge_verdicts(keys: List[str], cached: Dict[str, Dict[str, Any]],
+                   fresh: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """
+    Merge cached verdicts with the results of the test cases that were executed.
+
+    Args:
+        keys: Verdict key of every test case, in order
+        cached: Cached verdicts by key
+        fresh: Results of the executed (uncached) test cases, in order
+
+    Returns:
+        Tuple of (results for every test case in order, new verdicts by key)
+    """
+    fresh_results = iter(fresh)
+    results = []
+    new_verdicts = {}
+    for key in keys:
+        if key in cached:
+            results.append(cached[key])
+            continue
+        result = next(fresh_results, None)
+        if result is None:
+            # Never cached: a missing result is not a verdict on the code
+            results.append({'input': None, 'expected': None, 'actual': '', 'passed': False})
+            continue
+        results.append(result)
+        new_verdicts[key] = result
+    return results, new_verdicts
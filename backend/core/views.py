@@ -1,23 +1,80 @@
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
-from .serializers import CodeSubmissionSerializer, SubmissionResponseSerializer, StatusResponseSerializer
-from .tasks import run_code_task
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from .serializers import (
+    CodeSubmissionSerializer, SubmissionResponseSerializer, StatusResponseSerializer,
+    BatchStatusRequestSerializer, BulkSubmissionSerializer, BatchResponseSerializer,
+    SubmissionHistorySerializer, SubmissionCodeSerializer,
+    MatchmakingRequestSerializer, MatchmakingStatusSerializer, LeaderboardSerializer, LobbySerializer,
+    ProfileSerializer, MissionSerializer,
+    PlayerBaseSerializer, CreateBaseSerializer, ResourceSerializer, BuildingSerializer,
+    PlaceBuildingSerializer, MoveBuildingSerializer
+)
+from .tasks import run_code_task, dispatch_batch_task
+from .bulk import create_batch, get_batch_progress
+from .persistence import append_event, created_event, load_submission_state
+from .history import InvalidCursor, get_history_page
+from .archive import load_archived_submission
+from .models import Match, Submission
+from .db_router import pin_if_recent_write, record_write
+from .matchmaking import join_queue, leave_queue, queue_status
+from .leaderboard import around, get_rating, get_ratings, top
+from .presence import counts, online_players, set_status
+from .match_state import record_submission
+from .replay import get_log
+from .profiles import get_profile
+from .missions import get_catalog, get_mission
+from .metrics import render as render_metrics
+from .tracing import SERVER, current_span, traced
+from .economy import InsufficientResources, checkpoint, create_base, current_resources
+from .construction import (
+    BuildingError, building_neighbours, move_building, place_building, remove_building,
+    start_upgrade
+)
+from .models import Building, PlayerBase
+from django.contrib.auth import get_user_model
+from .status import submission_channel, task_channel, wait_for_change
 from celery.result import AsyncResult
+from prometheus_client import CONTENT_TYPE_LATEST
 import uuid
+import hashlib
+import time
+import json
+import math
 from django.core.cache import cache
+from django.utils.http import parse_etags, quote_etag
 
 # Create your views here.
 
 def hello_world(request):
     return JsonResponse({"message": "Hello from Django!"})
 
+def metrics(request):
+    """Prometheus scrape endpoint (see core.metrics)."""
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE_LATEST)
+
+class ReadYourWritesMixin:
+    """
+    Read from the primary database for a short while after the user's own writes.
+    
+    Other reads of the view go to a replica (see core.db_router).
+    """
+    
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.user and request.user.is_authenticated:
+            pin_if_recent_write(request.user.id)
+
 class CodeSubmissionView(APIView):
     permission_classes = [IsAuthenticated]
     
+    @traced('POST /api/submit/', kind=SERVER)
     def post(self, request):
         """Handle code submission."""
         serializer = CodeSubmissionSerializer(data=request.data)
@@ -26,6 +83,30 @@ class CodeSubmissionView(APIView):
             
         # Generate submission ID
         submission_id = uuid.uuid4()
+        trace = current_span()
+        if trace:
+            trace.set_attribute('submission.id', str(submission_id))
+            trace.set_attribute('submission.language', serializer.validated_data['language'])
+        
+        # A mission submission is graded against the mission's catalog test
+        # cases, never against test cases of the client's choosing: the
+        # match's mission in a match, the requested one otherwise
+        match_id = serializer.validated_data.get('match_id')
+        if match_id:
+            mission = record_submission(str(match_id), str(request.user.id))
+            if mission is None:
+                return Response(
+                    {'error': 'Not a player of this match, or the match is not in progress'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+        else:
+            mission_id = serializer.validated_data['mission_id']
+            mission = get_mission(mission_id) if mission_id else None
+        # Only the version is queued; the worker holds the test cases
+        test_cases = [] if mission else serializer.validated_data.get('test_cases', [])
+        # Submissions graded against their own test cases complete no mission
+        mission_id = mission['id'] if mission else ''
+        mission_version = mission['version'] if mission else None
         
         # Store submission in cache
         cache.set(
@@ -37,12 +118,28 @@ class CodeSubmissionView(APIView):
             timeout=300  # 5 minutes
         )
         
+        # Record the submission; it reaches the database write-behind
+        append_event(created_event(
+            submission_id,
+            language=serializer.validated_data['language'],
+            code=serializer.validated_data['code'],
+            user_id=request.user.id,
+            mission_id=mission_id,
+            mission_version=mission_version
+        ))
+        record_write(request.user.id)
+        
         # Queue task
         run_code_task.delay(
             code=serializer.validated_data['code'],
             language=serializer.validated_data['language'],
-            test_cases=serializer.validated_data.get('test_cases', []),
-            submission_id=str(submission_id)
+            test_cases=test_cases,
+            submission_id=str(submission_id),
+            match_id=str(match_id) if match_id else None,
+            player_id=str(request.user.id),
+            mission_id=mission_id or None,
+            mission_version=mission_version,
+            submitted_at=time.time()
         )
         
         # Return response
@@ -52,7 +149,54 @@ class CodeSubmissionView(APIView):
         })
         return Response(response_serializer.data, status=status.HTTP_202_ACCEPTED)
 
-class SubmissionStatusView(APIView):
+class BulkSubmissionView(APIView):
+    """
+    API endpoint for queueing many submissions at once, e.g. a rejudge.
+    
+    The batch is dispatched in throttled chunks at low priority; its
+    progress is read from BatchProgressView.
+    """
+    permission_classes = [IsAdminUser]
+    
+    def post(self, request):
+        """Queue a bulk batch of submissions."""
+        serializer = BulkSubmissionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        data = serializer.validated_data
+        batch = create_batch(
+            data['submissions'],
+            priority=data.get('priority'),
+            chunk_size=data.get('chunk_size'),
+            interval=data.get('interval')
+        )
+        dispatch_batch_task.delay(batch['batch_id'])
+        
+        response_serializer = BatchResponseSerializer({
+            'batch_id': batch['batch_id'],
+            'total': len(batch['submission_ids']),
+            'submission_ids': batch['submission_ids']
+        })
+        return Response(response_serializer.data, status=status.HTTP_202_ACCEPTED)
+
+class BatchProgressView(APIView):
+    """
+    API endpoint for the aggregate progress of a bulk batch.
+    """
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request, batch_id):
+        """Get the progress counters of a batch."""
+        progress = get_batch_progress(batch_id)
+        if progress is None:
+            return Response(
+                {'error': 'Batch not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(progress, status=status.HTTP_200_OK)
+
+class SubmissionStatusView(ReadYourWritesMixin, APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
@@ -64,8 +208,10 @@ class SubmissionStatusView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
             
-        # Get submission from cache
+        # Get submission from cache, falling back to the stored history
         submission = cache.get(f'submission_{submission_id}')
+        if not submission:
+            submission = load_submission_state(submission_id)
         if not submission:
             return Response(
                 {'error': 'Submission not found'},
@@ -76,6 +222,465 @@ class SubmissionStatusView(APIView):
         response_serializer = StatusResponseSerializer(submission)
         return Response(response_serializer.data, status=status.HTTP_200_OK)
 
+class BatchSubmissionStatusView(APIView):
+    """
+    API endpoint for checking many submissions in one request.
+    
+    Ids are resolved with a single cache round-trip and the response
+    carries an ETag, so a client re-polling unchanged state gets an
+    empty 304.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        """Get statuses for the comma-separated ``ids`` query parameter."""
+        ids = [i for i in request.query_params.get('ids', '').split(',') if i]
+        return self._respond(request, {'submission_ids': ids})
+    
+    def post(self, request):
+        """Get statuses for the ``submission_ids`` in the request body."""
+        return self._respond(request, request.data)
+    
+    def _respond(self, request, data):
+        serializer = BatchStatusRequestSerializer(data=data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        # dict.fromkeys keeps the request order while dropping duplicates
+        submission_ids = list(dict.fromkeys(
+            str(submission_id) for submission_id in serializer.validated_data['submission_ids']
+        ))
+        found = cache.get_many([f'submission_{i}' for i in submission_ids])
+        statuses = {}
+        for submission_id in submission_ids:
+            submission = found.get(f'submission_{submission_id}')
+            statuses[submission_id] = submission['status'] if submission else None
+        
+        body = json.dumps({'statuses': statuses}, separators=(',', ':'), sort_keys=True)
+        etag = quote_etag(hashlib.md5(body.encode()).hexdigest())
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response({'statuses': statuses}, status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+class SubmissionHistoryView(ReadYourWritesMixin, APIView):
+    """
+    API endpoint for the requesting user's submission history.
+    
+    Keyset-paginated with an opaque cursor; rows omit the code, which is
+    fetched per submission from SubmissionCodeView.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        """Get one page of history, newest first."""
+        limit = request.query_params.get('limit')
+        try:
+            limit = int(limit) if limit is not None else None
+        except ValueError:
+            return Response(
+                {'error': 'limit must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if limit is not None and limit < 1:
+            return Response(
+                {'error': 'limit must be at least 1'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            page = get_history_page(
+                request.user.id,
+                cursor=request.query_params.get('cursor'),
+                limit=limit
+            )
+        except InvalidCursor:
+            return Response(
+                {'error': 'Invalid cursor'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(SubmissionHistorySerializer(page).data, status=status.HTTP_200_OK)
+
+class SubmissionCodeView(ReadYourWritesMixin, APIView):
+    """
+    API endpoint for the code of one of the requesting user's submissions.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, submission_id):
+        """Get the submitted code, from the database or the archive."""
+        submission = (
+            Submission.objects
+            .filter(id=submission_id, user_id=request.user.id)
+            .values('id', 'language', 'code')
+            .first()
+        )
+        if submission is None:
+            record = load_archived_submission(submission_id)
+            if record and record['user_id'] == request.user.id:
+                submission = record
+        if submission is None:
+            return Response(
+                {'error': 'Submission not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(SubmissionCodeSerializer(submission).data, status=status.HTTP_200_OK)
+
+class MatchmakingQueueView(APIView):
+    """
+    API endpoint for the PvP matchmaking queue of the requesting user.
+    
+    Players are paired in the background by the matchmaking loop; GET
+    reports the match once one is found.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def _shard(self, data):
+        serializer = MatchmakingRequestSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['shard']
+    
+    def get(self, request):
+        """Get the queue status."""
+        state = queue_status(str(request.user.id), self._shard(request.query_params))
+        return Response(MatchmakingStatusSerializer(state).data, status=status.HTTP_200_OK)
+    
+    def post(self, request):
+        """Join the queue."""
+        shard = self._shard(request.data)
+        join_queue(str(request.user.id), get_rating(request.user.id), shard)
+        set_status(request.user.id, 'in_queue')
+        state = queue_status(str(request.user.id), shard)
+        return Response(MatchmakingStatusSerializer(state).data, status=status.HTTP_202_ACCEPTED)
+    
+    def delete(self, request):
+        """Leave the queue."""
+        if not leave_queue(str(request.user.id), self._shard(request.query_params)):
+            return Response(
+                {'error': 'Not in queue'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        set_status(request.user.id, 'idle')
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class MatchReplayView(APIView):
+    """
+    API endpoint for the replay log of a PvP match (see ``core.replay``).
+    
+    Served from Redis while the match is live and from the match record
+    once it has been finalised.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, match_id):
+        """Get the binary event log of a match."""
+        log = get_log(str(match_id))
+        if log is None:
+            log = Match.objects.filter(id=match_id).values_list('replay', flat=True).first()
+        if not log:
+            return Response(
+                {'error': 'Match not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return HttpResponse(bytes(log), content_type='application/octet-stream')
+
+def _parse_int(value, default, maximum):
+    try:
+        return min(max(int(value), 1), maximum)
+    except (TypeError, ValueError):
+        return default
+
+def _with_usernames(entries):
+    usernames = dict(
+        get_user_model().objects
+        .filter(id__in=[entry['user_id'] for entry in entries])
+        .values_list('id', 'username')
+    )
+    return [{**entry, 'username': usernames.get(entry['user_id'])} for entry in entries]
+
+class LobbyView(APIView):
+    """
+    API endpoint for the PvP lobby: how many players are online and the
+    most recently active of them.
+    
+    Live status changes are pushed over the lobby socket (``ws/pvp/lobby/``).
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        """Get the online counts and up to ``limit`` online players."""
+        max_limit = settings.PRESENCE['lobby_limit']
+        limit = _parse_int(request.query_params.get('limit'), max_limit, max_limit)
+        players = online_players(limit)
+        ratings = get_ratings([player['user_id'] for player in players])
+        players = [{**player, 'rating': ratings[player['user_id']]} for player in players]
+        data = {'counts': counts(), 'online_players': _with_usernames(players)}
+        return Response(LobbySerializer(data).data, status=status.HTTP_200_OK)
+
+class MissionListView(APIView):
+    """
+    API endpoint for the mission catalog.
+    
+    Served from the versioned catalog cache (see ``core.missions``); the
+    ETag is the catalog version, so an unchanged catalog costs a 304.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        """Get the published missions in order."""
+        catalog = get_catalog()
+        etag = quote_etag(f"missions-{catalog['version']}")
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            data = MissionSerializer(catalog['missions'], many=True).data
+            response = Response({'missions': data}, status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        return response
+
+class MissionDetailView(APIView):
+    """
+    API endpoint for one mission of the catalog, without its test cases.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, mission_id):
+        """Get a mission."""
+        mission = get_mission(mission_id)
+        if mission is None:
+            return Response(
+                {'error': 'Mission not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(MissionSerializer(mission).data, status=status.HTTP_200_OK)
+
+class ProfileView(APIView):
+    """
+    API endpoint for the requesting user's profile.
+    
+    Served from the cache; counters are maintained as missions and matches
+    complete, never aggregated per request (see ``core.profiles``).
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        """Get the profile."""
+        profile = get_profile(request.user.id)
+        if profile is None:
+            return Response(
+                {'error': 'Profile not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(ProfileSerializer(profile).data, status=status.HTTP_200_OK)
+
+class LeaderboardView(APIView):
+    """
+    API endpoint for the top of the PvP leaderboard.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        """Get the ``limit`` best rated players."""
+        max_limit = settings.RATING['leaderboard_max_limit']
+        limit = _parse_int(request.query_params.get('limit'), 20, max_limit)
+        entries = _with_usernames(top(limit))
+        return Response(LeaderboardSerializer({'entries': entries}).data, status=status.HTTP_200_OK)
+
+class LeaderboardAroundView(APIView):
+    """
+    API endpoint for the requesting user's rank and the players around them.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        """Get the user's rank and up to ``radius`` players above and below."""
+        max_radius = settings.RATING['leaderboard_max_limit'] // 2
+        radius = _parse_int(request.query_params.get('radius'), 5, max_radius)
+        result = around(request.user.id, radius)
+        if result is None:
+            return Response(
+                {'error': 'No rated matches played yet'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        rank, entries = result
+        data = {
+            'rank': rank,
+            'rating': next(e['rating'] for e in entries if e['user_id'] == request.user.id),
+            'entries': _with_usernames(entries),
+        }
+        return Response(LeaderboardSerializer(data).data, status=status.HTTP_200_OK)
+
+class BaseView(ReadYourWritesMixin, APIView):
+    """
+    API endpoint for the requesting user's base.
+    
+    Resource amounts are computed at read time (see core.economy), so a
+    GET never writes.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        """Get the base with its buildings and current resources."""
+        base = PlayerBase.objects.filter(user=request.user).first()
+        if base is None:
+            return Response(
+                {'error': 'No base yet'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(_base_data(base), status=status.HTTP_200_OK)
+    
+    def post(self, request):
+        """Create the user's base with the starting resources."""
+        serializer = CreateBaseSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if PlayerBase.objects.filter(user=request.user).exists():
+            return Response(
+                {'error': 'Base already exists'},
+                status=status.HTTP_409_CONFLICT
+            )
+        config = settings.BASE_CONFIG
+        base = create_base(
+            request.user, serializer.validated_data['name'],
+            config['grid_width'], config['grid_height'], config['starting_resources']
+        )
+        record_write(request.user.id)
+        return Response(_base_data(base), status=status.HTTP_201_CREATED)
+
+class CollectResourcesView(APIView):
+    """
+    API endpoint for collecting the resources produced since the last collection.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        """Fold accrued production into the stored balances."""
+        base = PlayerBase.objects.filter(user=request.user).first()
+        if base is None:
+            return Response(
+                {'error': 'No base yet'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        checkpoint(base)
+        record_write(request.user.id)
+        return Response(
+            ResourceSerializer(current_resources(base), many=True).data,
+            status=status.HTTP_200_OK
+        )
+
+def _user_building(request, building_id):
+    return Building.objects.filter(id=building_id, base__user=request.user).first()
+
+_BUILDING_NOT_FOUND = {'error': 'Building not found'}
+
+class BuildingsView(APIView):
+    """
+    API endpoint for placing buildings on the requesting user's base.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        """Pay for a building and start constructing it."""
+        serializer = PlaceBuildingSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        base = PlayerBase.objects.filter(user=request.user).first()
+        if base is None:
+            return Response(
+                {'error': 'No base yet'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        position = serializer.validated_data['position']
+        try:
+            building = place_building(
+                base, serializer.validated_data['type'], position['x'], position['y']
+            )
+        except (BuildingError, InsufficientResources) as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_409_CONFLICT
+            )
+        record_write(request.user.id)
+        return Response(BuildingSerializer(building).data, status=status.HTTP_201_CREATED)
+
+class BuildingDetailView(APIView):
+    """
+    API endpoint for moving or demolishing one of the requesting user's buildings.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def patch(self, request, building_id):
+        """Move the building."""
+        serializer = MoveBuildingSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        building = _user_building(request, building_id)
+        if building is None:
+            return Response(_BUILDING_NOT_FOUND, status=status.HTTP_404_NOT_FOUND)
+        position = serializer.validated_data['position']
+        try:
+            building = move_building(building, position['x'], position['y'])
+        except BuildingError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_409_CONFLICT
+            )
+        record_write(request.user.id)
+        return Response(BuildingSerializer(building).data, status=status.HTTP_200_OK)
+    
+    def delete(self, request, building_id):
+        """Demolish the building."""
+        building = _user_building(request, building_id)
+        if building is None:
+            return Response(_BUILDING_NOT_FOUND, status=status.HTTP_404_NOT_FOUND)
+        remove_building(building)
+        record_write(request.user.id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class BuildingNeighboursView(APIView):
+    """
+    API endpoint for the buildings bordering one of the requesting user's buildings.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, building_id):
+        """Get the neighbouring buildings, diagonals included."""
+        building = _user_building(request, building_id)
+        if building is None:
+            return Response(_BUILDING_NOT_FOUND, status=status.HTTP_404_NOT_FOUND)
+        neighbours = building_neighbours(building)
+        return Response(BuildingSerializer(neighbours, many=True).data, status=status.HTTP_200_OK)
+
+class UpgradeBuildingView(APIView):
+    """
+    API endpoint for upgrading one of the requesting user's buildings.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, building_id):
+        """Pay for the upgrade and start its timer."""
+        building = _user_building(request, building_id)
+        if building is None:
+            return Response(_BUILDING_NOT_FOUND, status=status.HTTP_404_NOT_FOUND)
+        try:
+            building = start_upgrade(building)
+        except (BuildingError, InsufficientResources) as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_409_CONFLICT
+            )
+        record_write(request.user.id)
+        return Response(BuildingSerializer(building).data, status=status.HTTP_202_ACCEPTED)
+
+def _base_data(base):
+    return PlayerBaseSerializer({
+        'id': base.id,
+        'name': base.name,
+        'grid_width': base.grid_width,
+        'grid_height': base.grid_height,
+        'buildings': base.buildings.all(),
+        'resources': current_resources(base),
+    }).data
+
 class TaskStatusView(APIView):
     """
     API endpoint for checking task status.
@@ -107,3 +712,73 @@ class TaskStatusView(APIView):
                 "status": "pending",
                 "task_id": task_id
             })
+
+_submission_status_view = SubmissionStatusView.as_view()
+_task_status_view = TaskStatusView.as_view()
+
+def _parse_wait(request):
+    """
+    Parse the ``wait`` query parameter of a long-poll request.
+    
+    Returns:
+        Tuple of (seconds to wait, error response)
+    """
+    try:
+        wait = float(request.GET.get('wait', 0))
+    except ValueError:
+        wait = math.nan
+    if not math.isfinite(wait):
+        return 0, JsonResponse({'error': 'wait must be a number of seconds'}, status=400)
+    if wait < 0:
+        return 0, JsonResponse({'error': 'wait must not be negative'}, status=400)
+    return min(wait, settings.STATUS_LONG_POLL['max_wait']), None
+
+@sync_to_async
+def _check_permissions(request, view_class):
+    """Run a view's DRF authentication and permission checks before parking a request."""
+    view = view_class()
+    drf_request = view.initialize_request(request)
+    try:
+        view.check_permissions(drf_request)
+    except APIException as e:
+        return JsonResponse({'detail': str(e.detail)}, status=e.status_code)
+    return None
+
+async def submission_status(request):
+    """
+    Get submission status, optionally long-polling with ``?wait=N``.
+    
+    With ``wait`` the request is parked until the worker publishes a state
+    change or N seconds pass, then answered like a plain status request.
+    """
+    wait, error = _parse_wait(request)
+    if error:
+        return error
+    submission_id = request.GET.get('submission_id')
+    if wait and submission_id:
+        denied = await _check_permissions(request, SubmissionStatusView)
+        if denied:
+            return denied
+        
+        async def is_pending():
+            submission = await cache.aget(f'submission_{submission_id}')
+            return bool(submission) and submission['status'] == 'pending'
+        
+        await wait_for_change(submission_channel(submission_id), wait, is_pending)
+    return await sync_to_async(_submission_status_view)(request)
+
+async def task_status(request, task_id):
+    """Get task status, optionally long-polling with ``?wait=N``."""
+    wait, error = _parse_wait(request)
+    if error:
+        return error
+    if wait:
+        denied = await _check_permissions(request, TaskStatusView)
+        if denied:
+            return denied
+        
+        async def is_pending():
+            return not await sync_to_async(AsyncResult(task_id).ready)()
+        
+        await wait_for_change(task_channel(task_id), wait, is_pending)
+    return await sync_to_async(_task_status_view)(request, task_id=task_id)
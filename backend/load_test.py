@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Open-loop load generator for the submission pipeline.
+
+Submissions arrive at ``/api/submit/`` as a Poisson process at a fixed
+rate, whatever the state of the server, so a slow server builds up a
+backlog instead of slowing the load down. Each arrival picks a workload
+from a weighted mix:
+
+- ``trivial``: prints a constant and passes one test case;
+- ``cpu``: a few hundred milliseconds of arithmetic, one test case;
+- ``output``: writes about 2 MB of output;
+- ``timeout``: loops until the sandbox time limit stops it.
+
+Every submission carries a unique comment, so the per-test-case verdict
+cache never answers in place of the sandbox.
+
+Verdicts are collected by one poller on ``/api/status/batch/`` for every
+outstanding submission. Submit-to-verdict latency runs from the scheduled
+arrival (not the moment the request got out), so the time an arrival
+waits for a free client counts too. It is precise to ``--poll-interval``.
+
+The JSON report holds the configuration, the commit and, overall and per
+workload, the counts by outcome, throughput and p50/p95/p99 latencies.
+``--compare`` prints the change from an earlier report.
+
+To measure the API, Celery and cache layers alone, run the stack with
+``SANDBOX_BACKEND=fake`` (see ``core.fake_docker``).
+
+Example:
+    python load_test.py --rate 20 --duration 60 --mix trivial=70,cpu=20,timeout=10 \\
+        --report reports/$(git rev-parse --short HEAD).json
+"""
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import requests
+
+# Workloads; the code is run with `python -c '...'`, so it holds no single quotes
+WORKLOADS: Dict[str, Dict[str, Any]] = {
+    'trivial': {
+        'code': 'print(42)',
+        'test_cases': [{'input': '', 'expected': '42'}],
+    },
+    'cpu': {
+        'code': 'total = 0\nfor i in range(3_000_000):\n    total += i * i % 7\nprint(total)',
+        'test_cases': [{'input': '', 'expected': '5999999'}],
+    },
+    'output': {
+        'code': 'line = "x" * 99\nfor _ in range(20_000):\n    print(line)',
+        'test_cases': [],
+    },
+    'timeout': {
+        'code': 'while True:\n    pass',
+        'test_cases': [],
+    },
+}
+
+FINAL_STATUSES = ('success', 'error')
+PERCENTILES = (50, 95, 99)
+
+
+@dataclass
+class Submission:
+    workload: str
+    scheduled_at: float
+    sent_at: Optional[float] = None
+    accepted_at: Optional[float] = None
+    submission_id: Optional[str] = None
+    http_status: Optional[int] = None
+    status: Optional[str] = None
+    verdict_at: Optional[float] = None
+
+    @property
+    def latency(self) -> Optional[float]:
+        return self.verdict_at - self.scheduled_at if self.verdict_at else None
+
+
+@dataclass
+class Run:
+    submissions: List[Submission] = field(default_factory=list)
+    outstanding: Dict[str, Submission] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    started_at: float = 0.0
+    finished_at: float = 0.0
+    # Wall clock time of the start, for the report; the others are monotonic
+    started_wall: float = 0.0
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """Parse ``name=weight,...`` into normalised weights."""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in WORKLOADS:
+            raise argparse.ArgumentTypeError(
+                f"unknown workload '{name}'; choose from {', '.join(WORKLOADS)}"
+            )
+        mix[name] = float(weight or 1)
+    total = sum(mix.values())
+    if total <= 0:
+        raise argparse.ArgumentTypeError("mix weights must add up to more than zero")
+    return {name: weight / total for name, weight in mix.items()}
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Linearly interpolated percentile of a sorted list."""
+    if not values:
+        return None
+    rank = (len(values) - 1) * q / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def summarise(submissions: List[Submission], window: float) -> Dict[str, Any]:
+    """Counts, throughput and latency percentiles of a group of submissions."""
+    latencies = sorted(s.latency for s in submissions if s.latency is not None)
+    accept = sorted(s.accepted_at - s.sent_at for s in submissions if s.accepted_at)
+    counts = {
+        'scheduled': len(submissions),
+        'accepted': sum(1 for s in submissions if s.submission_id),
+        'rejected': sum(1 for s in submissions if s.sent_at and not s.submission_id),
+        'success': sum(1 for s in submissions if s.status == 'success'),
+        'error': sum(1 for s in submissions if s.status == 'error'),
+        'unfinished': sum(1 for s in submissions if s.submission_id and not s.status),
+    }
+    return {
+        'counts': counts,
+        'throughput': len(latencies) / window if window > 0 else None,
+        'latency': {
+            **{f'p{q}': percentile(latencies, q) for q in PERCENTILES},
+            'mean': sum(latencies) / len(latencies) if latencies else None,
+            'max': latencies[-1] if latencies else None,
+        },
+        'accept_latency': {f'p{q}': percentile(accept, q) for q in PERCENTILES},
+    }
+
+
+def build_report(run: Run, args: argparse.Namespace) -> Dict[str, Any]:
+    window = run.finished_at - run.started_at
+    by_workload: Dict[str, List[Submission]] = {}
+    for submission in run.submissions:
+        by_workload.setdefault(submission.workload, []).append(submission)
+    return {
+        'commit': args.commit,
+        'started_at': datetime.fromtimestamp(run.started_wall, timezone.utc).isoformat(),
+        'config': {
+            'base_url': args.base_url,
+            'rate': args.rate,
+            'duration': args.duration,
+            'mix': args.mix,
+            'clients': args.clients,
+            'poll_interval': args.poll_interval,
+            'seed': args.seed,
+        },
+        'window': window,
+        'overall': summarise(run.submissions, window),
+        'workloads': {
+            name: summarise(group, window) for name, group in sorted(by_workload.items())
+        },
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Lines describing the change of the headline numbers from a baseline report."""
+    lines = [f"vs {baseline.get('commit') or 'baseline'}:"]
+    for name in ['overall'] + sorted(report['workloads']):
+        current = report['overall'] if name == 'overall' else report['workloads'][name]
+        previous = baseline['overall'] if name == 'overall' else baseline['workloads'].get(name)
+        if not previous:
+            continue
+        cells = []
+        for key in [f'p{q}' for q in PERCENTILES]:
+            new, old = current['latency'][key], previous['latency'][key]
+            if new is not None and old:
+                cells.append(f"{key} {new:.3f}s ({(new - old) / old:+.1%})")
+        new, old = current['throughput'], previous['throughput']
+        if new is not None and old:
+            cells.append(f"throughput {new:.2f}/s ({(new - old) / old:+.1%})")
+        lines.append(f"  {name}: " + ', '.join(cells))
+    return lines
+
+
+class LoadGenerator:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.run = Run()
+        self.random = random.Random(args.seed)
+        self.session = requests.Session()
+        self.session.headers['Content-Type'] = 'application/json'
+        if args.token:
+            self.session.headers['Authorization'] = f'Bearer {args.token}'
+        elif args.user:
+            self.session.auth = (args.user, args.password)
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=args.clients + 1)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.arrivals_done = threading.Event()
+
+    def payload(self, workload: str) -> Dict[str, Any]:
+        spec = WORKLOADS[workload]
+        return {
+            'code': f"# load-test {uuid.uuid4()}\n{spec['code']}",
+            'language': 'python',
+            'test_cases': spec['test_cases'],
+        }
+
+    def submit(self, submission: Submission):
+        submission.sent_at = time.monotonic()
+        try:
+            response = self.session.post(
+                f'{self.args.base_url}/api/submit/', json=self.payload(submission.workload),
+                timeout=self.args.request_timeout
+            )
+        except requests.RequestException as e:
+            print(f"submit failed: {str(e)}", file=sys.stderr)
+            return
+        submission.http_status = response.status_code
+        if response.status_code != 202:
+            return
+        submission.accepted_at = time.monotonic()
+        submission.submission_id = response.json()['submission_id']
+        with self.run.lock:
+            self.run.outstanding[submission.submission_id] = submission
+
+    def poll(self):
+        """Collect verdicts until every accepted submission has one or the grace period ends."""
+        deadline = None
+        while True:
+            if self.arrivals_done.is_set() and deadline is None:
+                deadline = time.monotonic() + self.args.verdict_timeout
+            with self.run.lock:
+                pending = list(self.run.outstanding)
+            if not pending and self.arrivals_done.is_set():
+                return
+            if deadline and time.monotonic() > deadline:
+                return
+            for start in range(0, len(pending), self.args.poll_batch):
+                chunk = pending[start:start + self.args.poll_batch]
+                try:
+                    response = self.session.post(
+                        f'{self.args.base_url}/api/status/batch/',
+                        json={'submission_ids': chunk}, timeout=self.args.request_timeout
+                    )
+                    response.raise_for_status()
+                except requests.RequestException as e:
+                    print(f"status poll failed: {str(e)}", file=sys.stderr)
+                    continue
+                now = time.monotonic()
+                with self.run.lock:
+                    for submission_id, status in response.json()['statuses'].items():
+                        if status in FINAL_STATUSES and submission_id in self.run.outstanding:
+                            submission = self.run.outstanding.pop(submission_id)
+                            submission.status, submission.verdict_at = status, now
+            time.sleep(self.args.poll_interval)
+
+    def start(self) -> Run:
+        names, weights = zip(*self.args.mix.items())
+        poller = threading.Thread(target=self.poll, name='verdict-poller', daemon=True)
+        self.run.started_at, self.run.started_wall = time.monotonic(), time.time()
+        poller.start()
+        with ThreadPoolExecutor(max_workers=self.args.clients) as clients:
+            scheduled_at = self.run.started_at
+            end = self.run.started_at + self.args.duration
+            while True:
+                # Poisson arrivals: exponential gaps, independent of completions
+                scheduled_at += self.random.expovariate(self.args.rate)
+                if scheduled_at >= end:
+                    break
+                time.sleep(max(scheduled_at - time.monotonic(), 0))
+                submission = Submission(self.random.choices(names, weights)[0], scheduled_at)
+                self.run.submissions.append(submission)
+                clients.submit(self.submit, submission)
+        self.arrivals_done.set()
+        poller.join()
+        self.run.finished_at = time.monotonic()
+        return self.run
+
+
+def current_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--base-url', default=os.getenv('API_BASE_URL', 'http://localhost:8000'))
+    parser.add_argument('--token', default=os.getenv('AUTH_TOKEN'),
+                        help="Bearer token; otherwise --user and --password are used")
+    parser.add_argument('--user', default=os.getenv('LOAD_TEST_USER'))
+    parser.add_argument('--password', default=os.getenv('LOAD_TEST_PASSWORD'))
+    parser.add_argument('--rate', type=float, default=10.0, help="Arrivals per second")
+    parser.add_argument('--duration', type=float, default=60.0, help="Seconds of arrivals")
+    parser.add_argument('--mix', type=parse_mix, default='trivial=70,cpu=15,output=10,timeout=5',
+                        help="Weighted workloads, e.g. trivial=70,cpu=20,timeout=10")
+    parser.add_argument('--clients', type=int, default=64,
+                        help="Concurrent submit requests; arrivals beyond them wait")
+    parser.add_argument('--poll-interval', type=float, default=0.1)
+    parser.add_argument('--poll-batch', type=int, default=200,
+                        help="Submissions per status request")
+    parser.add_argument('--verdict-timeout', type=float, default=120.0,
+                        help="Seconds to wait for verdicts after the last arrival")
+    parser.add_argument('--request-timeout', type=float, default=30.0)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--commit', default=current_commit(), help="Label of the tested build")
+    parser.add_argument('--report', help="Write the JSON report to this file")
+    parser.add_argument('--compare', help="Earlier JSON report to compare with")
+    args = parser.parse_args(argv)
+    if args.rate <= 0 or args.duration <= 0:
+        parser.error("--rate and --duration must be positive")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    print(f"Submitting at {args.rate}/s for {args.duration}s to {args.base_url}", file=sys.stderr)
+    run = LoadGenerator(args).start()
+    report = build_report(run, args)
+    text = json.dumps(report, indent=2)
+    if args.report:
+        os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+        with open(args.report, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as f:
+            print('\n'.join(compare(report, json.load(f))), file=sys.stderr)
+    counts = report['overall']['counts']
+    return 1 if counts['accepted'] == 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -55,7 +55,8 @@ def hello_world(name: str = "World") -> str:
         task_id = result.get("task_id")
         print(f"✅ Request accepted. Task ID: {task_id}")
         
-        # Poll for results
+        # Long-poll for results: the server answers as soon as the task
+        # finishes, or after `wait` seconds if it is still running
         print("⏳ Waiting for task completion...")
         max_attempts = 10
         attempt = 0
@@ -63,7 +64,8 @@ def hello_world(name: str = "World") -> str:
         while attempt < max_attempts:
             status_response = requests.get(
                 f"{BASE_URL}/api/task/{task_id}/",
-                headers=headers
+                headers=headers,
+                params={"wait": 25}
             )
             
             if status_response.status_code == 200:
@@ -82,8 +84,9 @@ def hello_world(name: str = "World") -> str:
                     return
                 else:
                     print(".", end="", flush=True)
+            else:
+                time.sleep(2)
             
-            time.sleep(2)
             attempt += 1
             
         print("\n⚠️ Task timed out after maximum attempts")